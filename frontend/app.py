@@ -2,6 +2,8 @@ import streamlit as st
 import requests
 import json
 
+from load_runner import render_load_test_panel
+
 st.set_page_config(page_title="Real Estate API Tester", page_icon="🏠", layout="wide")
 
 st.title("🏠 Real Estate Tool Calls API Tester")
@@ -10,6 +12,11 @@ st.markdown("Test the FastAPI endpoints for Vapi integration")
 # API Base URL
 api_url = st.sidebar.text_input("API Base URL", value="http://localhost:8000", help="Change this if your API is running on a different host/port")
 
+mode = st.sidebar.radio("Mode", ["Endpoint tester", "Load test"])
+if mode == "Load test":
+    render_load_test_panel(api_url)
+    st.stop()
+
 # Initialize session state for responses
 if "responses" not in st.session_state:
     st.session_state.responses = []
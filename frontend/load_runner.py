@@ -0,0 +1,255 @@
+import asyncio
+import random
+import time
+from collections import Counter
+
+import httpx
+import streamlit as st
+
+# Apartment IDs of the sample catalog (apartments.json)
+APARTMENT_IDS = [1001, *range(1003, 1021)]
+QUERIES = ["terraza", "piscina", "cerca de la playa", "Eixample", "2 habitaciones", "metro"]
+PLACES = ["playa", "Sagrada Família", "Gràcia", "Barcelona"]
+
+# (route, request body builder, default weight). find-apartment calls Gemini
+# and add-user writes to the store, so they are off by default
+ENDPOINTS = [
+    ("/tool/get-apartments", lambda rng: None, 5),
+    ("/tool/get-apartment-info", lambda rng: {"apartment_id": rng.choice(APARTMENT_IDS)}, 40),
+    ("/tool/get-apartment-qualification", lambda rng: {"apartment_id": rng.choice(APARTMENT_IDS)}, 5),
+    ("/tool/get-schedule", lambda rng: {"apartment_id": rng.choice(APARTMENT_IDS)}, 25),
+    ("/tool/search-apartments", lambda rng: {"query": rng.choice(QUERIES)}, 10),
+    ("/tool/search-availability", lambda rng: {"city": "Barcelona", "days": 3}, 5),
+    ("/tool/similar-apartments", lambda rng: {"apartment_id": rng.choice(APARTMENT_IDS)}, 5),
+    ("/tool/nearby-apartments", lambda rng: {"near": rng.choice(PLACES)}, 5),
+    ("/tool/check-eligibility", lambda rng: {"monthly_salary": rng.randrange(1000, 5000, 250)}, 5),
+    ("/tool/find-apartment", lambda rng: {"query": rng.choice(QUERIES)}, 0),
+    ("/tool/add-user", lambda rng: {}, 0),
+]
+
+
+def percentile(ordered, q):
+    """Value at quantile q of a sorted list"""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+class LoadTestStats:
+    """Latency samples of the current one-second window, and the rows charted so far"""
+
+    def __init__(self):
+        self.window = []
+        self.rows = []
+        self.totals = Counter()
+        self.by_endpoint = {}
+
+    def add(self, endpoint, latency_ms, status):
+        """Record one request; status is None when no response came back"""
+        self.window.append((latency_ms, status))
+        outcome = "ok" if status is not None and status < 400 else (status or "failed")
+        self.totals[outcome] += 1
+        self.by_endpoint.setdefault(endpoint, []).append(latency_ms)
+
+    def roll(self, elapsed, concurrency, interval):
+        """Close the current window into a chart row"""
+        latencies = sorted(latency for latency, _ in self.window)
+        errors = sum(1 for _, status in self.window if status is None or status >= 400)
+        row = {
+            "elapsed_s": round(elapsed, 1),
+            "concurrency": concurrency,
+            "throughput_rps": round(len(self.window) / interval, 1),
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "error_rate_pct": round(100 * errors / len(self.window), 1) if self.window else 0.0,
+        }
+        self.rows.append(row)
+        self.window = []
+        return row
+
+    def endpoint_summary(self):
+        """Count and latency percentiles per endpoint over the whole run"""
+        summary = []
+        for endpoint, latencies in sorted(self.by_endpoint.items()):
+            ordered = sorted(latencies)
+            summary.append({
+                "endpoint": endpoint,
+                "requests": len(ordered),
+                "p50_ms": round(percentile(ordered, 0.50), 1),
+                "p95_ms": round(percentile(ordered, 0.95), 1),
+                "p99_ms": round(percentile(ordered, 0.99), 1),
+            })
+        return summary
+
+
+async def run_load_test(base_url, weights, stages, timeout=10.0, spread_callers=True, api_key=None, on_tick=None):
+    """
+    Fire concurrent traffic at the API through one pooled async client.
+
+    Each worker sends a request, waits for the answer and sends the next
+    one, picking endpoints at random by weight. The number of active workers
+    follows the stages, so concurrency ramps up stage by stage.
+
+    Args:
+        base_url: API base URL
+        weights: Weight of each route in ENDPOINTS (routes missing or at 0 are skipped)
+        stages: List of (concurrency, seconds) to run in order
+        timeout: Request timeout, in seconds
+        spread_callers: Send a distinct X-Caller-ID per worker, so the API's
+            per-caller rate limits see many callers instead of one. The API
+            only honors it with the admin key or from a trusted proxy
+        api_key: Admin key sent as X-API-Key with every request
+        on_tick: Called every second with (row, stats)
+
+    Returns:
+        LoadTestStats of the run
+    """
+    mix = [(route, build) for route, build, _ in ENDPOINTS if weights.get(route, 0) > 0]
+    mix_weights = [weights[route] for route, _ in mix]
+    max_concurrency = max(concurrency for concurrency, _ in stages)
+    stats = LoadTestStats()
+    state = {"target": 0, "stopping": False}
+
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+
+        async def worker(worker_id):
+            rng = random.Random(worker_id)
+            headers = {"X-Caller-ID": f"load-test-{worker_id}"} if spread_callers else {}
+            if api_key:
+                headers["X-API-Key"] = api_key
+            while not state["stopping"]:
+                if worker_id >= state["target"]:
+                    # Not active in this stage yet
+                    await asyncio.sleep(0.05)
+                    continue
+                route, build = rng.choices(mix, weights=mix_weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = await client.post(route, json=build(rng), headers=headers)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = None
+                stats.add(route, (time.perf_counter() - started) * 1000, status)
+
+        workers = [asyncio.create_task(worker(i)) for i in range(max_concurrency)]
+        started = time.perf_counter()
+        last_tick = started
+        try:
+            for concurrency, seconds in stages:
+                state["target"] = concurrency
+                stage_end = time.perf_counter() + seconds
+                while time.perf_counter() < stage_end:
+                    await asyncio.sleep(min(1.0, max(0.0, stage_end - time.perf_counter())))
+                    now = time.perf_counter()
+                    row = stats.roll(now - started, concurrency, max(now - last_tick, 1e-9))
+                    last_tick = now
+                    if on_tick is not None:
+                        on_tick(row, stats)
+        finally:
+            state["stopping"] = True
+            await asyncio.gather(*workers, return_exceptions=True)
+    return stats
+
+
+def render_load_test_panel(api_url):
+    """Load-test panel: endpoint mix, concurrency ramp and live charts"""
+    st.header("📈 Load Test")
+    st.markdown(
+        "Fire concurrent traffic at the `/tool/*` endpoints and watch throughput, "
+        "latency and errors as concurrency ramps up."
+    )
+
+    col_mix, col_ramp = st.columns([1, 1])
+
+    with col_mix:
+        st.subheader("🔀 Endpoint Mix")
+        st.caption("Relative weights. Find Apartment calls Gemini and is billed per request.")
+        weights = {}
+        for route, _, default_weight in ENDPOINTS:
+            weights[route] = st.number_input(
+                route, min_value=0, max_value=1000, value=default_weight, step=5, key=f"weight_{route}"
+            )
+
+    with col_ramp:
+        st.subheader("📶 Concurrency Ramp")
+        start_concurrency = st.number_input("Start concurrency", min_value=1, max_value=1000, value=5)
+        end_concurrency = st.number_input("End concurrency", min_value=1, max_value=1000, value=50)
+        step = st.number_input("Step", min_value=1, max_value=1000, value=5)
+        step_seconds = st.number_input("Seconds per step", min_value=1, max_value=600, value=5)
+        timeout = st.number_input("Request timeout (s)", min_value=1.0, max_value=120.0, value=10.0)
+        spread_callers = st.checkbox(
+            "One caller ID per worker",
+            value=True,
+            help="Send X-Caller-ID per worker so the API's per-caller rate limit applies to each worker. "
+            "The API only honors it with the admin key, or from an address in ADMISSION_TRUSTED_PROXIES",
+        )
+        api_key = st.text_input(
+            "Admin API key", value="", type="password", help="Sent as X-API-Key (optional)"
+        )
+
+        stages = [
+            (concurrency, int(step_seconds))
+            for concurrency in range(int(start_concurrency), int(end_concurrency) + 1, int(step))
+        ] or [(int(start_concurrency), int(step_seconds))]
+        st.caption(
+            f"{len(stages)} steps, {sum(seconds for _, seconds in stages)} s in total, "
+            f"up to {max(concurrency for concurrency, _ in stages)} concurrent requests"
+        )
+
+    if not any(weights.values()):
+        st.warning("Give at least one endpoint a weight above 0")
+        return
+
+    if not st.button("🚀 Start Load Test", type="primary"):
+        return
+
+    progress = st.progress(0.0)
+    status_line = st.empty()
+    st.markdown("**Throughput (req/s)**")
+    throughput_chart = st.empty()
+    st.markdown("**Latency (ms)**")
+    latency_chart = st.empty()
+    st.markdown("**Error rate (%)**")
+    error_chart = st.empty()
+    total_seconds = sum(seconds for _, seconds in stages)
+
+    def on_tick(row, stats):
+        rows = stats.rows
+        progress.progress(min(1.0, row["elapsed_s"] / total_seconds))
+        status_line.text(
+            f"{row['elapsed_s']:.0f}s · concurrency {row['concurrency']} · "
+            f"{row['throughput_rps']} req/s · p99 {row['p99_ms']} ms · "
+            f"{row['error_rate_pct']}% errors"
+        )
+        throughput_chart.line_chart(
+            {"throughput": [r["throughput_rps"] for r in rows]}
+        )
+        latency_chart.line_chart({
+            "p50": [r["p50_ms"] for r in rows],
+            "p95": [r["p95_ms"] for r in rows],
+            "p99": [r["p99_ms"] for r in rows],
+        })
+        error_chart.line_chart({"errors": [r["error_rate_pct"] for r in rows]})
+
+    stats = asyncio.run(
+        run_load_test(
+            api_url, weights, stages, timeout=timeout, spread_callers=spread_callers,
+            api_key=api_key or None, on_tick=on_tick,
+        )
+    )
+
+    progress.progress(1.0)
+    totals = stats.totals
+    total = sum(totals.values())
+    st.success(f"✅ Load test finished: {total} requests")
+    if total:
+        failures = {str(outcome): count for outcome, count in totals.items() if outcome != "ok"}
+        if failures:
+            st.markdown("**Failures by status** (`failed` = no response)")
+            st.json(failures)
+        if totals.get(429):
+            st.info("429 responses come from the API's admission control (see GET /metrics/admission)")
+    st.markdown("**Per endpoint**")
+    st.dataframe(stats.endpoint_summary(), use_container_width=True)
+    st.markdown("**Per second**")
+    st.dataframe(stats.rows, use_container_width=True)
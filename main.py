@@ -1,8 +1,17 @@
+import asyncio
 import os
-from fastapi import FastAPI, HTTPException
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import (
+    FileResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from dotenv import load_dotenv
 
 from services.ai_service import AIService
@@ -11,19 +20,68 @@ from models.schemas import (
     FindApartmentResponse,
     AddUserRequest,
     AddAppointmentRequest,
+    ApartmentFields,
+    CancelAppointmentRequest,
+    CheckEligibilityRequest,
+    CreateApartmentRequest,
+    GetAppointmentAgentRequest,
     GetApartmentInfoRequest,
     GetApartmentQualificationRequest,
     GetScheduleRequest,
+    MarketStatsRequest,
+    NearbyApartmentsRequest,
+    PlanTourRequest,
     ScheduleResponse,
+    SearchApartmentsRequest,
+    SearchAvailabilityRequest,
+    SimilarApartmentsRequest,
     SuccessResponse,
 )
-from utils.apartment_loader import load_apartments
-from utils.schedule_generator import get_available_slots
+from utils.admin_auth import require_admin_key
+from utils.admission import AdmissionMiddleware, admission
+from utils.agent_calendar import agent_roster
+from utils.apartment_loader import load_apartments, get_apartment, get_catalog_version
+from utils.availability_search import search_availability
+from utils.booking_store import booking_store
+from utils.catalog_store import catalog
+from utils.eligibility import get_eligibility_index
+from utils.fast_json import FastJSONRoute
+from utils.geo_index import get_geo_index, resolve_place
+from utils.market_stats import get_market_stats
+from utils.profiling import MAX_SAMPLE_SECONDS, ProfilingMiddleware, profiles, sampler
+from utils.recording import RecordingMiddleware, recorder
+from utils.result_cache import result_cache
+from utils.schedule_events import schedule_broadcaster
+from utils.search_index import get_search_index
+from utils.similarity import get_similarity_index
+from utils.tenants import TenantMiddleware, current_tenant, tenants
+from utils.tour_planner import plan_tour
+from utils.write_behind import write_queue
+from utils.schedule_generator import (
+    book_appointment_slot,
+    find_free_slots,
+    get_encoded_schedule_feed,
+    iter_slot_times,
+)
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(title="Real Estate Tool Calls API", version="1.0.0")
+# Encode endpoint results with orjson, skipping response validation
+app.router.route_class = FastJSONRoute
+
+# Serve /tool/* requests from the tenant's catalog (X-Tenant-ID or /t/{tenant_id})
+app.add_middleware(TenantMiddleware, registry=tenants)
+
+# Rate-limit callers and shed /tool/* work once it queues for too long
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Profile requests sent with X-Profile: 1 and the admin key
+app.add_middleware(ProfilingMiddleware, store=profiles)
+
+# Record /tool/* traffic for scripts/replay.py when RECORD_TRAFFIC is set
+app.add_middleware(RecordingMiddleware, recorder=recorder)
 
 # Configure CORS for Vapi integration
 app.add_middleware(
@@ -46,17 +104,39 @@ except ValueError:
     # This is okay for endpoints that don't require AI
     pass
 
+# Push booked/released slots to connected schedule dashboards
+booking_store.add_listener(schedule_broadcaster.publish_slot_change)
+
+# Re-staff a slot with agents whenever one of its viewings is booked or cancelled
+booking_store.add_listener(agent_roster.on_slot_change)
+
+
+@app.on_event("shutdown")
+async def flush_write_queue():
+    """Commit queued user and appointment writes before exiting"""
+    await write_queue.drain()
+
+
+@app.on_event("shutdown")
+async def compact_catalog_changes():
+    """Fold pending catalog changes into apartments.json before exiting"""
+    catalog.compact()
+
 
 @app.post("/tool/find-apartment")
 async def find_apartment(request: FindApartmentRequest):
     """
     Find the best matching apartment based on user query using Gemini LLM.
+    When `near` is given, only apartments within `radius_km` of that place
+    are considered.
     """
     if not ai_service:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
 
     apartments = load_apartments()
-    selected_apartment = await ai_service.find_best_apartment(request.query, apartments)
+    selected_apartment = await ai_service.find_best_apartment(
+        request.query, apartments, near=request.near, radius_km=request.radius_km
+    )
     return selected_apartment
 
 
@@ -64,8 +144,12 @@ async def find_apartment(request: FindApartmentRequest):
 async def add_user(request: AddUserRequest):
     """
     Add user to the application.
+
+    The user is persisted through the write-behind queue; the response is sent
+    once the write is durable in its write-ahead log.
     """
     print("HELLO WORLD")
+    await write_queue.submit("user", {"user_id": request.user_id or uuid.uuid4().hex})
     return SuccessResponse(status="success", message="added user to app")
 
 
@@ -73,11 +157,112 @@ async def add_user(request: AddUserRequest):
 async def add_appointment(request: AddAppointmentRequest):
     """
     Add appointment to calendar.
+
+    When apartment_id and datetime are given, the slot is booked in the
+    apartment's schedule and pushed to connected dashboards. The appointment
+    is persisted through the write-behind queue.
+
+    Raises:
+        HTTPException: 404 if apartment not found
     """
     print("ADDING TO CALENDAR")
+    appointment_id = request.appointment_id or uuid.uuid4().hex
+    if request.apartment_id is not None and request.datetime:
+        if not get_apartment(request.apartment_id):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Apartment with ID {request.apartment_id} not found",
+            )
+        book_appointment_slot(appointment_id, request.apartment_id, request.datetime)
+        await write_queue.submit(
+            "appointment",
+            {
+                "tenant_id": current_tenant().id or "",
+                "appointment_id": appointment_id,
+                "apartment_id": request.apartment_id,
+                "slot": request.datetime,
+                "status": "booked",
+            },
+        )
+        return SuccessResponse(
+            status="success",
+            message=f"added appointment {appointment_id} to calendar",
+        )
+
+    await write_queue.submit(
+        "appointment",
+        {
+            "tenant_id": current_tenant().id or "",
+            "appointment_id": appointment_id,
+            "apartment_id": None,
+            "slot": None,
+            "status": "added",
+        },
+    )
     return SuccessResponse(status="success", message="added appointment to calendar")
 
 
+@app.post("/tool/cancel-appointment", response_model=SuccessResponse)
+async def cancel_appointment(request: CancelAppointmentRequest):
+    """
+    Cancel an appointment and release its slot in the schedule.
+
+    Raises:
+        HTTPException: 404 if the appointment holds no slot
+    """
+    released = current_tenant().booking_store.release(request.appointment_id)
+    if released is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Appointment {request.appointment_id} not found",
+        )
+
+    await write_queue.submit(
+        "appointment",
+        {
+            "tenant_id": current_tenant().id or "",
+            "appointment_id": request.appointment_id,
+            "apartment_id": released[0],
+            "slot": released[1],
+            "status": "cancelled",
+        },
+    )
+    return SuccessResponse(
+        status="success",
+        message=f"released slot {released[1]} of apartment {released[0]}",
+    )
+
+
+@app.post("/tool/get-appointment-agent")
+async def get_appointment_agent(request: GetAppointmentAgentRequest):
+    """
+    Get the agent assigned to show a booked appointment.
+
+    Agents are (re)assigned whenever a viewing is booked or cancelled in the
+    same slot, so the answer can change until the viewing takes place.
+
+    Raises:
+        HTTPException: 404 if the appointment holds no slot
+    """
+    tenant = current_tenant()
+    booking = tenant.booking_store.get_appointment(request.appointment_id)
+    if booking is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Appointment {request.appointment_id} not found",
+        )
+
+    apartment_id, slot = booking
+    # Agents only staff viewings of the default catalog
+    agent = agent_roster.get_agent(apartment_id, slot) if tenant.is_default else None
+    return {
+        "appointment_id": request.appointment_id,
+        "apartment_id": apartment_id,
+        "datetime": slot,
+        "agent": {"id": agent["id"], "name": agent.get("name")} if agent else None,
+    }
+
+
 @app.post("/tool/get-apartments")
 async def get_apartments():
     """
@@ -111,14 +296,7 @@ async def get_apartment_info(request: GetApartmentInfoRequest):
     Raises:
         HTTPException: 404 if apartment not found
     """
-    apartments = load_apartments()
-
-    # Find apartment by ID
-    apartment = None
-    for apt in apartments:
-        if apt.get("id") == request.apartment_id:
-            apartment = apt.copy()
-            break
+    apartment = get_apartment(request.apartment_id)
 
     if not apartment:
         raise HTTPException(
@@ -150,14 +328,7 @@ async def get_apartment_qualification(request: GetApartmentQualificationRequest)
     Raises:
         HTTPException: 404 if apartment not found
     """
-    apartments = load_apartments()
-
-    # Find apartment by ID
-    apartment = None
-    for apt in apartments:
-        if apt.get("id") == request.apartment_id:
-            apartment = apt
-            break
+    apartment = get_apartment(request.apartment_id)
 
     if not apartment:
         raise HTTPException(
@@ -168,14 +339,271 @@ async def get_apartment_qualification(request: GetApartmentQualificationRequest)
     return apartment
 
 
+@app.post("/tool/check-eligibility")
+async def check_eligibility(request: CheckEligibilityRequest):
+    """
+    Check which apartments a caller qualifies for.
+
+    Compares the caller profile against every apartment's qualification
+    requirements (pets, minimum salary, minimum credit score, deposit).
+    Profile fields that are not provided are not checked.
+
+    Args:
+        request: Caller profile
+
+    Returns:
+        Eligible apartments, and ineligible ones with their failed_criteria
+    """
+    apartments = load_apartments()
+    return get_eligibility_index(apartments).check(
+        monthly_salary=request.monthly_salary,
+        credit_score=request.credit_score,
+        has_pets=request.has_pets,
+        deposit_budget=request.deposit_budget,
+    )
+
+
+@app.post("/tool/market-stats")
+async def market_stats(request: MarketStatsRequest):
+    """
+    Typical prices of a market segment, without calling the LLM.
+
+    Served from rollups per city, neighbourhood and bedroom count that are
+    kept up to date as listings change. Prices are estimated within 1%.
+
+    Args:
+        request: City, neighbourhood and bedroom count, each optional
+
+    Returns:
+        Listing count, min/median/p90 price and price per sqft, and the
+        share of pet-friendly and open listings; broken down per bedroom
+        count when no bedroom count is given
+    """
+    apartments = load_apartments()
+    return get_market_stats(apartments).get(
+        city=request.city,
+        neighbourhood=request.neighbourhood,
+        bedrooms=request.bedrooms,
+    )
+
+
+@app.post("/tool/search-apartments")
+async def search_apartments(request: SearchApartmentsRequest):
+    """
+    Search apartments by keywords without calling the LLM.
+
+    Matches name, city, neighbourhood, street and description, ignoring
+    accents and plural/gender endings, and ranks results with BM25.
+
+    Args:
+        request: Request containing the query and maximum number of results
+
+    Returns:
+        Matching apartments with their relevance score, best first
+    """
+    apartments = load_apartments()
+    results = get_search_index(apartments).search(request.query, request.limit)
+    return {"results": results}
+
+
+@app.post("/tool/similar-apartments")
+async def similar_apartments(request: SimilarApartmentsRequest):
+    """
+    Suggest open apartments similar to a given one.
+
+    Useful when the caller's first choice is no longer available. Similarity
+    combines price, bedrooms, bathrooms, size, location and qualification
+    requirements.
+
+    Args:
+        request: Request containing apartment_id and maximum number of results
+
+    Returns:
+        Similar open apartments, closest first
+
+    Raises:
+        HTTPException: 404 if apartment not found
+    """
+    apartments = load_apartments()
+    similar = get_similarity_index(apartments).nearest(
+        request.apartment_id, request.limit
+    )
+
+    if similar is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Apartment with ID {request.apartment_id} not found",
+        )
+
+    return {"apartment_id": request.apartment_id, "similar": similar}
+
+
+@app.post("/tool/nearby-apartments")
+async def nearby_apartments(request: NearbyApartmentsRequest):
+    """
+    Find apartments near a landmark, neighbourhood or coordinates.
+
+    Apartments without explicit coordinates are placed at the centroid of
+    their zipcode or neighbourhood.
+
+    Args:
+        request: Place name or latitude/longitude, and optional radius
+
+    Returns:
+        Apartments with their distance in km, closest first
+
+    Raises:
+        HTTPException: 400 if no place is given or the place is unknown
+    """
+    if request.near:
+        points = resolve_place(request.near)
+        if points is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown place: {request.near}",
+            )
+    elif request.latitude is not None and request.longitude is not None:
+        points = [(request.latitude, request.longitude)]
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide either near or latitude and longitude",
+        )
+
+    index = get_geo_index(load_apartments())
+    if request.radius_km is not None:
+        matches = index.within_radius(points, request.radius_km)[: request.limit]
+    else:
+        matches = index.nearest(points, request.limit)
+
+    return {"apartments": [index.describe(row, distance) for row, distance in matches]}
+
+
+@app.post("/tool/search-availability")
+async def search_availability_endpoint(request: SearchAvailabilityRequest):
+    """
+    Find apartments matching attributes that can be visited in a time window,
+    e.g. "a 2-bedroom in Eixample I can visit Tuesday morning".
+
+    Attribute filters and slot windows are resolved in one pass, without an
+    LLM call or a schedule request per candidate.
+
+    Args:
+        request: Attribute filters and the viewing window
+
+    Returns:
+        Open apartments with their best slots in the window, ranked by best
+        slot score
+
+    Raises:
+        HTTPException: 400 if a date, time or weekday is invalid
+    """
+    try:
+        start_date = (
+            datetime.strptime(request.start_date, "%d-%m-%Y").date()
+            if request.start_date
+            else datetime.now().date()
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="start_date must be in format DD-MM-YYYY",
+        )
+    try:
+        from_time = (
+            datetime.strptime(request.from_time, "%H:%M").time()
+            if request.from_time
+            else None
+        )
+        to_time = (
+            datetime.strptime(request.to_time, "%H:%M").time()
+            if request.to_time
+            else None
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="from_time and to_time must be in format HH:MM",
+        )
+    if request.weekdays and not all(0 <= day <= 6 for day in request.weekdays):
+        raise HTTPException(
+            status_code=400,
+            detail="weekdays must be between 0 (Monday) and 6 (Sunday)",
+        )
+
+    apartments = load_apartments()
+    results = search_availability(
+        apartments,
+        start_date=start_date,
+        end_date=start_date + timedelta(days=request.days),
+        weekdays=request.weekdays,
+        from_time=from_time,
+        to_time=to_time,
+        min_score=request.min_score,
+        limit=request.limit,
+        city=request.city,
+        neighbourhood=request.neighbourhood,
+        min_bedrooms=request.min_bedrooms,
+        max_bedrooms=request.max_bedrooms,
+        min_price=request.min_price,
+        max_price=request.max_price,
+        pets=request.pets,
+    )
+
+    return {"apartments": results}
+
+
+@app.post("/tool/plan-tour")
+async def plan_tour_endpoint(request: PlanTourRequest):
+    """
+    Plan a day of viewings across several apartments.
+
+    Picks one free slot per apartment and the visiting order that minimizes
+    travel and waiting between viewings, using the travel times between
+    neighbourhoods in travel_times.json.
+
+    Args:
+        request: Apartment IDs to visit and the day of the tour
+
+    Returns:
+        Ordered stops with their slot and travel time from the previous stop,
+        plus the apartments that do not fit into the day
+
+    Raises:
+        HTTPException: 400 if the date is invalid, 404 if an apartment is not found
+    """
+    if request.date:
+        try:
+            day = datetime.strptime(request.date, "%d-%m-%Y").date()
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="date must be in format DD-MM-YYYY",
+            )
+    else:
+        day = datetime.now().date()
+
+    by_id = {apt_id: get_apartment(apt_id) for apt_id in request.apartment_ids}
+    missing = [apt_id for apt_id, apt in by_id.items() if apt is None]
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Apartments not found: {', '.join(map(str, missing))}",
+        )
+
+    apartment_ids = list(dict.fromkeys(request.apartment_ids))
+    return plan_tour([by_id[apt_id] for apt_id in apartment_ids], day)
+
+
 @app.post("/tool/get-schedule", response_model=ScheduleResponse)
 async def get_schedule(request: GetScheduleRequest):
     """
     Get available time slots for a specific apartment.
-    Returns 30-minute slots for the next 7 days (9:00-18:00).
+    Returns 30-minute slots (9:00-18:00) for the next 7 days by default.
 
     Args:
-        request: Request containing apartment_id
+        request: Request containing apartment_id, and optionally the date range,
+            minimum score and maximum number of slots to return
 
     Returns:
         ScheduleResponse with apartment_id, apartment_name, and available slots
@@ -183,14 +611,7 @@ async def get_schedule(request: GetScheduleRequest):
     Raises:
         HTTPException: 404 if apartment not found
     """
-    apartments = load_apartments()
-
-    # Find apartment by ID
-    apartment = None
-    for apt in apartments:
-        if apt.get("id") == request.apartment_id:
-            apartment = apt
-            break
+    apartment = get_apartment(request.apartment_id)
 
     if not apartment:
         raise HTTPException(
@@ -198,9 +619,27 @@ async def get_schedule(request: GetScheduleRequest):
             detail=f"Apartment with ID {request.apartment_id} not found",
         )
 
-    available_slots = get_available_slots(request.apartment_id, apartments)
+    if request.start_date:
+        try:
+            start_date = datetime.strptime(request.start_date, "%d-%m-%Y").date()
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="start_date must be in format DD-MM-YYYY",
+            )
+    else:
+        start_date = datetime.now().date()
+
+    available_slots = find_free_slots(
+        request.apartment_id,
+        limit=request.limit,
+        start_date=start_date,
+        end_date=start_date + timedelta(days=request.days),
+        min_score=request.min_score,
+    )
 
-    return ScheduleResponse(
+    # The slots already have SlotWithScore's shape, so skip re-validating them
+    return ScheduleResponse.model_construct(
         apartment_id=request.apartment_id,
         apartment_name=apartment.get("name"),
         slots_available=available_slots,
@@ -213,6 +652,221 @@ async def schedule_dashboard():
     return FileResponse("static/schedule.html")
 
 
+@app.get("/schedule-data")
+async def schedule_data(request: Request, days: int = Query(default=7, ge=1, le=31)):
+    """
+    Serve every apartment's schedule for the dashboard in a compact encoding.
+
+    Each apartment carries one busy bitmask per day, where bit i is set when
+    the i-th entry of slot_times is busy. Responses carry an ETag, and a
+    matching If-None-Match header gets an empty 304 response.
+    """
+    apartments = load_apartments()
+    body, etag = await get_encoded_schedule_feed(
+        apartments, get_catalog_version(apartments), days=days
+    )
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/schedule-events")
+async def schedule_events(request: Request):
+    """
+    Stream slot-level schedule changes as Server-Sent Events.
+
+    Each 'slot' event carries {"apartment_id", "slot", "busy"} for a slot that
+    was booked or released. A 'resync' event means the client fell behind and
+    should reload /schedule-data.
+    """
+    return StreamingResponse(
+        schedule_broadcaster.stream(request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/agent-schedule")
+async def agent_schedule(date: Optional[str] = None):
+    """
+    Show every agent's calendar for a day.
+
+    Each agent carries a free and an assigned bitmask, where bit i refers to
+    the i-th entry of slot_times, plus the viewings assigned to it.
+
+    Raises:
+        HTTPException: 400 if the date is invalid
+    """
+    try:
+        day = (
+            datetime.strptime(date, "%d-%m-%Y").date()
+            if date
+            else datetime.now().date()
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="date must be in format DD-MM-YYYY",
+        )
+
+    return {
+        "date": day.strftime("%d-%m-%Y"),
+        "slot_times": [
+            slot_time.strftime("%H:%M")
+            for slot_time in iter_slot_times(day, day + timedelta(days=1))
+        ],
+        "agents": agent_roster.get_day_schedule(day),
+    }
+
+
+@app.get("/metrics/write-queue")
+async def write_queue_metrics():
+    """
+    Write-behind queue metrics: queue depth, batch sizes, flush latency of
+    the write-ahead log and how long writes waited to be acknowledged.
+    """
+    return write_queue.metrics()
+
+
+@app.get("/metrics/admission")
+async def admission_metrics():
+    """
+    Admission control metrics: tool requests running and queued per class,
+    how many were admitted, queued and rejected, and the configured limits.
+    """
+    return admission.stats()
+
+
+@app.get("/metrics/result-cache")
+async def result_cache_metrics():
+    """
+    Result cache metrics: backend, hits and misses, negative results, misses
+    coalesced within this worker or waited on across workers, invalidations
+    and backend errors.
+    """
+    return result_cache.stats()
+
+
+@app.get("/metrics/tenants")
+async def tenant_metrics():
+    """
+    Resident tenant catalogs, least recently used first, with their estimated
+    memory against the budget, and how many were loaded and evicted.
+    """
+    return tenants.stats()
+
+
+@app.post(
+    "/admin/apartments",
+    status_code=201,
+    dependencies=[Depends(require_admin_key)],
+)
+async def create_apartment(request: CreateApartmentRequest):
+    """
+    Add an apartment to the catalog. Requires the X-API-Key header.
+
+    Raises:
+        HTTPException: 409 if the ID is already taken
+    """
+    fields = request.model_dump(exclude_none=True, exclude={"id"})
+    return catalog.create({"id": request.id, **fields})
+
+
+@app.patch(
+    "/admin/apartments/{apartment_id}",
+    dependencies=[Depends(require_admin_key)],
+)
+async def patch_apartment(apartment_id: int, request: ApartmentFields):
+    """
+    Update some fields of an apartment, e.g. its status or price. Requires
+    the X-API-Key header.
+
+    Raises:
+        HTTPException: 404 if the apartment is not found
+    """
+    return catalog.patch(apartment_id, request.model_dump(exclude_unset=True))
+
+
+@app.delete(
+    "/admin/apartments/{apartment_id}",
+    response_model=SuccessResponse,
+    dependencies=[Depends(require_admin_key)],
+)
+async def delete_apartment(apartment_id: int):
+    """
+    Remove an apartment from the catalog. Requires the X-API-Key header.
+
+    Raises:
+        HTTPException: 404 if the apartment is not found
+    """
+    catalog.delete(apartment_id)
+    return SuccessResponse(
+        status="success",
+        message=f"deleted apartment {apartment_id}",
+    )
+
+
+@app.post("/admin/catalog/compact", dependencies=[Depends(require_admin_key)])
+async def compact_catalog():
+    """
+    Fold the catalog change log back into apartments.json. Requires the
+    X-API-Key header.
+    """
+    return {"compacted_changes": catalog.compact(), "version": catalog.version}
+
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin_key)])
+async def list_profiles():
+    """
+    Reports of requests profiled with the X-Profile header, newest first.
+    Requires the X-API-Key header.
+    """
+    return {"profiles": profiles.list()}
+
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin_key)])
+async def get_profile(
+    profile_id: str,
+    output: str = Query("text", alias="format", pattern="^(text|prof)$"),
+    sort: str = Query("cumulative"),
+    limit: int = Query(40, ge=1, le=1000),
+):
+    """
+    Report of a profiled request. Requires the X-API-Key header.
+
+    Returns the pstats listing sorted by `sort` (e.g. cumulative, tottime,
+    calls), or with format=prof the .prof file for snakeviz or pstats.
+    """
+    if output == "prof":
+        return Response(
+            profiles.dump(profile_id),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f'attachment; filename="{profile_id}.prof"'
+            },
+        )
+    return PlainTextResponse(profiles.text(profile_id, sort, limit))
+
+
+@app.post("/admin/profile/sample", dependencies=[Depends(require_admin_key)])
+async def sample_profile(
+    seconds: float = Query(10, gt=0, le=MAX_SAMPLE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    """
+    Sample the stacks of every thread of the process for `seconds`. Requires
+    the X-API-Key header.
+
+    Returns collapsed stacks ("frame;frame;frame count" lines) for
+    flamegraph.pl, speedscope or similar flame graph tools.
+    """
+    stacks = await asyncio.to_thread(sampler.sample, seconds, interval_ms / 1000)
+    return PlainTextResponse(stacks)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,129 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator
+
+
+class Record(Mapping):
+    """
+    Read-only record with a fixed set of fields kept in __slots__.
+
+    Records stand in for the plain dicts they are built from: apt.get("city"),
+    apt["id"], "qualification" in apt and dict(apt) all work as before, but a
+    record has no per-instance hash table. A field missing from the source
+    dict is left unset rather than stored as None, so a record converts back
+    to the same dict. Keys outside the schema are kept in a side dict.
+    """
+
+    __slots__ = ("_extra",)
+
+    # Fields whose values repeat across records (e.g. city names); their
+    # strings are interned so every record shares one copy
+    interned_fields = ()
+    # Fields holding a nested record, mapped to its type
+    nested_fields: Dict[str, type] = {}
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        cls.fields = cls.__slots__
+        cls.field_set = frozenset(cls.__slots__)
+
+    def __init__(self, data: Mapping):
+        extra = None
+        for key, value in data.items():
+            if key not in self.field_set:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+                continue
+            if key in self.interned_fields and type(value) is str:
+                value = sys.intern(value)
+            elif key in self.nested_fields and isinstance(value, Mapping):
+                value = self.nested_fields[key](value)
+            setattr(self, key, value)
+        if extra is not None:
+            self._extra = extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return self._extras()[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.field_set:
+            return getattr(self, key, default)
+        return self._extras().get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self.field_set:
+            return hasattr(self, key)
+        return key in self._extras()
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.fields:
+            if hasattr(self, name):
+                yield name
+        yield from self._extras()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def _extras(self) -> Dict[str, Any]:
+        return getattr(self, "_extra", {})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert back to a plain dict, nested records included"""
+        return {
+            key: value.to_dict() if isinstance(value, Record) else value
+            for key, value in self.items()
+        }
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Qualification(Record):
+    """Rental requirements of an apartment"""
+
+    __slots__ = (
+        "allow_pets",
+        "minimum_salary",
+        "minimum_credit_score",
+        "deposit_required",
+        "deposit_amount",
+    )
+
+
+class Apartment(Record):
+    """One catalog listing, with the fields of apartments.json"""
+
+    __slots__ = (
+        "id",
+        "name",
+        "street",
+        "city",
+        "state",
+        "zipcode",
+        "price",
+        "bedrooms",
+        "bathrooms",
+        "sqft",
+        "description",
+        "status",
+        "qualification",
+        "neighbourhood",
+        "latitude",
+        "longitude",
+    )
+
+    interned_fields = frozenset({"city", "state", "zipcode", "status", "neighbourhood"})
+    nested_fields = {"qualification": Qualification}
+
+
+def encode_record(obj: Any) -> Dict[str, Any]:
+    """json.dumps default hook that encodes records as dicts"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -5,6 +5,11 @@ from typing import Optional, Dict, Any, List
 class FindApartmentRequest(BaseModel):
     """Request model for finding an apartment"""
     query: str
+    near: Optional[str] = Field(
+        default=None,
+        description="Only consider apartments near this place, e.g. \"playa\" or \"Sagrada Família\""
+    )
+    radius_km: float = Field(default=2.0, gt=0, le=50, description="Radius around `near`, in km")
 
 
 class AddUserRequest(BaseModel):
@@ -15,6 +20,24 @@ class AddUserRequest(BaseModel):
 class AddAppointmentRequest(BaseModel):
     """Request model for adding an appointment"""
     appointment_id: Optional[str] = None
+    apartment_id: Optional[int] = Field(
+        default=None,
+        description="Apartment to visit. Together with datetime, books the slot in the schedule"
+    )
+    datetime: Optional[str] = Field(
+        default=None,
+        description="Slot to book in format DD-MM-YYYY HH:MM"
+    )
+
+
+class CancelAppointmentRequest(BaseModel):
+    """Request model for cancelling an appointment"""
+    appointment_id: str
+
+
+class GetAppointmentAgentRequest(BaseModel):
+    """Request model for getting the agent staffing an appointment"""
+    appointment_id: str
 
 
 class GetApartmentInfoRequest(BaseModel):
@@ -30,6 +53,132 @@ class GetApartmentQualificationRequest(BaseModel):
 class GetScheduleRequest(BaseModel):
     """Request model for getting apartment schedule"""
     apartment_id: int
+    start_date: Optional[str] = Field(
+        default=None,
+        description="First day of the schedule in format DD-MM-YYYY (defaults to today)"
+    )
+    days: int = Field(default=7, ge=1, le=365, description="Number of days to cover")
+    min_score: Optional[int] = Field(
+        default=None, ge=0, le=100,
+        description="Only return slots scoring at least this value"
+    )
+    limit: Optional[int] = Field(
+        default=None, ge=1,
+        description="Stop after this many slots (earliest first)"
+    )
+
+
+class CheckEligibilityRequest(BaseModel):
+    """Request model for checking which apartments a caller qualifies for"""
+    monthly_salary: Optional[float] = Field(default=None, ge=0, description="Caller's monthly salary")
+    credit_score: Optional[int] = Field(default=None, ge=0, description="Caller's credit score")
+    has_pets: Optional[bool] = Field(default=None, description="Whether the caller has pets")
+    deposit_budget: Optional[float] = Field(
+        default=None, ge=0,
+        description="Maximum deposit the caller can pay"
+    )
+
+
+class MarketStatsRequest(BaseModel):
+    """Request model for market stats of a city, neighbourhood and/or bedroom count"""
+    city: Optional[str] = Field(default=None, description="City name, e.g. \"Barcelona\"")
+    neighbourhood: Optional[str] = Field(default=None, description="Neighbourhood name, e.g. \"Eixample\"")
+    bedrooms: Optional[int] = Field(default=None, ge=0, description="Number of bedrooms")
+
+
+class SearchApartmentsRequest(BaseModel):
+    """Request model for full-text apartment search"""
+    query: str
+    limit: int = Field(default=5, ge=1, le=50, description="Maximum number of results")
+
+
+class SimilarApartmentsRequest(BaseModel):
+    """Request model for finding apartments similar to a given one"""
+    apartment_id: int
+    limit: int = Field(default=5, ge=1, le=20, description="Maximum number of similar apartments")
+
+
+class NearbyApartmentsRequest(BaseModel):
+    """Request model for finding apartments near a place or coordinates"""
+    near: Optional[str] = Field(
+        default=None,
+        description="Landmark or neighbourhood name, e.g. \"playa\" or \"Sagrada Família\""
+    )
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+    radius_km: Optional[float] = Field(
+        default=None, gt=0, le=50,
+        description="Return every apartment within this radius. If not set, return the `limit` nearest"
+    )
+    limit: int = Field(default=5, ge=1, le=50, description="Maximum number of apartments")
+
+
+class SearchAvailabilityRequest(BaseModel):
+    """Request model for finding apartments by attributes and viewing availability"""
+    city: Optional[str] = Field(default=None, description="City name, e.g. \"Barcelona\"")
+    neighbourhood: Optional[str] = Field(default=None, description="Neighbourhood name, e.g. \"Eixample\"")
+    min_bedrooms: Optional[int] = Field(default=None, ge=0)
+    max_bedrooms: Optional[int] = Field(default=None, ge=0)
+    min_price: Optional[float] = Field(default=None, ge=0)
+    max_price: Optional[float] = Field(default=None, ge=0)
+    pets: Optional[bool] = Field(default=None, description="Only apartments that allow pets")
+    start_date: Optional[str] = Field(
+        default=None,
+        description="First day of the window in format DD-MM-YYYY (defaults to today)"
+    )
+    days: int = Field(default=7, ge=1, le=31, description="Number of days to cover")
+    weekdays: Optional[List[int]] = Field(
+        default=None,
+        description="Only these weekdays, 0=Monday ... 6=Sunday, e.g. [1] for Tuesdays"
+    )
+    from_time: Optional[str] = Field(default=None, description="Earliest slot start in format HH:MM, e.g. \"09:00\"")
+    to_time: Optional[str] = Field(default=None, description="Latest slot end in format HH:MM, e.g. \"13:00\"")
+    min_score: Optional[int] = Field(
+        default=None, ge=0, le=100,
+        description="Only consider slots scoring at least this value"
+    )
+    limit: int = Field(default=5, ge=1, le=50, description="Maximum number of apartments")
+
+
+class PlanTourRequest(BaseModel):
+    """Request model for planning a day of viewings across several apartments"""
+    apartment_ids: List[int] = Field(
+        min_length=1, max_length=20,
+        description="Apartments to visit, in any order"
+    )
+    date: Optional[str] = Field(
+        default=None,
+        description="Day of the tour in format DD-MM-YYYY (defaults to today)"
+    )
+
+
+class ApartmentFields(BaseModel):
+    """Editable apartment fields; fields left out are not changed"""
+    name: Optional[str] = None
+    street: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zipcode: Optional[str] = None
+    price: Optional[int] = Field(default=None, ge=0)
+    bedrooms: Optional[int] = Field(default=None, ge=0)
+    bathrooms: Optional[int] = Field(default=None, ge=0)
+    sqft: Optional[int] = Field(default=None, ge=0)
+    description: Optional[str] = None
+    status: Optional[str] = Field(default=None, description="\"open\" when the apartment can be rented")
+    qualification: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="allow_pets, minimum_salary, minimum_credit_score, deposit_required and deposit_amount"
+    )
+    neighbourhood: Optional[str] = None
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+
+
+class CreateApartmentRequest(ApartmentFields):
+    """Request model for adding an apartment to the catalog"""
+    id: Optional[int] = Field(default=None, description="Apartment ID (assigned if not set)")
+    name: str
+    city: str
 
 
 class SlotWithScore(BaseModel):
@@ -51,8 +200,17 @@ class SuccessResponse(BaseModel):
     message: str
 
 
+class QualificationData(BaseModel):
+    """Rental requirements of an apartment"""
+    allow_pets: Optional[bool] = None
+    minimum_salary: Optional[int] = None
+    minimum_credit_score: Optional[int] = None
+    deposit_required: Optional[bool] = None
+    deposit_amount: Optional[int] = None
+
+
 class ApartmentData(BaseModel):
-    """Apartment data model"""
+    """Apartment data model, mirroring models.apartment.Apartment"""
     id: Optional[int] = None
     name: Optional[str] = None
     street: Optional[str] = None
@@ -64,6 +222,11 @@ class ApartmentData(BaseModel):
     bathrooms: Optional[int] = None
     sqft: Optional[int] = None
     description: Optional[str] = None
+    status: Optional[str] = None
+    qualification: Optional[QualificationData] = None
+    neighbourhood: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 
 class GeminiApartmentResponse(BaseModel):
@@ -77,6 +240,24 @@ class GeminiApartmentResponse(BaseModel):
     model_config = {"arbitrary_types_allowed": True}
 
 
+class GeminiBatchResult(BaseModel):
+    """Result for one query of a batched Gemini call"""
+    query_index: int = Field(description="Index of the user request this result answers")
+    exists: bool = Field(description="True if matching apartments exist in the list for this request, False otherwise")
+    apartment_ids: List[int] = Field(
+        default_factory=list,
+        description="List of apartment IDs that match this request. Return an empty list if no matches found."
+    )
+
+
+class GeminiBatchApartmentResponse(BaseModel):
+    """Response model for Gemini AI when several queries are answered in one call"""
+    results: List[GeminiBatchResult] = Field(
+        default_factory=list,
+        description="One result per user request, identified by query_index"
+    )
+
+
 class FindApartmentResponse(BaseModel):
     """Response model for finding an apartment"""
     exists: bool = Field(description="True if a matching apartment exists in the list, False otherwise")
@@ -0,0 +1,71 @@
+"""
+Microbenchmark of response encoding per route.
+
+Compares FastAPI's default path (response_model validation, jsonable_encoder
+and json.dumps) against the orjson path used by FastJSONRoute, on the result
+of a typical call to each route. Only encoding is timed, not the endpoint.
+
+Usage:
+    python scripts/bench_encode.py [iterations]
+"""
+import asyncio
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+import main  # noqa: E402
+from models.schemas import (  # noqa: E402
+    GetScheduleRequest,
+    PlanTourRequest,
+    SearchApartmentsRequest,
+    SearchAvailabilityRequest,
+)
+from utils.apartment_loader import load_apartments  # noqa: E402
+from utils.fast_json import FastJSONResponse  # noqa: E402
+
+
+def sample_calls():
+    apartment_ids = [apt["id"] for apt in load_apartments()]
+    return [
+        ("/tool/get-schedule", main.get_schedule(GetScheduleRequest(apartment_id=apartment_ids[0], limit=None))),
+        ("/tool/get-apartments", main.get_apartments()),
+        ("/tool/search-apartments", main.search_apartments(SearchApartmentsRequest(query="Barcelona", limit=20))),
+        ("/tool/search-availability", main.search_availability_endpoint(SearchAvailabilityRequest(limit=20))),
+        ("/tool/plan-tour", main.plan_tour_endpoint(PlanTourRequest(apartment_ids=apartment_ids[:6]))),
+        ("/agent-schedule", main.agent_schedule()),
+    ]
+
+
+async def run(iterations: int) -> None:
+    routes = {route.path: route for route in main.app.routes if hasattr(route, "response_field")}
+
+    print(f"{'route':<28}{'bytes':>8}{'default µs':>13}{'orjson µs':>12}{'speedup':>9}")
+    for path, call in sample_calls():
+        result = await call
+        field = routes[path].response_field
+        # Default path: a fully validated response model, as FastAPI expects
+        baseline = type(result).model_validate(result.__dict__) if isinstance(result, BaseModel) else result
+
+        async def default_encode():
+            content = await serialize_response(field=field, response_content=baseline, is_coroutine=True)
+            return JSONResponse(content).body
+
+        # serialize_response is a coroutine, so time the whole loop inside one event loop turn
+        started = timeit.default_timer()
+        for _ in range(iterations):
+            body = await default_encode()
+        default_us = (timeit.default_timer() - started) / iterations * 1e6
+
+        fast_us = timeit.timeit(lambda: FastJSONResponse(result).body, number=iterations) / iterations * 1e6
+
+        print(f"{path:<28}{len(body):>8}{default_us:>13.1f}{fast_us:>12.1f}{default_us / fast_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,60 @@
+"""
+Memory benchmark of the catalog representation.
+
+Builds a synthetic catalog by cycling apartments.json (with unique IDs,
+names and descriptions per listing) and measures the bytes per listing of
+the plain dicts json.loads returns against compact Apartment records.
+
+Usage:
+    python scripts/bench_memory.py [listings]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.apartment import Apartment  # noqa: E402
+
+
+def synthetic_catalog(size: int) -> str:
+    base = json.loads((Path(__file__).parent.parent / "apartments.json").read_text(encoding="utf-8"))
+    listings = []
+    for i in range(size):
+        apt = dict(base[i % len(base)])
+        apt["id"] = 100000 + i
+        apt["name"] = f"{apt['name']} {i}"
+        apt["description"] = f"{apt['description']} (ref {i})"
+        apt["price"] = apt["price"] + i % 500
+        listings.append(apt)
+    return json.dumps(listings, ensure_ascii=False)
+
+
+def measure(build, raw: str) -> int:
+    """Bytes still allocated by what build(raw) returns"""
+    gc.collect()
+    tracemalloc.start()
+    kept = build(raw)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def main(size: int) -> None:
+    raw = synthetic_catalog(size)
+
+    as_dicts = measure(json.loads, raw)
+    as_records = measure(lambda text: [Apartment(apt) for apt in json.loads(text)], raw)
+
+    print(f"{size} listings")
+    print(f"{'dicts':<10}{as_dicts / size:>10.0f} bytes/listing{as_dicts / 2**20:>10.1f} MiB")
+    print(f"{'records':<10}{as_records / size:>10.0f} bytes/listing{as_records / 2**20:>10.1f} MiB")
+    print(f"saved {1 - as_records / as_dicts:.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
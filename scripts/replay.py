@@ -0,0 +1,265 @@
+"""
+Replay recorded tool-call traffic against the API.
+
+Feeds exchanges recorded with RECORD_TRAFFIC=true back into the app,
+in-process, with Gemini stubbed out by the LLM responses recorded for each
+exchange. Requests are sent open-loop: each one at its recorded offset
+divided by --speed, whether or not earlier ones have completed, so a slower
+build queues up the way it would in production. Reports latency
+percentiles per route and the responses that differ from the recording,
+or from the results of an earlier replay (--baseline) to compare builds.
+
+Usage:
+    python scripts/replay.py data/recordings/traffic.jsonl [more files...]
+        [--speed 4] [--app main] [--url http://localhost:8000]
+        [--out results.jsonl] [--baseline earlier-results.jsonl]
+"""
+import argparse
+import asyncio
+import hashlib
+import importlib
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Stub answer when an exchange makes more LLM calls than were recorded
+NO_MATCH = '{"exists": false, "apartment_ids": []}'
+
+# Client address of in-process replay requests
+REPLAY_CLIENT = ("replay", 0)
+
+# Recorded LLM responses of the exchange the current task is replaying
+_replaying: ContextVar[Dict[str, Any]] = ContextVar("replaying")
+
+
+def load_exchanges(paths: List[str]) -> List[Dict[str, Any]]:
+    """Recorded exchanges from one or more (rotated) files, oldest first"""
+    exchanges = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            exchanges.extend(json.loads(line) for line in f if line.strip())
+    exchanges.sort(key=lambda exchange: exchange["ts"])
+    return exchanges
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """Results written by an earlier replay with --out"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class StubModels:
+    """Stand-in for client.aio.models answering with recorded LLM responses"""
+
+    async def generate_content(self, model: str, contents: Any, config: Any) -> SimpleNamespace:
+        return _stub_response(self._next_text())
+
+    async def generate_content_stream(self, model: str, contents: Any, config: Any):
+        text = self._next_text()
+
+        async def chunks():
+            yield _stub_response(text)
+
+        return chunks()
+
+    @staticmethod
+    def _next_text() -> str:
+        state = _replaying.get()
+        calls = state["calls"]
+        state["calls"] += 1
+        return state["llm"][calls] if calls < len(state["llm"]) else NO_MATCH
+
+
+def _stub_response(text: str) -> SimpleNamespace:
+    return SimpleNamespace(text=text, parsed=None, candidates=None, usage_metadata=None)
+
+
+def in_process_client(app_module: str) -> httpx.AsyncClient:
+    """Client calling the app in-process, with Gemini stubbed out"""
+    from services.ai_service import AIService
+
+    module = importlib.import_module(app_module)
+    # One call per query and no cached answers, so each exchange gets back
+    # exactly its recorded answers
+    service = AIService(
+        api_key="replay", batch_window_ms=0, streaming=False, context_cache="", match_cache_ttl=0
+    )
+    service.client = SimpleNamespace(aio=SimpleNamespace(models=StubModels()))
+    module.ai_service = service
+    # Recorded callers keep their own rate limits: the replay client is a
+    # trusted proxy, so the X-Caller-ID it sends is honored
+    module.admission.trusted_proxies.add(REPLAY_CLIENT[0])
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=module.app, client=REPLAY_CLIENT),
+        base_url="http://replay",
+        timeout=None,
+    )
+
+
+async def send(
+    client: httpx.AsyncClient, index: int, exchange: Dict[str, Any], scheduled: float
+) -> Dict[str, Any]:
+    _replaying.set({"llm": exchange.get("llm") or [], "calls": 0})
+    started = time.perf_counter()
+    response = await client.request(
+        exchange["method"],
+        exchange["path"],
+        json=exchange.get("request"),
+        headers={**exchange.get("headers", {}), "X-Caller-ID": exchange["caller"]},
+    )
+    latency = time.perf_counter() - started
+    try:
+        body = response.json()
+    except ValueError:
+        body = response.text
+    return {
+        # Position in the replay; recorded sequence numbers restart with the server
+        "index": index,
+        "path": exchange["path"],
+        "status": response.status_code,
+        "latency_ms": round(latency * 1000, 3),
+        # How late the request went out against its schedule
+        "lag_ms": round((started - scheduled) * 1000, 3),
+        "response_sha1": hashlib.sha1(response.content).hexdigest(),
+        "response": body,
+    }
+
+
+async def replay(client: httpx.AsyncClient, exchanges: List[Dict[str, Any]], speed: float) -> List[Dict[str, Any]]:
+    """Send every exchange at its recorded offset divided by speed"""
+    tasks = []
+    start = time.perf_counter()
+    first_ts = exchanges[0]["ts"]
+    async with client:
+        for index, exchange in enumerate(exchanges):
+            scheduled = start + (exchange["ts"] - first_ts) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, index, exchange, scheduled)))
+        return await asyncio.gather(*tasks)
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def first_difference(a: Any, b: Any, path: str = "") -> Optional[str]:
+    """Path of the first difference between two JSON values, None if equal"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in sorted(set(a) | set(b), key=str):
+            if key not in a or key not in b:
+                return f"{path}.{key}"
+            found = first_difference(a[key], b[key], f"{path}.{key}")
+            if found:
+                return found
+        return None
+    if isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            return f"{path}[len {len(a)} != {len(b)}]"
+        for i, (x, y) in enumerate(zip(a, b)):
+            found = first_difference(x, y, f"{path}[{i}]")
+            if found:
+                return found
+        return None
+    return None if a == b else (path or "(body)")
+
+
+def difference(result: Dict[str, Any], reference: Dict[str, Any]) -> Optional[str]:
+    if result["status"] != reference["status"]:
+        return f"status {reference['status']} -> {result['status']}"
+    if reference.get("response") is None:
+        # Body too large to record: compare digests
+        return None if result["response_sha1"] == reference["response_sha1"] else "(body digest)"
+    return first_difference(reference["response"], result["response"])
+
+
+def report(results: List[Dict[str, Any]], reference: Dict[int, Dict[str, Any]], label: str, elapsed: float) -> None:
+    by_route = defaultdict(list)
+    for result in results:
+        # Tenant-prefixed routes are reported with their tool route
+        by_route["/tool/" + result["path"].partition("/tool/")[2]].append(result)
+
+    print(f"{len(results)} requests in {elapsed:.2f} s ({len(results) / elapsed:.1f} req/s)")
+    lags = sorted(result["lag_ms"] for result in results)
+    print(f"send lag p50 {percentile(lags, 0.5):.1f} ms, max {lags[-1]:.1f} ms\n")
+    print(f"{'route':<34}{'n':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  status")
+    for route, route_results in sorted(by_route.items()):
+        latencies = sorted(result["latency_ms"] for result in route_results)
+        statuses = Counter(result["status"] for result in route_results)
+        print(
+            f"{route:<34}{len(route_results):>6}"
+            f"{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.9):>9.1f}"
+            f"{percentile(latencies, 0.99):>9.1f}{latencies[-1]:>9.1f}  "
+            + ", ".join(f"{status}x{count}" for status, count in sorted(statuses.items()))
+        )
+
+    print(f"\nResponses differing from {label}:")
+    any_differences = False
+    for route, route_results in sorted(by_route.items()):
+        differences = [
+            (result["index"], found)
+            for result in route_results
+            if result["index"] in reference
+            for found in [difference(result, reference[result["index"]])]
+            if found
+        ]
+        if differences:
+            any_differences = True
+            examples = ", ".join(f"#{index} at {found}" for index, found in differences[:3])
+            print(f"{route:<34}{len(differences):>6}/{len(route_results)}  e.g. {examples}")
+    if not any_differences:
+        print("none")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("recordings", nargs="+", help="Recorded traffic.jsonl files")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay rate multiplier (default: 1)")
+    parser.add_argument("--app", default="main", help="App module to replay against in-process (default: main)")
+    parser.add_argument("--url", help="Replay against a running server instead (Gemini is not stubbed)")
+    parser.add_argument("--out", help="Write the replay results to this JSONL file")
+    parser.add_argument("--baseline", help="Compare with the results of an earlier replay instead of the recording")
+    parser.add_argument("--limit", type=int, help="Replay only the first N exchanges")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    exchanges = load_exchanges(args.recordings)[: args.limit]
+    if not exchanges:
+        parser.error("no exchanges in the recording")
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+    else:
+        client = in_process_client(args.app)
+
+    started = time.perf_counter()
+    results = asyncio.run(replay(client, exchanges, args.speed))
+    elapsed = time.perf_counter() - started
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if args.baseline:
+        reference = {result["index"]: result for result in load_results(args.baseline)}
+        label = args.baseline
+    else:
+        reference = dict(enumerate(exchanges))
+        label = "the recording"
+    report(results, reference, label, elapsed)
+
+
+if __name__ == "__main__":
+    main()
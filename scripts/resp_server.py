@@ -0,0 +1,127 @@
+"""
+Local stand-in for a Redis server, for developing and testing the shared
+result cache (RESULT_CACHE_BACKEND=redis) without installing Redis.
+
+Speaks the Redis protocol (RESP) and implements the commands the cache
+uses: PING, AUTH, SELECT, GET, SET (with EX/PX/NX/XX), DEL, INCR, EXISTS,
+DBSIZE and FLUSHALL. Data is kept in memory, in a single database.
+
+Usage:
+    python scripts/resp_server.py [--host 127.0.0.1] [--port 6379]
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+# key -> (value, expiry as monotonic time or None)
+Store = Dict[bytes, Tuple[bytes, Optional[float]]]
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    """Read one command: an array of bulk strings (None for anything else)"""
+    line = await reader.readuntil(b"\r\n")
+    if not line.startswith(b"*"):
+        return None
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readuntil(b"\r\n")
+        if not header.startswith(b"$"):
+            return None
+        args.append((await reader.readexactly(int(header[1:-2]) + 2))[:-2])
+    return args
+
+
+def _get(store: Store, key: bytes) -> Optional[bytes]:
+    entry = store.get(key)
+    if entry is None:
+        return None
+    if entry[1] is not None and entry[1] <= time.monotonic():
+        del store[key]
+        return None
+    return entry[0]
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def execute(store: Store, args: List[bytes]) -> bytes:
+    """Run one command, returning the encoded reply"""
+    command = args[0].upper()
+    if command == b"PING":
+        return b"+PONG\r\n"
+    if command in (b"AUTH", b"SELECT"):
+        return b"+OK\r\n"
+    if command == b"GET" and len(args) == 2:
+        return _bulk(_get(store, args[1]))
+    if command == b"SET" and len(args) >= 3:
+        key, value, options = args[1], args[2], [arg.upper() for arg in args[3:]]
+        expires = None
+        for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+            if unit in options:
+                expires = time.monotonic() + int(args[3 + options.index(unit) + 1]) * scale
+        exists = _get(store, key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return b"$-1\r\n"
+        store[key] = (value, expires)
+        return b"+OK\r\n"
+    if command == b"DEL":
+        removed = {key for key in args[1:] if _get(store, key) is not None}
+        for key in removed:
+            del store[key]
+        return b":%d\r\n" % len(removed)
+    if command == b"EXISTS":
+        return b":%d\r\n" % sum(1 for key in args[1:] if _get(store, key) is not None)
+    if command == b"INCR" and len(args) == 2:
+        current = _get(store, args[1])
+        try:
+            value = int(current or 0) + 1
+        except ValueError:
+            return b"-ERR value is not an integer or out of range\r\n"
+        store[args[1]] = (str(value).encode(), store[args[1]][1] if current is not None else None)
+        return b":%d\r\n" % value
+    if command == b"DBSIZE":
+        return b":%d\r\n" % sum(1 for key in list(store) if _get(store, key) is not None)
+    if command == b"FLUSHALL":
+        store.clear()
+        return b"+OK\r\n"
+    return b"-ERR unknown command or wrong number of arguments for '%s'\r\n" % args[0]
+
+
+async def serve(host: str, port: int) -> None:
+    store: Store = {}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                args = await read_command(reader)
+                if not args:
+                    writer.write(b"-ERR expected a command array\r\n")
+                else:
+                    writer.write(execute(store, args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"RESP stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=6379, help="Port to listen on (default: 6379)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
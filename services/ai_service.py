@@ -1,22 +1,61 @@
+import asyncio
 import json
+import logging
 import re
 import os
-from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from fastapi import HTTPException
 from google.genai import types
 from google import genai
-from models.schemas import FindApartmentResponse, ApartmentData, GeminiApartmentResponse
+from models.schemas import (
+    FindApartmentResponse,
+    ApartmentData,
+    GeminiApartmentResponse,
+    GeminiBatchApartmentResponse,
+)
+from services.context_cache import CachedPrefix, GeminiContextCache, LocalContextCache
+from services.json_stream import IncrementalJSONObjectParser
+from services.prompt_builder import PromptBuilder
+from services.query_batcher import QueryBatcher
+from utils.apartment_loader import get_catalog_version, is_catalog_list
+from utils.geo_index import DEFAULT_RADIUS_KM, filter_near
+from utils.recording import record_llm_response
+from utils.result_cache import result_cache
+
+logger = logging.getLogger(__name__)
 
 class AIService:
     """Service for handling AI operations using Google Gemini"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        batch_window_ms: float = None,
+        max_batch_size: int = None,
+        streaming: bool = None,
+        context_cache: str = None,
+        match_cache_ttl: float = None,
+        negative_cache_ttl: float = None,
+    ):
         """
         Initialize the AI Service with Gemini client
         
         Args:
             api_key: Google Gemini API key. If not provided, will try to get from env
+            batch_window_ms: Micro-batching window for find_best_apartment queries.
+                If not provided, read from FIND_APARTMENT_BATCH_WINDOW_MS (0 disables batching)
+            max_batch_size: Maximum queries per batched call.
+                If not provided, read from FIND_APARTMENT_BATCH_SIZE (default 8)
+            streaming: Use the streaming API and return as soon as the apartment IDs
+                are complete. If not provided, read from FIND_APARTMENT_STREAMING
+            context_cache: Where to cache the catalog prompt prefix: "gemini" (provider
+                context caching), "local" (offline stand-in) or "" (disabled).
+                If not provided, read from GEMINI_CONTEXT_CACHE
+            match_cache_ttl: Seconds to keep find_best_apartment answers in the
+                result cache (0 disables caching). If not provided, read from
+                FIND_APARTMENT_CACHE_TTL_SECONDS (default 300)
+            negative_cache_ttl: Seconds to keep "no match" answers. If not
+                provided, read from FIND_APARTMENT_NEGATIVE_CACHE_TTL_SECONDS (default 60)
         """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
@@ -24,83 +63,325 @@ class AIService:
         
         self.client = genai.Client(api_key=self.api_key)
         self.model = "gemini-2.5-flash-lite"
-        self._load_prompts()
+        self.prompts = PromptBuilder()
+        self.system_instruction = self.prompts.system_instruction
+
+        if context_cache is None:
+            context_cache = os.getenv("GEMINI_CONTEXT_CACHE", "")
+        self.context_cache = None
+        if context_cache == "gemini":
+            self.context_cache = GeminiContextCache(
+                self.client,
+                self.model,
+                ttl_seconds=int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600")),
+            )
+        elif context_cache == "local":
+            self.context_cache = LocalContextCache()
+        elif context_cache:
+            raise ValueError(f"Unknown GEMINI_CONTEXT_CACHE value: {context_cache}")
+
+        if match_cache_ttl is None:
+            match_cache_ttl = float(os.getenv("FIND_APARTMENT_CACHE_TTL_SECONDS", "300"))
+        if negative_cache_ttl is None:
+            negative_cache_ttl = float(os.getenv("FIND_APARTMENT_NEGATIVE_CACHE_TTL_SECONDS", "60"))
+        self.match_cache_ttl = match_cache_ttl
+        self.negative_cache_ttl = negative_cache_ttl
+
+        # Prompt tokens served from cache, accumulated over all calls
+        self.cache_stats = {"calls": 0, "cached_tokens": 0, "prompt_tokens": 0}
+
+        if batch_window_ms is None:
+            batch_window_ms = float(os.getenv("FIND_APARTMENT_BATCH_WINDOW_MS", "0"))
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("FIND_APARTMENT_BATCH_SIZE", "8"))
+
+        if streaming is None:
+            streaming = os.getenv("FIND_APARTMENT_STREAMING", "").lower() in ("1", "true", "yes")
+        self.streaming = streaming
+        self._background_tasks = set()
+
+        self.batcher = None
+        if batch_window_ms > 0:
+            self.batcher = QueryBatcher(
+                self._find_apartment_ids_batch,
+                window_ms=batch_window_ms,
+                max_batch_size=max_batch_size,
+            )
     
-    def _load_prompts(self):
-        """Load prompts from prompt.md file"""
-        prompt_file = Path(__file__).parent / "prompt.md"
-        with open(prompt_file, "r") as f:
-            content = f.read()
-            # Extract system instruction
-            system_start = content.find("## System Instruction") + len("## System Instruction")
-            context_start = content.find("## Context Template")
-            system_end = context_start if context_start > system_start else len(content)
-            self.system_instruction = content[system_start:system_end].strip()
-            
-            # Extract context template
-            context_start = content.find("## Context Template") + len("## Context Template")
-            self.context_template = content[context_start:].strip()
-        
-    async def find_best_apartment(self, query: str, apartments: List[Dict]) -> Dict:
+    def _generation_config(
+        self,
+        response_schema,
+        max_output_tokens: int = 300,
+        cached_content: Optional[str] = None,
+    ):
+        """Build the structured-output generation config shared by all calls"""
+        return types.GenerateContentConfig(
+            # A cached content already carries the system instruction
+            system_instruction=None if cached_content else self.system_instruction,
+            cached_content=cached_content,
+            temperature=0.7,
+            max_output_tokens=max_output_tokens,
+            response_schema=response_schema,
+            response_mime_type="application/json",
+            #thinking_config=types.ThinkingConfig(thinking_budget=0),
+        )
+
+    async def _prepare_request(
+        self,
+        suffix: str,
+        apartments: List[Dict],
+        response_schema,
+        max_output_tokens: int = 300,
+    ) -> Tuple[str, types.GenerateContentConfig, Optional[CachedPrefix]]:
+        """
+        Build the contents and config of a call: catalog prefix first, query last
+
+        When the prefix is held in a provider cache, only the query suffix is
+        sent and the call references the cached content instead. Prompts over
+        a filtered list (e.g. near a place) are not cached.
+
+        Args:
+            suffix: Rendered per-request part of the prompt
+            apartments: Catalog the request is matched against
+            response_schema: Pydantic model for structured output
+            max_output_tokens: Output token limit
+
+        Returns:
+            Tuple of (contents, config, cache entry or None)
+        """
+        prefix = self.prompts.catalog_prefix(apartments)
+        cached = None
+        if self.context_cache is not None and is_catalog_list(apartments):
+            cached = await self.context_cache.get_or_create(
+                prefix.version, self.system_instruction, prefix.text
+            )
+
+        if cached is not None and cached.remote:
+            return suffix, self._generation_config(
+                response_schema, max_output_tokens, cached_content=cached.name
+            ), cached
+
+        return self.prompts.join(prefix, suffix), self._generation_config(
+            response_schema, max_output_tokens
+        ), cached
+
+    def _record_cache_usage(self, response, cached: Optional[CachedPrefix]) -> int:
+        """
+        Report how many prompt tokens of a call were served from cache
+
+        Uses the provider's usage metadata when available (this also covers
+        implicit prefix caching); otherwise, and with the local stand-in, the
+        registered prefix size is reported instead.
+
+        Returns:
+            Number of cached prompt tokens for this call
+        """
+        usage = getattr(response, "usage_metadata", None)
+        provider_cached = getattr(usage, "cached_content_token_count", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+        if cached is not None and (not cached.remote or provider_cached is None):
+            cached_tokens = cached.token_count
+        else:
+            cached_tokens = provider_cached or 0
+
+        self.cache_stats["calls"] += 1
+        self.cache_stats["cached_tokens"] += cached_tokens
+        self.cache_stats["prompt_tokens"] += prompt_tokens
+        version = cached.version if cached is not None else "-"
+        logger.debug("Cached tokens: %d/%d (catalog %s)", cached_tokens, prompt_tokens, version)
+        return cached_tokens
+
+    @staticmethod
+    def _is_max_tokens_reached(response) -> bool:
+        """Check whether generation stopped because it hit max_output_tokens"""
+        try:
+            if hasattr(response, 'candidates') and response.candidates:
+                candidate = response.candidates[0]
+                # Check for finish_reason in various possible formats
+                finish_reason = None
+                if hasattr(candidate, 'finish_reason'):
+                    finish_reason = candidate.finish_reason
+                elif hasattr(candidate, 'finishReason'):
+                    finish_reason = candidate.finishReason
+
+                # Check if finish reason indicates max tokens
+                if finish_reason:
+                    finish_reason_str = str(finish_reason).upper()
+                    return 'MAX_TOKENS' in finish_reason_str or finish_reason_str == 'MAX_TOKENS'
+        except Exception:
+            # If we can't determine, assume not reached
+            pass
+        return False
+
+    @staticmethod
+    def _format_apartment(apt: Dict) -> Dict:
+        """Return basic info with status and qualification for a matched apartment"""
+        # Filter qualification to only include allow_pets and minimum_salary
+        qualification = apt.get("qualification", {})
+        filtered_qualification = {}
+        if qualification:
+            if "allow_pets" in qualification:
+                filtered_qualification["allow_pets"] = qualification["allow_pets"]
+            if "minimum_salary" in qualification:
+                filtered_qualification["minimum_salary"] = qualification["minimum_salary"]
+
+        return {
+            "id": apt.get("id"),
+            "name": apt.get("name"),
+            "street": apt.get("street"),
+            "city": apt.get("city"),
+            "neighbourhood": apt.get("neighbourhood"),
+            "ref_code": apt.get("id"),
+            "price": apt.get("price"),
+            "available": apt.get("status") == "open",
+            "qualification": filtered_qualification if filtered_qualification else None
+        }
+
+    def _build_find_response(self, exists: bool, apartment_ids: List[int], apartments: List[Dict]) -> Dict:
+        """
+        Verify the apartment IDs picked by the model and populate their data
+
+        Args:
+            exists: Whether the model reported matching apartments
+            apartment_ids: IDs picked by the model
+            apartments: List of apartments the IDs refer to
+
+        Returns:
+            Response dict with exists flag, matched apartments and message
+        """
+        if exists and apartment_ids:
+            # AI said exists=True, verify and populate apartment data
+            apartments_by_id = {apt.get("id"): apt for apt in apartments}
+            found_apartments = [
+                apartments_by_id[apt_id] for apt_id in apartment_ids if apt_id in apartments_by_id
+            ]
+
+            if found_apartments:
+                print(f"Returning {len(found_apartments)} apartment(s): exists=True, apartment_ids={apartment_ids}")
+                return {
+                    "exists": True,
+                    "apartments": [self._format_apartment(apt) for apt in found_apartments],
+                    "message": None
+                }
+
+            # AI said exists but no apartments found in list
+            print(f"No apartments found: exists=False, apartment_ids={apartment_ids}")
+            return {
+                "exists": False,
+                "apartment_ids": apartment_ids,
+                "apartments": [],
+                "message": "No matching apartments found"
+            }
+
+        # AI said exists=False or no apartment_ids
+        print(f"No apartments found: exists=False, apartment_ids={apartment_ids}")
+        return {
+            "exists": False,
+            "apartment_ids": [],
+            "apartments": [],
+            "message": "No matching apartments found"
+        }
+
+    async def find_best_apartment(
+        self,
+        query: str,
+        apartments: List[Dict],
+        near: Optional[str] = None,
+        radius_km: float = DEFAULT_RADIUS_KM,
+    ) -> Dict:
         """
         Use Gemini LLM to find the best matching apartment based on user query
-        
+
+        Answers are kept in the result cache per catalog version and
+        normalized query, so repeated queries skip the model on every worker
+        sharing the cache; "no match" answers are kept for a shorter time.
+        When micro-batching is enabled, the query is sent together with other
+        queries arriving within the batch window in a single Gemini call.
+        Otherwise, in streaming mode, the answer is built as soon as the
+        streamed exists and apartment_ids fields are complete.
+
         Args:
             query: User's apartment search query
             apartments: List of apartment dictionaries to search from
+            near: Optional place name; only apartments within radius_km of it
+                are sent to the model
+            radius_km: Radius around `near`, in km
             
         Returns:
             FindApartmentResponse with exists flag and apartment_id
             
         Raises:
-            HTTPException: If API call fails
+            HTTPException: If API call fails, or 400 if `near` is unknown
         """
+        if self.match_cache_ttl <= 0:
+            return await self._find_best_apartment(query, apartments, near, radius_km)
+
+        computed = False
+
+        async def compute() -> Dict:
+            nonlocal computed
+            computed = True
+            return await self._find_best_apartment(query, apartments, near, radius_km)
+
+        key = "\0".join((self.model, " ".join(query.casefold().split()), near or "", str(radius_km)))
+        result = await result_cache.get_or_compute(
+            "find-apartment",
+            get_catalog_version(apartments),
+            key,
+            compute,
+            ttl=self.match_cache_ttl,
+            negative_ttl=self.negative_cache_ttl,
+            is_negative=lambda response: not response["exists"],
+        )
+        if not computed:
+            # Record the model's answer as if it had been asked, so replays
+            # of this exchange give the same response
+            apartment_ids = result.get("apartment_ids") or [apt["id"] for apt in result["apartments"]]
+            record_llm_response(json.dumps({"exists": result["exists"], "apartment_ids": apartment_ids}))
+        return result
+
+    async def _find_best_apartment(
+        self,
+        query: str,
+        apartments: List[Dict],
+        near: Optional[str],
+        radius_km: float,
+    ) -> Dict:
+        """Answer a find_best_apartment query with the model, bypassing the result cache"""
+        if near:
+            apartments = filter_near(apartments, near, radius_km)
+            if not apartments:
+                print(f"No apartments within {radius_km} km of {near}")
+                return self._build_find_response(False, [], apartments)
+
         try:
-            apartments_str = json.dumps(apartments, indent=2)
-            
-            # Format context using template from prompt.md
-            context = self.context_template.format(
-                query=query,
-                apartments_list=apartments_str
+            if self.batcher is not None:
+                gemini_response = await self.batcher.submit(query, apartments)
+                record_llm_response(gemini_response.model_dump_json())
+                return self._build_find_response(
+                    gemini_response.exists, gemini_response.apartment_ids or [], apartments
+                )
+
+            if self.streaming:
+                return await self._find_best_apartment_streaming(query, apartments)
+
+            # Catalog prefix first, query last (see prompt.md)
+            context, config, cached = await self._prepare_request(
+                self.prompts.query_suffix(query), apartments, GeminiApartmentResponse
             )
             
-            # print("before running the config (async)")
-        
-            
             # Pass Pydantic model directly to Gemini for structured output
             response = await self.client.aio.models.generate_content(
                 model=self.model,
                 contents=context,
-                config=types.GenerateContentConfig(
-                    system_instruction=self.system_instruction,
-                    temperature=0.7,
-                    max_output_tokens=300,
-                    response_schema=GeminiApartmentResponse,
-                    response_mime_type="application/json",
-                    #thinking_config=types.ThinkingConfig(thinking_budget=0),
-                ),
+                config=config,
             )
             print("response: ", response)
+            record_llm_response(response.text)
+            self._record_cache_usage(response, cached)
             
             # Check if max tokens was reached
-            max_tokens_reached = False
-            try:
-                if hasattr(response, 'candidates') and response.candidates:
-                    candidate = response.candidates[0]
-                    # Check for finish_reason in various possible formats
-                    finish_reason = None
-                    if hasattr(candidate, 'finish_reason'):
-                        finish_reason = candidate.finish_reason
-                    elif hasattr(candidate, 'finishReason'):
-                        finish_reason = candidate.finishReason
-                    
-                    # Check if finish reason indicates max tokens
-                    if finish_reason:
-                        finish_reason_str = str(finish_reason).upper()
-                        max_tokens_reached = 'MAX_TOKENS' in finish_reason_str or finish_reason_str == 'MAX_TOKENS'
-            except Exception:
-                # If we can't determine, assume not reached
-                max_tokens_reached = False
+            max_tokens_reached = self._is_max_tokens_reached(response)
             
             # Parse structured JSON response
             try:
@@ -116,72 +397,11 @@ class AIService:
                     gemini_response = GeminiApartmentResponse(**response_data)
                     print(f"Manually parsed response: {gemini_response}")
                 
-                # Build response dict
-                exists = gemini_response.exists
-                apartment_ids = gemini_response.apartment_ids or []
-                
                 # If max tokens reached, set exists to False but keep apartment_ids
-                if max_tokens_reached:
-                    exists = False
-                
-                # Verify apartments actually exist in the list and populate data
-                if exists and apartment_ids:
-                    # AI said exists=True, verify and populate apartment data
-                    found_apartments = []
-                    for apt_id in apartment_ids:
-                        for apt in apartments:
-                            if apt.get("id") == apt_id:
-                                found_apartments.append(apt)
-                                break
-                    
-                    if found_apartments:
-                        # Apartments exist, return basic info with status and qualification
-                        print(f"Returning {len(found_apartments)} apartment(s): exists=True, apartment_ids={apartment_ids}")
-                        basic_apartments = []
-                        for apt in found_apartments:
-                            # Filter qualification to only include allow_pets and minimum_salary
-                            qualification = apt.get("qualification", {})
-                            filtered_qualification = {}
-                            if qualification:
-                                if "allow_pets" in qualification:
-                                    filtered_qualification["allow_pets"] = qualification["allow_pets"]
-                                if "minimum_salary" in qualification:
-                                    filtered_qualification["minimum_salary"] = qualification["minimum_salary"]
-                            
-                            basic_apartments.append({
-                                "id": apt.get("id"),
-                                "name": apt.get("name"),
-                                "street": apt.get("street"),
-                                "city": apt.get("city"),
-                                "neighbourhood": apt.get("neighbourhood"),
-                                "ref_code": apt.get("id"),
-                                "price": apt.get("price"),
-                                "available": apt.get("status") == "open",
-                                "qualification": filtered_qualification if filtered_qualification else None
-                            })
-                        return {
-                            "exists": True,
-                            "apartments": basic_apartments,
-                            "message": None
-                        }
-                    else:
-                        # AI said exists but no apartments found in list
-                        print(f"No apartments found: exists=False, apartment_ids={apartment_ids}")
-                        return {
-                            "exists": False,
-                            "apartment_ids": apartment_ids,
-                            "apartments": [],
-                            "message": "No matching apartments found"
-                        }
-                else:
-                    # AI said exists=False or no apartment_ids
-                    print(f"No apartments found: exists=False, apartment_ids={apartment_ids}")
-                    return {
-                        "exists": False,
-                        "apartment_ids": [],
-                        "apartments": [],
-                        "message": "No matching apartments found"
-                    }
+                exists = gemini_response.exists and not max_tokens_reached
+                return self._build_find_response(
+                    exists, gemini_response.apartment_ids or [], apartments
+                )
                 
             except (json.JSONDecodeError, ValueError) as e:
                 # Fallback: if JSON parsing fails, try to extract from text
@@ -189,59 +409,24 @@ class AIService:
                 apartment_id_str = response.text.strip() if response.text else ""
                 apartment_id = self._extract_apartment_id_with_fallback(apartment_id_str, apartments)
                 
-                exists = False
                 found_apartments = []
-                apartment_ids = []
-                
-                if apartment_id is not None:
-                    apartment_ids = [apartment_id]
-                    for apartment in apartments:
-                        if apartment.get("id") == apartment_id:
-                            exists = True
-                            found_apartments = [apartment]
-                            break
-                
-                # If max tokens reached, treat as not found
-                if max_tokens_reached:
-                    exists = False
-                    found_apartments = []
+                if apartment_id is not None and not max_tokens_reached:
+                    found_apartments = [
+                        apt for apt in apartments if apt.get("id") == apartment_id
+                    ][:1]
                 
                 # Return response as dict with apartment data if found, or null with message if not
-                if exists and found_apartments:
-                    # Return basic info with status and qualification
-                    basic_apartments = []
-                    for apt in found_apartments:
-                        # Filter qualification to only include allow_pets and minimum_salary
-                        qualification = apt.get("qualification", {})
-                        filtered_qualification = {}
-                        if qualification:
-                            if "allow_pets" in qualification:
-                                filtered_qualification["allow_pets"] = qualification["allow_pets"]
-                            if "minimum_salary" in qualification:
-                                filtered_qualification["minimum_salary"] = qualification["minimum_salary"]
-                        
-                        basic_apartments.append({
-                            "id": apt.get("id"),
-                            "name": apt.get("name"),
-                            "street": apt.get("street"),
-                            "city": apt.get("city"),
-                            "neighbourhood": apt.get("neighbourhood"),
-                            "ref_code": apt.get("id"),
-                            "price": apt.get("price"),
-                            "available": apt.get("status") == "open",
-                            "qualification": filtered_qualification if filtered_qualification else None
-                        })
+                if found_apartments:
                     return {
                         "exists": True,
-                        "apartments": basic_apartments,
+                        "apartments": [self._format_apartment(apt) for apt in found_apartments],
                         "message": None
                     }
-                else:
-                    return {
-                        "exists": False,
-                        "apartments": [],
-                        "message": "No matching apartments found"
-                    }
+                return {
+                    "exists": False,
+                    "apartments": [],
+                    "message": "No matching apartments found"
+                }
         
         except ValueError as e:
             raise HTTPException(
@@ -251,6 +436,135 @@ class AIService:
             raise HTTPException(
                 status_code=500, detail=f"Error calling Gemini API: {str(e)}"
             )
+
+    async def _find_best_apartment_streaming(self, query: str, apartments: List[Dict]) -> Dict:
+        """
+        Stream the Gemini response and answer as soon as the IDs are known
+
+        The streamed JSON is parsed incrementally; once both exists and
+        apartment_ids are complete the matched apartments are hydrated and the
+        rest of the stream is cancelled in the background.
+
+        Args:
+            query: User's apartment search query
+            apartments: List of apartment dictionaries to search from
+
+        Returns:
+            Same response dict as find_best_apartment
+        """
+        context, config, cached = await self._prepare_request(
+            self.prompts.query_suffix(query), apartments, GeminiApartmentResponse
+        )
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=context,
+            config=config,
+        )
+
+        parser = IncrementalJSONObjectParser()
+        max_tokens_reached = False
+        usage_chunk = None
+        async for chunk in stream:
+            parser.feed(chunk.text or "")
+            if getattr(chunk, "usage_metadata", None) is not None:
+                usage_chunk = chunk
+            # The chunk completing the fields may also be the one cut off
+            max_tokens_reached = self._is_max_tokens_reached(chunk)
+            if parser.has_fields("exists", "apartment_ids"):
+                # Don't wait for the stream to wind down before answering
+                if hasattr(stream, "aclose"):
+                    task = asyncio.ensure_future(stream.aclose())
+                    self._background_tasks.add(task)
+                    task.add_done_callback(self._background_tasks.discard)
+                break
+        else:
+            logger.warning("Stream ended before exists and apartment_ids were complete: %r", parser.text)
+        record_llm_response(parser.text)
+        self._record_cache_usage(usage_chunk, cached)
+
+        if parser.has_fields("exists", "apartment_ids"):
+            gemini_response = GeminiApartmentResponse(
+                exists=parser.fields["exists"],
+                apartment_ids=parser.fields["apartment_ids"] or []
+            )
+            logger.debug("Streamed response: %s", gemini_response)
+            return self._build_find_response(
+                gemini_response.exists and not max_tokens_reached,
+                gemini_response.apartment_ids,
+                apartments
+            )
+
+        # Incomplete JSON: fall back to extracting an ID from the text
+        apartment_id = self._extract_apartment_id(parser.text, apartments)
+        if apartment_id is not None and not max_tokens_reached:
+            return self._build_find_response(True, [apartment_id], apartments)
+        return {
+            "exists": False,
+            "apartments": [],
+            "message": "No matching apartments found"
+        }
+
+    async def _find_apartment_ids_batch(
+        self, queries: List[str], apartments: List[Dict]
+    ) -> List[GeminiApartmentResponse]:
+        """
+        Match several queries against the catalog in a single Gemini call
+
+        Args:
+            queries: User queries sharing the same catalog
+            apartments: List of apartment dictionaries to search from
+
+        Returns:
+            One GeminiApartmentResponse per query, in the same order
+        """
+        if len(queries) == 1:
+            context, config, cached = await self._prepare_request(
+                self.prompts.query_suffix(queries[0]), apartments, GeminiApartmentResponse
+            )
+            response = await self.client.aio.models.generate_content(
+                model=self.model, contents=context, config=config
+            )
+            self._record_cache_usage(response, cached)
+            if self._is_max_tokens_reached(response):
+                # The JSON may be cut off mid-way: treat it as no match
+                return [GeminiApartmentResponse(exists=False, apartment_ids=[])]
+            parsed = response.parsed
+            if parsed is None:
+                parsed = GeminiApartmentResponse(**json.loads(response.text or "{}"))
+            return [parsed]
+
+        context, config, cached = await self._prepare_request(
+            self.prompts.batch_query_suffix(queries),
+            apartments,
+            GeminiBatchApartmentResponse,
+            max_output_tokens=300 * len(queries),
+        )
+        response = await self.client.aio.models.generate_content(
+            model=self.model, contents=context, config=config
+        )
+        self._record_cache_usage(response, cached)
+
+        if self._is_max_tokens_reached(response):
+            # The batch JSON is cut off: ask again per query so one long
+            # answer does not fail the others
+            logger.warning("Batch of %d queries hit max tokens, retrying individually", len(queries))
+            singles = await asyncio.gather(
+                *(self._find_apartment_ids_batch([query], apartments) for query in queries)
+            )
+            return [single[0] for single in singles]
+
+        parsed = response.parsed
+        if parsed is None:
+            parsed = GeminiBatchApartmentResponse(**json.loads(response.text or "{}"))
+
+        # Queries the model skipped count as no match
+        results = [GeminiApartmentResponse(exists=False, apartment_ids=[]) for _ in queries]
+        for result in parsed.results:
+            if 0 <= result.query_index < len(queries):
+                results[result.query_index] = GeminiApartmentResponse(
+                    exists=result.exists, apartment_ids=result.apartment_ids
+                )
+        return results
     
     def _extract_apartment_id(self, response_text: str, apartments: List[Dict]) -> Optional[int]:
         """
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from typing import Dict, NamedTuple, Optional
+
+from google.genai import errors, types
+
+from utils.catalog_store import VersionedCache, catalog_name
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPrefix(NamedTuple):
+    """A catalog prefix registered with a context cache"""
+    name: str
+    version: str
+    token_count: int
+    # True when the provider holds the prefix, so it must not be sent inline
+    remote: bool
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class LocalContextCache:
+    """
+    Offline stand-in for provider context caching.
+
+    Registers prefixes per catalog version and reports the tokens a provider
+    cache would have served, but keeps nothing remotely: callers still send the
+    prefix inline. Only whole catalogs are registered; prompts over filtered
+    lists are sent uncached. Useful to exercise and measure the caching flow in
+    development and tests without creating provider-side caches.
+    """
+
+    provider = "local"
+
+    def __init__(self):
+        self._entries: Dict[str, CachedPrefix] = VersionedCache()
+        self.created = 0
+
+    async def get_or_create(
+        self, version: str, system_instruction: str, prefix_text: str
+    ) -> Optional[CachedPrefix]:
+        """
+        Get the cache entry for a catalog version, registering it if needed
+
+        Args:
+            version: Catalog version the prefix was rendered from
+            system_instruction: System instruction stored with the prefix
+            prefix_text: Rendered catalog prefix
+
+        Returns:
+            CachedPrefix for this version
+        """
+        entry = self._entries.get(version)
+        if entry is None:
+            # Only the current version of each catalog is kept
+            entry = self._entries.put(version, CachedPrefix(
+                name=f"local/catalog-{version}",
+                version=version,
+                token_count=estimate_tokens(system_instruction + prefix_text),
+                remote=False,
+            ))
+            self.created += 1
+        return entry
+
+
+class GeminiContextCache:
+    """
+    Gemini explicit context caching of the catalog prefix.
+
+    One cached content is created per catalog version and reused until it is
+    close to expiring; entries for older versions of the same catalog are
+    deleted in the background. Only whole catalogs are cached: prompts over
+    filtered lists are sent uncached. Concurrent requests for the same version
+    share one creation call. If Gemini rejects a prefix (e.g. it is below the
+    minimum cacheable size), the version is remembered and sent inline
+    instead; other failures (timeouts, server errors) are retried after
+    RETRY_SECONDS.
+    """
+
+    provider = "gemini"
+
+    # Wait before retrying a creation that failed for a transient reason
+    RETRY_SECONDS = 60
+
+    def __init__(self, client, model: str, ttl_seconds: int = 3600):
+        """
+        Args:
+            client: google.genai Client
+            model: Model the cached content is created for
+            ttl_seconds: Lifetime of each cached content
+        """
+        self.client = client
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, CachedPrefix] = VersionedCache()
+        self._expires_at: Dict[str, float] = VersionedCache()
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Versions Gemini rejected, and when failed creations may be retried;
+        # dropped with their catalog version like the entries themselves
+        self._uncacheable: Dict[str, bool] = VersionedCache()
+        self._retry_at: Dict[str, float] = VersionedCache()
+        self._background_tasks = set()
+
+    async def get_or_create(
+        self, version: str, system_instruction: str, prefix_text: str
+    ) -> Optional[CachedPrefix]:
+        """
+        Get the cached content for a catalog version, creating it if needed
+
+        Args:
+            version: Catalog version the prefix was rendered from
+            system_instruction: System instruction stored in the cache
+            prefix_text: Rendered catalog prefix
+
+        Returns:
+            CachedPrefix, or None if this version cannot be cached
+        """
+        if version in self._uncacheable or time.monotonic() < self._retry_at.get(version, 0):
+            return None
+
+        entry = self._entries.get(version)
+        # Refresh a little before expiry so in-flight calls never hit a dead cache
+        if entry is not None and time.monotonic() < self._expires_at[version] - 60:
+            return entry
+
+        pending = self._pending.get(version)
+        if pending is not None:
+            return await pending
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[version] = future
+        try:
+            entry = await self._create(version, system_instruction, prefix_text)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            if isinstance(e, errors.ClientError) and e.code == 400:
+                # Invalid request, e.g. a prefix below the minimum cacheable size
+                logger.warning("Context cache rejected for catalog %s: %s", version, e)
+                self._uncacheable.put(version, True)
+            else:
+                logger.warning(
+                    "Context cache unavailable for catalog %s, retrying in %d s: %s",
+                    version, self.RETRY_SECONDS, e,
+                )
+                self._retry_at.put(version, time.monotonic() + self.RETRY_SECONDS)
+            future.set_result(None)
+            return None
+        finally:
+            # Cancelled creations must not leave the callers waiting on it hanging
+            if not future.done():
+                future.set_result(None)
+            del self._pending[version]
+
+    async def _create(self, version: str, system_instruction: str, prefix_text: str) -> CachedPrefix:
+        cached = await self.client.aio.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"catalog-{version}",
+                system_instruction=system_instruction,
+                contents=[prefix_text],
+                ttl=f"{self.ttl_seconds}s",
+            ),
+        )
+        usage = getattr(cached, "usage_metadata", None)
+        token_count = getattr(usage, "total_token_count", None) or estimate_tokens(
+            system_instruction + prefix_text
+        )
+
+        # Drop caches of previous versions of the same catalog; those of
+        # evicted tenants are left to expire
+        for old_version, old_entry in list(self._entries.items()):
+            if old_version != version and catalog_name(old_version) == catalog_name(version):
+                del self._entries[old_version]
+                del self._expires_at[old_version]
+                self._delete_in_background(old_entry.name)
+        # A refresh replaces this version's cache: delete the one it replaces
+        refreshed = self._entries.get(version)
+        if refreshed is not None:
+            self._delete_in_background(refreshed.name)
+        # Failures recorded for this catalog are stale once a version is cached
+        for failures in (self._uncacheable, self._retry_at):
+            for old_version in list(failures):
+                if catalog_name(old_version) == catalog_name(version):
+                    del failures[old_version]
+
+        entry = CachedPrefix(name=cached.name, version=version, token_count=token_count, remote=True)
+        self._entries[version] = entry
+        self._expires_at[version] = time.monotonic() + self.ttl_seconds
+        return entry
+
+    def _delete_in_background(self, name: str) -> None:
+        async def delete():
+            try:
+                await self.client.aio.caches.delete(name=name)
+            except Exception as e:
+                logger.warning("Failed to delete context cache %s: %s", name, e)
+
+        task = asyncio.ensure_future(delete())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
@@ -0,0 +1,90 @@
+import json
+from typing import Any, Dict, Optional
+
+
+class IncrementalJSONObjectParser:
+    """
+    Incremental parser for a streamed top-level JSON object.
+
+    Text is fed chunk by chunk as it arrives from the model; every top-level
+    field is decoded as soon as its value is complete, without waiting for the
+    rest of the object. Only the unscanned tail of the text is examined on each
+    feed, so parsing cost stays linear in the response length.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """
+        Consume the next chunk of text.
+
+        Args:
+            chunk: Newly received text
+
+        Returns:
+            Top-level fields completed by this chunk (name -> decoded value)
+        """
+        self.text += chunk
+        completed: Dict[str, Any] = {}
+        text = self.text
+
+        while self._pos < len(text):
+            ch = text[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None:
+                        # Closing quote of a top-level key
+                        self._key = json.loads(text[self._string_start:self._pos + 1])
+                self._pos += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif ch == ":" and self._depth == 1 and self._value_start is None:
+                self._value_start = self._pos + 1
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    # Nested value closed: it is complete right now
+                    self._pos += 1
+                    self._complete(text[self._value_start:self._pos], completed)
+                    continue
+                if self._depth == 0 and self._value_start is not None:
+                    self._complete(text[self._value_start:self._pos], completed)
+            elif ch == "," and self._depth == 1 and self._value_start is not None:
+                self._complete(text[self._value_start:self._pos], completed)
+
+            self._pos += 1
+
+        return completed
+
+    def _complete(self, raw_value: str, completed: Dict[str, Any]) -> None:
+        raw_value = raw_value.strip()
+        if self._key is not None and raw_value:
+            value = json.loads(raw_value)
+            self.fields[self._key] = value
+            completed[self._key] = value
+        self._key = None
+        self._value_start = None
+
+    def has_fields(self, *names: str) -> bool:
+        """Check whether all the given top-level fields are complete"""
+        return all(name in self.fields for name in names)
@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from models.apartment import encode_record
+from utils.catalog_store import VersionedCache
+from utils.apartment_loader import get_catalog_version
+
+
+class CatalogPrefix(NamedTuple):
+    """Static, versioned part of the prompt shared by every query on a catalog"""
+    version: str
+    text: str
+
+
+class PromptBuilder:
+    """
+    Builds Gemini prompts as a static catalog prefix followed by the query.
+
+    The system instruction and the catalog come first and only change when the
+    catalog changes, so they form a stable prefix that can be cached by the
+    provider; the query is always appended last.
+    """
+
+    # Number of versions of each catalog whose rendered prefix is kept in memory
+    PREFIX_CACHE_SIZE = 4
+
+    def __init__(self, prompt_file: Path = None):
+        """
+        Args:
+            prompt_file: Markdown file with the prompt sections (defaults to prompt.md)
+        """
+        prompt_file = prompt_file or Path(__file__).parent / "prompt.md"
+        with open(prompt_file, "r") as f:
+            content = f.read()
+
+        # Split the file into its "## " sections
+        sections = {}
+        for block in content.split("\n## ")[1:]:
+            title, _, body = block.partition("\n")
+            sections[title.strip()] = body.strip()
+
+        self.system_instruction = sections["System Instruction"]
+        self.catalog_template = sections["Catalog Template"]
+        self.query_template = sections["Query Template"]
+        self.batch_query_template = sections["Batch Query Template"]
+        self._prefixes: Dict[str, CatalogPrefix] = VersionedCache(per_catalog=self.PREFIX_CACHE_SIZE)
+
+    def catalog_prefix(self, apartments: List[Dict]) -> CatalogPrefix:
+        """
+        Render the catalog part of the prompt, cached per catalog version
+
+        Args:
+            apartments: List of apartment dictionaries
+
+        Returns:
+            CatalogPrefix with the catalog version and rendered text
+        """
+        version = get_catalog_version(apartments)
+        prefix = self._prefixes.get(version)
+        if prefix is None:
+            prefix = CatalogPrefix(
+                version=version,
+                text=self.catalog_template.format(
+                    catalog_version=version,
+                    apartments_list=json.dumps(apartments, indent=2, default=encode_record)
+                )
+            )
+            self._prefixes.put(version, prefix)
+        return prefix
+
+    def query_suffix(self, query: str) -> str:
+        """Render the per-request part of the prompt for a single query"""
+        return self.query_template.format(query=query)
+
+    def batch_query_suffix(self, queries: List[str]) -> str:
+        """Render the per-request part of the prompt for several queries"""
+        queries_list = "\n".join(
+            f"{index}. {json.dumps(query, ensure_ascii=False)}" for index, query in enumerate(queries)
+        )
+        return self.batch_query_template.format(queries_list=queries_list)
+
+    @staticmethod
+    def join(prefix: CatalogPrefix, suffix: str) -> str:
+        """Build the full prompt, catalog first and query last"""
+        return f"{prefix.text}\n\n{suffix}"
@@ -0,0 +1,113 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from models.schemas import GeminiApartmentResponse
+from utils.apartment_loader import get_catalog_version
+
+# Runs one LLM call for several queries against the same catalog and returns
+# one result per query, in the same order
+BatchRunner = Callable[[List[str], List[Dict]], Awaitable[List[GeminiApartmentResponse]]]
+
+
+class _PendingBatch:
+    """Queries waiting to be sent together against one catalog version"""
+
+    def __init__(self, apartments: List[Dict]):
+        self.apartments = apartments
+        self.queries: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class QueryBatcher:
+    """
+    Micro-batcher that groups concurrent find-apartment queries into one LLM call.
+
+    The first query of a batch opens a short collection window; the batch is
+    sent when the window closes or when it reaches max_batch_size, whichever
+    comes first. Queries are grouped per catalog version so that every query in
+    a call shares the same catalog context, and duplicate queries in a batch
+    are only sent once.
+    """
+
+    def __init__(
+        self,
+        run_batch: BatchRunner,
+        window_ms: float = 20.0,
+        max_batch_size: int = 8,
+    ):
+        """
+        Args:
+            run_batch: Coroutine running a batch of queries in a single LLM call
+            window_ms: How long to wait for more queries after the first one
+            max_batch_size: Send the batch immediately once it has this many queries
+        """
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._tasks = set()
+
+        # Counters for monitoring how much batching is saving
+        self.queries_submitted = 0
+        self.calls_made = 0
+
+    async def submit(self, query: str, apartments: List[Dict]) -> GeminiApartmentResponse:
+        """
+        Queue a query and wait for its result from the shared call.
+
+        Args:
+            query: User's apartment search query
+            apartments: Catalog the query is matched against
+
+        Returns:
+            GeminiApartmentResponse for this query
+        """
+        loop = asyncio.get_running_loop()
+        version = get_catalog_version(apartments)
+
+        batch = self._pending.get(version)
+        if batch is None:
+            batch = _PendingBatch(apartments)
+            batch.timer = loop.call_later(self.window, self._flush, version)
+            self._pending[version] = batch
+
+        future = loop.create_future()
+        self.queries_submitted += 1
+        batch.queries.append(query)
+        batch.futures.append(future)
+
+        if len(batch.queries) >= self.max_batch_size:
+            self._flush(version)
+
+        return await future
+
+    def _flush(self, version: str) -> None:
+        batch = self._pending.pop(version, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.ensure_future(self._run(batch))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _PendingBatch) -> None:
+        # Send each distinct query once and fan its result back to every waiter
+        unique_queries = list(dict.fromkeys(batch.queries))
+        self.calls_made += 1
+        try:
+            results = await self.run_batch(unique_queries, batch.apartments)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_query: Dict[str, GeminiApartmentResponse] = dict(zip(unique_queries, results))
+        for query, future in zip(batch.queries, batch.futures):
+            if not future.done():
+                future.set_result(
+                    by_query.get(query) or GeminiApartmentResponse(exists=False, apartment_ids=[])
+                )
+
@@ -1,5 +1,5 @@
-from .apartment_loader import load_apartments
+from .apartment_loader import load_apartments, get_apartment, get_catalog_version
 
-__all__ = ["load_apartments"]
+__all__ = ["load_apartments", "get_apartment", "get_catalog_version"]
 
 
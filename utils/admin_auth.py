@@ -0,0 +1,27 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+
+def is_admin_key(key: Optional[str]) -> bool:
+    """Whether a key matches ADMIN_API_KEY (never, when it is not configured)"""
+    expected = os.getenv("ADMIN_API_KEY")
+    if not expected or key is None:
+        return False
+    return secrets.compare_digest(key.encode(), expected.encode())
+
+
+def require_admin_key(x_api_key: Optional[str] = Header(default=None)) -> None:
+    """
+    FastAPI dependency guarding admin endpoints with the X-API-Key header.
+
+    Raises:
+        HTTPException: 503 if ADMIN_API_KEY is not configured, 401 if the
+            header is missing or does not match
+    """
+    if not os.getenv("ADMIN_API_KEY"):
+        raise HTTPException(status_code=503, detail="ADMIN_API_KEY not configured")
+    if not is_admin_key(x_api_key):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-Key")
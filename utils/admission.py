@@ -0,0 +1,374 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from fastapi.responses import JSONResponse
+
+from utils.admin_auth import is_admin_key
+
+# Callers whose token buckets are kept; the least recently seen are dropped
+MAX_TRACKED_CALLERS = 10000
+
+
+class RouteClass(NamedTuple):
+    """
+    Admission settings shared by a group of routes.
+
+    Lower priority values are admitted first when requests queue up.
+    """
+    name: str
+    priority: int
+    max_concurrency: int
+    cost: float
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second, up to burst"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """
+        Take cost tokens if available.
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds until they will be
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost: float) -> None:
+        """Give back tokens taken for a request that did not run"""
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class Rejected(Exception):
+    """A request was not admitted"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _route_classes() -> Dict[str, RouteClass]:
+    return {
+        # Single-listing reads and bookings: cheap, answered first
+        "lookup": RouteClass(
+            "lookup", 0, int(os.getenv("ADMISSION_LOOKUP_CONCURRENCY", "64")), 1
+        ),
+        # Index scans over the catalog and the schedule
+        "search": RouteClass(
+            "search", 1, int(os.getenv("ADMISSION_SEARCH_CONCURRENCY", "16")), 2
+        ),
+        # Gemini calls: slow, and each one holds a provider request
+        "llm": RouteClass("llm", 2, int(os.getenv("ADMISSION_LLM_CONCURRENCY", "8")), 5),
+    }
+
+
+# Class of each /tool/* route; unlisted routes are lookups
+ROUTE_CLASS_NAMES = {
+    "/tool/find-apartment": "llm",
+    "/tool/search-apartments": "search",
+    "/tool/similar-apartments": "search",
+    "/tool/nearby-apartments": "search",
+    "/tool/check-eligibility": "search",
+    "/tool/search-availability": "search",
+    "/tool/plan-tour": "search",
+    "/tool/get-apartments": "search",
+}
+
+
+class AdmissionController:
+    """
+    Per-caller rate limits, concurrency limits and priority queueing for the
+    tool endpoints.
+
+    Each caller has a token bucket; a request costs tokens according to its
+    route class and is rejected once the bucket is empty. Callers are client
+    addresses; the X-Caller-ID header only names the caller when it comes
+    from a trusted proxy or with the admin key, since anyone else could pick
+    a fresh ID per request. Tokens of shed requests are refunded. Admitted requests
+    run within their class's concurrency limit and the global one; when
+    either is reached they queue, and freed slots go to the highest-priority
+    waiter (cheap lookups before searches before LLM calls). A request that
+    waits longer than the queueing delay target is shed, and from then on
+    new arrivals of that priority or lower that would have to queue are shed
+    immediately for one more target interval, instead of joining a queue
+    they would time out in.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        queue_target_ms: Optional[float] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[float] = None,
+        trusted_proxies: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_concurrency: Requests running at once across all classes. If
+                not provided, uses ADMISSION_MAX_CONCURRENCY (default 64)
+            queue_target_ms: Longest a request may queue before being shed. If
+                not provided, uses ADMISSION_QUEUE_TARGET_MS (default 250)
+            rate_per_second: Tokens each caller earns per second (0 disables
+                rate limiting). If not provided, uses ADMISSION_RATE_PER_SECOND
+                (default 20)
+            burst: Bucket size per caller. If not provided, uses
+                ADMISSION_BURST (default 40)
+            trusted_proxies: Comma-separated client addresses whose
+                X-Caller-ID header is honored. If not provided, uses
+                ADMISSION_TRUSTED_PROXIES (default none)
+        """
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+        if queue_target_ms is None:
+            queue_target_ms = float(os.getenv("ADMISSION_QUEUE_TARGET_MS", "250"))
+        if rate_per_second is None:
+            rate_per_second = float(os.getenv("ADMISSION_RATE_PER_SECOND", "20"))
+        if burst is None:
+            burst = float(os.getenv("ADMISSION_BURST", "40"))
+        if trusted_proxies is None:
+            trusted_proxies = os.getenv("ADMISSION_TRUSTED_PROXIES", "")
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_target = queue_target_ms / 1000
+        self.rate = rate_per_second
+        self.burst = burst
+        self.trusted_proxies: Set[str] = {
+            address.strip() for address in trusted_proxies.split(",") if address.strip()
+        }
+        self.classes = _route_classes()
+
+        self.in_flight: Dict[str, int] = {name: 0 for name in self.classes}
+        self._total_in_flight = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # (priority, seq, route_class, enqueued_at, future)
+        self._waiting: List[Tuple[int, int, RouteClass, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._shed_until: Dict[int, float] = {}
+
+        self.admitted = {name: 0 for name in self.classes}
+        self.rejected = {"rate_limited": 0, "overloaded": 0}
+        self.queued = 0
+        self._queue_wait_total = 0.0
+
+    def route_class(self, path: str) -> RouteClass:
+        """Class of a /tool/* route"""
+        return self.classes[ROUTE_CLASS_NAMES.get(path, "lookup")]
+
+    def caller(self, scope: Dict[str, Any]) -> str:
+        """
+        Identity a request is rate limited under.
+
+        Args:
+            scope: ASGI scope of the request
+
+        Returns:
+            The X-Caller-ID header when sent by a trusted proxy or with the
+            admin key, otherwise the client address
+        """
+        headers = dict(scope["headers"])
+        address = scope["client"][0] if scope.get("client") else "unknown"
+        caller_id = headers.get(b"x-caller-id", b"").decode("latin-1")
+        api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+        if caller_id and (address in self.trusted_proxies or is_admin_key(api_key)):
+            return f"id:{caller_id}"
+        return address
+
+    def check_rate(self, caller: str, route_class: RouteClass, now: float) -> None:
+        """
+        Take the request's tokens from the caller's bucket.
+
+        Raises:
+            Rejected: If the caller is over its rate
+        """
+        if self.rate <= 0:
+            return
+        bucket = self._buckets.get(caller)
+        if bucket is None:
+            bucket = self._buckets[caller] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > MAX_TRACKED_CALLERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(caller)
+        wait = bucket.take(min(route_class.cost, self.burst), now)
+        if wait:
+            self.rejected["rate_limited"] += 1
+            raise Rejected("Rate limit exceeded", wait)
+
+    def refund(self, caller: str, route_class: RouteClass) -> None:
+        """Give back the tokens check_rate took for a request that did not run"""
+        bucket = self._buckets.get(caller)
+        if bucket is not None:
+            bucket.refund(min(route_class.cost, self.burst))
+
+    async def acquire(self, route_class: RouteClass) -> None:
+        """
+        Wait for a slot to run a request of a class.
+
+        Raises:
+            Rejected: If the request was shed
+        """
+        now = time.monotonic()
+        if self._can_start(route_class) and not self._queued_ahead(route_class):
+            self._start(route_class)
+            return
+
+        if any(
+            until > now
+            for priority, until in self._shed_until.items()
+            if priority <= route_class.priority
+        ):
+            self.rejected["overloaded"] += 1
+            raise Rejected("Server overloaded", self.queue_target)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiting, (route_class.priority, next(self._seq), route_class, now, future)
+        )
+        self.queued += 1
+        try:
+            await asyncio.wait({future}, timeout=self.queue_target)
+        except BaseException:
+            # Client went away; give back a slot granted in the meantime
+            if future.done() and not future.cancelled():
+                self.release(route_class)
+            future.cancel()
+            raise
+
+        waited = time.monotonic() - now
+        self._queue_wait_total += waited
+        if not future.done():
+            future.cancel()
+            self._shed_until[route_class.priority] = time.monotonic() + self.queue_target
+            self.rejected["overloaded"] += 1
+            raise Rejected("Server overloaded", self.queue_target)
+
+    def release(self, route_class: RouteClass) -> None:
+        """Free the slot of a finished request and start queued ones"""
+        self.in_flight[route_class.name] -= 1
+        self._total_in_flight -= 1
+
+        blocked = []
+        while self._waiting and self._total_in_flight < self.max_concurrency:
+            entry = heapq.heappop(self._waiting)
+            waiter_class, future = entry[2], entry[4]
+            if future.done():
+                continue
+            if not self._can_start(waiter_class):
+                blocked.append(entry)
+                continue
+            self._start(waiter_class)
+            future.set_result(None)
+        for entry in blocked:
+            heapq.heappush(self._waiting, entry)
+
+    def _can_start(self, route_class: RouteClass) -> bool:
+        return (
+            self._total_in_flight < self.max_concurrency
+            and self.in_flight[route_class.name] < route_class.max_concurrency
+        )
+
+    def _queued_ahead(self, route_class: RouteClass) -> bool:
+        # Newcomers don't overtake queued requests of the same or higher priority
+        return any(
+            priority <= route_class.priority and not future.done()
+            for priority, _, _, _, future in self._waiting
+        )
+
+    def _start(self, route_class: RouteClass) -> None:
+        self.in_flight[route_class.name] += 1
+        self._total_in_flight += 1
+        self.admitted[route_class.name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests running and queued, and admission and rejection counts"""
+        return {
+            "in_flight": dict(self.in_flight),
+            "queue_depth": sum(1 for entry in self._waiting if not entry[4].done()),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "queued": self.queued,
+            "avg_queue_wait_ms": round(self._queue_wait_total / self.queued * 1000, 3)
+            if self.queued else 0,
+            "limits": {
+                "max_concurrency": self.max_concurrency,
+                "per_class": {name: cls.max_concurrency for name, cls in self.classes.items()},
+                "queue_target_ms": self.queue_target * 1000,
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "trusted_proxies": sorted(self.trusted_proxies),
+            },
+        }
+
+
+# Shared controller used by the API
+admission = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+    Apply admission control to /tool/* requests.
+
+    Callers are identified by their address, or by the X-Caller-ID header
+    when the controller trusts it. Rejected requests get 429 with a
+    Retry-After header; other routes pass through.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path.startswith("/t/"):
+            # Tenant-prefixed route, /t/{tenant_id}/tool/...
+            path = "/" + path[3:].partition("/")[2]
+        if not path.startswith("/tool/"):
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.controller.route_class(path)
+        caller = self.controller.caller(scope)
+
+        try:
+            self.controller.check_rate(caller, route_class, time.monotonic())
+            try:
+                await self.controller.acquire(route_class)
+            except BaseException:
+                # Shed (or abandoned) requests did no work: don't charge for them
+                self.controller.refund(caller, route_class)
+                raise
+        except Rejected as e:
+            response = JSONResponse(
+                {"detail": str(e)},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
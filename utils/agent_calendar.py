@@ -0,0 +1,290 @@
+import json
+import random
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from utils.apartment_loader import load_apartments
+from utils.geo_index import area_key
+from utils.schedule_generator import (
+    DEFAULT_OPEN_TIME,
+    DEFAULT_SLOT_MINUTES,
+    SLOT_FORMAT,
+    calculate_slot_score,
+    iter_slot_times,
+)
+
+# Seed and share of busy slots for the mock agent calendars
+AGENT_SEED = 7
+AGENT_BUSY_PROBABILITY = 0.25
+
+# Extra weight for viewings in an agent's home area (the first in its list)
+HOME_AREA_BONUS = 10
+
+
+@lru_cache(maxsize=1)
+def load_agents() -> List[Dict]:
+    """
+    Load agents from agents.json
+
+    Raises:
+        HTTPException: If file not found or invalid JSON
+    """
+    agents_file = Path(__file__).parent.parent / "agents.json"
+    try:
+        with open(agents_file, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="agents.json file not found")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=500, detail=f"Invalid JSON in agents.json: {str(e)}")
+
+
+def max_weight_assignment(weights: Sequence[Sequence[Optional[float]]]) -> List[Tuple[int, int]]:
+    """
+    Maximum-weight assignment of rows to columns (Hungarian algorithm).
+
+    Every row gets a zero-weight "unassigned" option, so a row is only matched
+    when that adds weight, and None marks a pair that cannot be matched.
+
+    Args:
+        weights: Row-by-column weight matrix
+
+    Returns:
+        List of matched (row, column) pairs
+    """
+    rows = len(weights)
+    if not rows:
+        return []
+    cols = len(weights[0])
+
+    # Minimize cost over real columns plus one dummy column per row
+    forbidden = float(sum(abs(w) for row in weights for w in row if w is not None) + 1)
+    cost = np.zeros((rows + 1, cols + rows + 1))
+    cost[1:, 1:cols + 1] = [[forbidden if w is None else -w for w in row] for row in weights]
+
+    width = cols + rows
+    u = np.zeros(rows + 1)
+    v = np.zeros(width + 1)
+    owner = np.zeros(width + 1, dtype=int)
+    way = np.zeros(width + 1, dtype=int)
+    for row in range(1, rows + 1):
+        owner[0] = row
+        col0 = 0
+        min_v = np.full(width + 1, np.inf)
+        used = np.zeros(width + 1, dtype=bool)
+        while owner[col0] != 0:
+            used[col0] = True
+            row0 = owner[col0]
+            free = ~used
+            reduced = cost[row0] - u[row0] - v
+            better = free & (reduced < min_v)
+            min_v[better] = reduced[better]
+            way[better] = col0
+            candidates = np.where(free, min_v, np.inf)
+            col1 = int(np.argmin(candidates))
+            delta = candidates[col1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_v[free] -= delta
+            col0 = col1
+        while col0:
+            col1 = way[col0]
+            owner[col0] = owner[col1]
+            col0 = col1
+
+    return [
+        (int(owner[col]) - 1, col - 1)
+        for col in range(1, cols + 1)
+        if owner[col] and weights[owner[col] - 1][col - 1] is not None
+    ]
+
+
+class AgentCalendar:
+    """
+    Availability of one agent as a bitset per day.
+
+    Bit i of a day's mask is set when the agent is free for the i-th slot of
+    the schedule grid. Free bits come from the agent's working days and a
+    mock calendar; slots taken by assigned viewings are tracked separately.
+    """
+
+    def __init__(self, agent: Dict):
+        """
+        Args:
+            agent: Agent dictionary with id, name, areas and working_days
+        """
+        self.agent = agent
+        self.areas = agent.get("areas", [])
+        self._free: Dict[date, int] = {}
+        self._assigned: Dict[date, int] = {}
+
+    @property
+    def id(self) -> int:
+        return self.agent["id"]
+
+    def covers(self, apartment: Dict) -> bool:
+        """Check whether the apartment is in one of the agent's areas"""
+        return area_key(apartment) in self.areas
+
+    def free_mask(self, day: date) -> int:
+        """Slots the agent works and has no other commitment on a day"""
+        mask = self._free.get(day)
+        if mask is None:
+            mask = 0
+            if day.weekday() in self.agent.get("working_days", range(5)):
+                for index, slot_time in enumerate(iter_slot_times(day, day + timedelta(days=1))):
+                    rng = random.Random(f"{AGENT_SEED}:{self.id}:{slot_time.strftime(SLOT_FORMAT)}")
+                    if rng.random() >= AGENT_BUSY_PROBABILITY:
+                        mask |= 1 << index
+            self._free[day] = mask
+        return mask
+
+    def assigned_mask(self, day: date) -> int:
+        """Slots taken by viewings assigned to the agent on a day"""
+        return self._assigned.get(day, 0)
+
+    def is_free(self, day: date, index: int) -> bool:
+        return bool(self.free_mask(day) >> index & 1)
+
+    def set_assigned(self, day: date, index: int, assigned: bool) -> None:
+        if assigned:
+            self._assigned[day] = self.assigned_mask(day) | 1 << index
+        else:
+            self._assigned[day] = self.assigned_mask(day) & ~(1 << index)
+
+
+def slot_position(slot: str) -> Tuple[date, int, datetime]:
+    """Split a "DD-MM-YYYY HH:MM" slot into its day and index in the day's grid"""
+    slot_time = datetime.strptime(slot, SLOT_FORMAT)
+    opening = datetime.combine(slot_time.date(), DEFAULT_OPEN_TIME)
+    index = int((slot_time - opening).total_seconds() // 60) // DEFAULT_SLOT_MINUTES
+    return slot_time.date(), index, slot_time
+
+
+class AgentRoster:
+    """
+    Staffing of booked viewings with agents.
+
+    Viewings in the same slot compete for the agents free in that slot, and
+    viewings in different slots never do, so each slot is solved on its own as
+    a maximum-weight assignment between its viewings and the agents covering
+    them. A booking or cancellation only re-solves the slot it touches.
+    """
+
+    def __init__(self, agents: List[Dict], apartment_loader: Callable[[], List[Dict]] = load_apartments):
+        """
+        Args:
+            agents: Agent dictionaries
+            apartment_loader: Returns the current catalog
+        """
+        self.calendars = {agent["id"]: AgentCalendar(agent) for agent in agents}
+        self.apartment_loader = apartment_loader
+        # slot -> apartment IDs with a viewing booked in that slot
+        self.viewings: Dict[str, set] = {}
+        # slot -> {apartment_id: agent_id}
+        self.assignments: Dict[str, Dict[int, int]] = {}
+        self.stats = {"slots_solved": 0, "viewings_solved": 0}
+
+    def on_slot_change(self, apartment_id: int, slot: str, busy: bool) -> None:
+        """Booking store listener: re-staff the slot whose viewings changed"""
+        viewings = self.viewings.setdefault(slot, set())
+        if busy:
+            viewings.add(apartment_id)
+        else:
+            viewings.discard(apartment_id)
+        self.solve_slot(slot)
+
+    def solve_slot(self, slot: str, apartments_by_id: Optional[Dict[int, Dict]] = None) -> Dict[int, int]:
+        """
+        Assign agents to the viewings of one slot, maximizing total weight.
+
+        A viewing's weight is its slot score, plus HOME_AREA_BONUS when it is
+        in the agent's home area. Viewings nobody can cover stay unassigned.
+
+        Returns:
+            Mapping of apartment ID to agent ID for the slot
+        """
+        day, index, slot_time = slot_position(slot)
+        for agent_id in self.assignments.pop(slot, {}).values():
+            self.calendars[agent_id].set_assigned(day, index, False)
+
+        apartment_ids = sorted(self.viewings.get(slot, ()))
+        if not apartment_ids:
+            self.viewings.pop(slot, None)
+            return {}
+
+        if apartments_by_id is None:
+            apartments_by_id = {apt.get("id"): apt for apt in self.apartment_loader()}
+        agents = [calendar for calendar in self.calendars.values() if calendar.is_free(day, index)]
+
+        weights = []
+        for apartment_id in apartment_ids:
+            apt = apartments_by_id.get(apartment_id, {"id": apartment_id})
+            score = calculate_slot_score(slot_time, apartment_id)
+            weights.append([
+                score + (HOME_AREA_BONUS if calendar.areas[:1] == [area_key(apt)] else 0)
+                if calendar.covers(apt) else None
+                for calendar in agents
+            ])
+
+        assignment = {}
+        for row, col in max_weight_assignment(weights):
+            assignment[apartment_ids[row]] = agents[col].id
+            agents[col].set_assigned(day, index, True)
+        self.assignments[slot] = assignment
+
+        self.stats["slots_solved"] += 1
+        self.stats["viewings_solved"] += len(apartment_ids)
+        return assignment
+
+    def solve_all(self) -> int:
+        """
+        Re-solve every slot with booked viewings, e.g. after agents change.
+
+        Returns:
+            Number of viewings with an assigned agent
+        """
+        apartments_by_id = {apt.get("id"): apt for apt in self.apartment_loader()}
+        return sum(len(self.solve_slot(slot, apartments_by_id)) for slot in list(self.viewings))
+
+    def get_agent(self, apartment_id: int, slot: str) -> Optional[Dict]:
+        """Get the agent assigned to a viewing, if any"""
+        agent_id = self.assignments.get(slot, {}).get(apartment_id)
+        return None if agent_id is None else self.calendars[agent_id].agent
+
+    def get_day_schedule(self, day: date) -> List[Dict]:
+        """
+        Describe every agent's free and assigned slots on a day.
+
+        Returns:
+            One entry per agent with its free and assigned slot bitmasks, and
+            the viewings assigned to it
+        """
+        day_key = day.strftime("%d-%m-%Y")
+        schedule = []
+        for calendar in self.calendars.values():
+            viewings = [
+                {"apartment_id": apartment_id, "slot": slot}
+                for slot, assignment in sorted(self.assignments.items())
+                if slot.startswith(day_key)
+                for apartment_id, agent_id in assignment.items()
+                if agent_id == calendar.id
+            ]
+            schedule.append({
+                "id": calendar.id,
+                "name": calendar.agent.get("name"),
+                "areas": calendar.areas,
+                "free": calendar.free_mask(day) & ~calendar.assigned_mask(day),
+                "assigned": calendar.assigned_mask(day),
+                "viewings": viewings,
+            })
+        return schedule
+
+
+# Shared roster used by the API
+agent_roster = AgentRoster(load_agents())
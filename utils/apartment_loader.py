@@ -1,33 +1,71 @@
+import hashlib
 import json
-from pathlib import Path
-from typing import List, Dict
-from fastapi import HTTPException
+from typing import List, Dict, Optional
 
+from models.apartment import Apartment, encode_record
+from utils.tenants import current_tenant
 
-def load_apartments() -> List[Dict]:
+
+def load_apartments() -> List[Apartment]:
     """
     Load apartments from JSON file
     
+    The catalog is kept in memory and only re-read when apartments.json
+    changes on disk; changes made through the catalog API are applied in
+    place. Callers must not modify the returned list. Within a tenant
+    request, this is the tenant's catalog.
+
     Returns:
-        List of apartment dictionaries
+        List of Apartment records, which read like apartment dictionaries
         
     Raises:
         HTTPException: If file not found or invalid JSON
     """
-    apartments_file = Path(__file__).parent.parent / "apartments.json"
-    
-    try:
-        with open(apartments_file, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        raise HTTPException(
-            status_code=500, 
-            detail="apartments.json file not found"
-        )
-    except json.JSONDecodeError as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Invalid JSON in apartments.json: {str(e)}"
-        )
+    return current_tenant().catalog.refresh()
+
+
+def get_apartment(apartment_id: int) -> Optional[Apartment]:
+    """
+    Look up one apartment by ID.
+
+    An indexed lookup on either catalog backend, so callers needing a single
+    listing don't have to walk the catalog.
+
+    Args:
+        apartment_id: Apartment ID
+
+    Returns:
+        The apartment, or None if there is none with that ID
+    """
+    return current_tenant().catalog.get(apartment_id)
 
 
+def is_catalog_list(apartments: List[Dict]) -> bool:
+    """
+    Whether a list is the current catalog itself, rather than a filtered copy.
+
+    Only such lists have a catalog version: filtered lists are identified by
+    a content hash, which is shared by no other request and must not evict
+    the catalog's own entries from per-catalog caches.
+    """
+    return apartments is current_tenant().catalog.apartments
+
+
+def get_catalog_version(apartments: List[Dict]) -> str:
+    """
+    Compute a short content hash identifying a version of the catalog.
+
+    The shared catalog tracks its own version, so this is O(1) for the list
+    returned by load_apartments; other lists (e.g. filtered ones) are hashed.
+
+    Args:
+        apartments: List of apartment dictionaries
+
+    Returns:
+        Hex digest that changes whenever any listing changes
+    """
+    catalog = current_tenant().catalog
+    if apartments is catalog.apartments:
+        return catalog.version
+    canonical = json.dumps(apartments, sort_keys=True, separators=(",", ":"), default=encode_record)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,124 @@
+import heapq
+from datetime import date, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.catalog_index import get_catalog_index
+from utils.schedule_generator import (
+    DEFAULT_CLOSE_TIME,
+    DEFAULT_OPEN_TIME,
+    DEFAULT_SLOT_MINUTES,
+    iter_free_slots,
+)
+
+
+def _align_to_grid(value: time) -> time:
+    """Round a time up to the next slot boundary of the schedule grid"""
+    grid_start = DEFAULT_OPEN_TIME.hour * 60 + DEFAULT_OPEN_TIME.minute
+    minutes = value.hour * 60 + value.minute + (1 if value.second or value.microsecond else 0)
+    offset = max(0, minutes - grid_start)
+    aligned = grid_start + -(-offset // DEFAULT_SLOT_MINUTES) * DEFAULT_SLOT_MINUTES
+    return time(aligned // 60, aligned % 60) if aligned < 24 * 60 else time(23, 59)
+
+
+def iter_window_slots(
+    apartment_id: int,
+    start_date: date,
+    end_date: date,
+    weekdays: Optional[Iterable[int]] = None,
+    from_time: Optional[time] = None,
+    to_time: Optional[time] = None,
+    min_score: Optional[int] = None,
+):
+    """
+    Lazily yield an apartment's free slots inside a time window.
+
+    Args:
+        apartment_id: Apartment to check
+        start_date: First day of the window
+        end_date: Day after the last day of the window
+        weekdays: Only include these weekdays (0=Monday ... 6=Sunday)
+        from_time: Earliest slot start (aligned to the 30-minute grid)
+        to_time: Latest slot end
+        min_score: Skip slots scoring below this value
+
+    Yields:
+        Dicts with 'datetime' and 'score' keys, in chronological order
+    """
+    open_time = _align_to_grid(max(from_time or DEFAULT_OPEN_TIME, DEFAULT_OPEN_TIME))
+    close_time = min(to_time or DEFAULT_CLOSE_TIME, DEFAULT_CLOSE_TIME)
+    weekdays = set(weekdays) if weekdays is not None else None
+
+    day = start_date
+    while day < end_date:
+        if weekdays is None or day.weekday() in weekdays:
+            yield from iter_free_slots(
+                apartment_id,
+                start_date=day,
+                end_date=day + timedelta(days=1),
+                open_time=open_time,
+                close_time=close_time,
+                min_score=min_score,
+            )
+        day += timedelta(days=1)
+
+
+def search_availability(
+    apartments: List[Dict],
+    start_date: date,
+    end_date: date,
+    weekdays: Optional[Iterable[int]] = None,
+    from_time: Optional[time] = None,
+    to_time: Optional[time] = None,
+    min_score: Optional[int] = None,
+    limit: int = 5,
+    slots_per_apartment: int = 3,
+    **attributes: Any,
+) -> List[Dict]:
+    """
+    Find apartments matching attribute predicates that have free slots in a window.
+
+    Attribute predicates are resolved first with the catalog index, then each
+    candidate's free slots in the window are scanned once, keeping only its
+    best few. Apartments are ranked by their best slot score, earliest slot
+    first on ties.
+
+    Args:
+        apartments: List of apartment dictionaries
+        start_date, end_date, weekdays, from_time, to_time, min_score:
+            Slot window, as accepted by iter_window_slots
+        limit: Maximum number of apartments
+        slots_per_apartment: Best slots returned for each apartment
+        **attributes: Attribute predicates, as accepted by CatalogIndex.filter
+
+    Returns:
+        Apartments with their best slots, best first
+    """
+    index = get_catalog_index(apartments)
+    ranked = []
+    # Candidates come out in catalog order; their position breaks remaining ties
+    for position, apt in enumerate(index.filter_apartments(**attributes)):
+        # Slots come out in chronological order, so the enumeration index
+        # breaks score ties in favour of the earliest slot
+        best = heapq.nsmallest(
+            slots_per_apartment,
+            enumerate(iter_window_slots(
+                apt.get("id"), start_date, end_date, weekdays, from_time, to_time, min_score
+            )),
+            key=lambda item: (-item[1]["score"], item[0]),
+        )
+        if best:
+            ranked.append((-best[0][1]["score"], best[0][0], position, apt, [slot for _, slot in best]))
+
+    results = []
+    for _, _, _, apt, slots in heapq.nsmallest(limit, ranked, key=lambda item: item[:3]):
+        results.append({
+            "id": apt.get("id"),
+            "name": apt.get("name"),
+            "city": apt.get("city"),
+            "neighbourhood": apt.get("neighbourhood"),
+            "price": apt.get("price"),
+            "bedrooms": apt.get("bedrooms"),
+            "best_slot": slots[0],
+            "slots": slots,
+        })
+    return results
@@ -0,0 +1,80 @@
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Listener signature: (apartment_id, slot, busy)
+SlotListener = Callable[[int, str, bool], None]
+
+
+class BookingStore:
+    """
+    In-memory appointment bookings layered on top of the mock calendar.
+
+    Slots are identified by their "DD-MM-YYYY HH:MM" string, like the slots
+    returned by the schedule endpoints. Listeners are notified of every slot
+    that changes state, so other components can react without polling.
+    """
+
+    def __init__(self):
+        self._slots: Dict[Tuple[int, str], str] = {}
+        self._appointments: Dict[str, Tuple[int, str]] = {}
+        self._listeners: List[SlotListener] = []
+        self.version = 0
+        # Order-independent hash of the booked slots: equal on any worker
+        # holding the same bookings, unlike version
+        self.digest = 0
+
+    def add_listener(self, listener: SlotListener) -> None:
+        """Register a callback invoked as listener(apartment_id, slot, busy)"""
+        self._listeners.append(listener)
+
+    def is_booked(self, apartment_id: int, slot: str) -> bool:
+        """Check whether a slot is taken by an appointment"""
+        return (apartment_id, slot) in self._slots
+
+    def get_appointment(self, appointment_id: str) -> Optional[Tuple[int, str]]:
+        """Get the (apartment_id, slot) booked by an appointment, if any"""
+        return self._appointments.get(appointment_id)
+
+    def book(self, appointment_id: str, apartment_id: int, slot: str) -> bool:
+        """
+        Book a slot for an appointment.
+
+        Returns:
+            True if booked, False if the slot or appointment ID is already taken
+        """
+        key = (apartment_id, slot)
+        if key in self._slots or appointment_id in self._appointments:
+            return False
+
+        self._slots[key] = appointment_id
+        self._appointments[appointment_id] = key
+        self._notify(apartment_id, slot, True)
+        return True
+
+    def release(self, appointment_id: str) -> Optional[Tuple[int, str]]:
+        """
+        Release the slot held by an appointment.
+
+        Returns:
+            The released (apartment_id, slot), or None if the appointment is unknown
+        """
+        key = self._appointments.pop(appointment_id, None)
+        if key is None:
+            return None
+
+        del self._slots[key]
+        self._notify(key[0], key[1], False)
+        return key
+
+    def _notify(self, apartment_id: int, slot: str, busy: bool) -> None:
+        self.version += 1
+        # Each slot flips once per change, so XOR adds and removes it alike
+        self.digest ^= int.from_bytes(
+            hashlib.blake2b(f"{apartment_id}|{slot}".encode(), digest_size=8).digest(), "little"
+        )
+        for listener in self._listeners:
+            listener(apartment_id, slot, busy)
+
+
+# Shared store used by the API and the schedule engine
+booking_store = BookingStore()
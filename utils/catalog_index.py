@@ -0,0 +1,163 @@
+from typing import Dict, Iterator, List, Optional, Set
+
+import numpy as np
+
+from utils.catalog_sqlite import SQLiteApartments
+from utils.catalog_store import CatalogChange, derived, update_column
+from utils.text import fold_accents
+
+
+def _nullable_value(apt: Dict, field: str) -> float:
+    return np.nan if apt.get(field) is None else apt.get(field)
+
+
+def _nullable_column(apartments: List[Dict], field: str) -> np.ndarray:
+    return np.array([_nullable_value(apt, field) for apt in apartments], dtype=np.float64)
+
+
+def _allows_pets(apt: Dict) -> bool:
+    return (apt.get("qualification") or {}).get("allow_pets", True) is not False
+
+
+class CatalogIndex:
+    """
+    Attribute indexes over a catalog for structured filtering.
+
+    City and neighbourhood are indexed as accent-insensitive lookups to row
+    sets, and numeric attributes are stored as NumPy columns, so a filter is a
+    couple of set lookups plus vectorized range comparisons. Catalog changes
+    are applied in place with apply_change.
+    """
+
+    def __init__(self, apartments: List[Dict]):
+        """
+        Args:
+            apartments: List of apartment dictionaries
+        """
+        self.apartments = apartments
+        self.row_by_id = {apt.get("id"): row for row, apt in enumerate(apartments)}
+
+        self.rows_by_city: Dict[str, Set[int]] = {}
+        self.rows_by_neighbourhood: Dict[str, Set[int]] = {}
+        for row, apt in enumerate(apartments):
+            self._index_row(row, apt)
+
+        self.price = _nullable_column(apartments, "price")
+        self.bedrooms = _nullable_column(apartments, "bedrooms")
+        self.bathrooms = _nullable_column(apartments, "bathrooms")
+        self.is_open = np.array([apt.get("status") == "open" for apt in apartments], dtype=bool)
+        self.allows_pets = np.array([_allows_pets(apt) for apt in apartments], dtype=bool)
+
+    def _index_row(self, row: int, apt: Dict, add: bool = True) -> None:
+        for lookup, field in ((self.rows_by_city, "city"), (self.rows_by_neighbourhood, "neighbourhood")):
+            if not apt.get(field):
+                continue
+            key = fold_accents(apt[field])
+            if add:
+                lookup.setdefault(key, set()).add(row)
+            else:
+                lookup[key].discard(row)
+                if not lookup[key]:
+                    del lookup[key]
+
+    def apply_change(self, change: CatalogChange) -> None:
+        """Update the index in place for one catalog change"""
+        if change.previous is not None:
+            self._index_row(change.row, change.previous, add=False)
+        if change.moved_from is not None:
+            moved = self.apartments[change.row]
+            self.row_by_id[moved.get("id")] = change.row
+            self._index_row(change.moved_from, moved, add=False)
+            self._index_row(change.row, moved)
+        if change.apartment is None:
+            self.row_by_id.pop(change.previous.get("id"), None)
+        else:
+            self.row_by_id[change.apartment.get("id")] = change.row
+            self._index_row(change.row, change.apartment)
+
+        apt = change.apartment or {}
+        self.price = update_column(self.price, change, _nullable_value(apt, "price"))
+        self.bedrooms = update_column(self.bedrooms, change, _nullable_value(apt, "bedrooms"))
+        self.bathrooms = update_column(self.bathrooms, change, _nullable_value(apt, "bathrooms"))
+        self.is_open = update_column(self.is_open, change, apt.get("status") == "open")
+        self.allows_pets = update_column(self.allows_pets, change, _allows_pets(apt))
+
+    def _rows_matching(self, lookup: Dict[str, Set[int]], value: str) -> np.ndarray:
+        # Prefix match, so "L'Hospitalet" finds "L'Hospitalet de Llobregat"
+        wanted = fold_accents(value.strip())
+        rows = [
+            row
+            for key, key_rows in lookup.items()
+            if key == wanted or key.startswith(wanted + " ")
+            for row in key_rows
+        ]
+        mask = np.zeros(len(self.apartments), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def filter(
+        self,
+        city: Optional[str] = None,
+        neighbourhood: Optional[str] = None,
+        min_bedrooms: Optional[int] = None,
+        max_bedrooms: Optional[int] = None,
+        min_bathrooms: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        pets: Optional[bool] = None,
+        open_only: bool = True,
+    ) -> np.ndarray:
+        """
+        Find the rows matching every given predicate.
+
+        Predicates left as None are not applied. Apartments missing a numeric
+        attribute never match a range on it.
+
+        Returns:
+            Array of matching row numbers, in catalog order
+        """
+        mask = self.is_open.copy() if open_only else np.ones(len(self.apartments), dtype=bool)
+        if city:
+            mask &= self._rows_matching(self.rows_by_city, city)
+        if neighbourhood:
+            mask &= self._rows_matching(self.rows_by_neighbourhood, neighbourhood)
+        if min_bedrooms is not None:
+            mask &= self.bedrooms >= min_bedrooms
+        if max_bedrooms is not None:
+            mask &= self.bedrooms <= max_bedrooms
+        if min_bathrooms is not None:
+            mask &= self.bathrooms >= min_bathrooms
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+        if pets:
+            mask &= self.allows_pets
+        return np.flatnonzero(mask)
+
+    def filter_apartments(self, **predicates) -> Iterator[Dict]:
+        """
+        Find the apartments matching every given predicate.
+
+        Args:
+            **predicates: Predicates, as accepted by filter
+
+        Returns:
+            Iterator over matching apartments, in catalog order
+        """
+        return (self.apartments[row] for row in self.filter(**predicates).tolist())
+
+
+_get_index = derived(CatalogIndex)
+
+
+def get_catalog_index(apartments: List[Dict]) -> CatalogIndex:
+    """
+    Get the attribute index for a catalog.
+
+    A SQLite-backed catalog is its own index: its filter_apartments runs
+    against the database's covering indexes.
+    """
+    if isinstance(apartments, SQLiteApartments):
+        return apartments.catalog
+    return _get_index(apartments)
@@ -0,0 +1,616 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import sqlite3
+import textwrap
+import threading
+from collections.abc import Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from models.apartment import Apartment
+from utils.text import apartment_text, fold_accents, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per query when walking the whole catalog or a filter's matches
+PAGE_SIZE = 500
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    # pos is the row number, numbered like the in-memory catalog's list
+    "CREATE TABLE IF NOT EXISTS apartments ("
+    "id INTEGER PRIMARY KEY, city_key TEXT, neighbourhood_key TEXT, price REAL, bedrooms REAL, "
+    "bathrooms REAL, is_open INTEGER, allows_pets INTEGER, data TEXT NOT NULL, pos INTEGER)",
+    "CREATE INDEX IF NOT EXISTS apartments_pos ON apartments (pos)",
+    # Filter indexes: predicates are resolved inside the index, and only the
+    # matching rows are then read from the table for their data
+    "CREATE INDEX IF NOT EXISTS apartments_city ON apartments (city_key, is_open, price, bedrooms)",
+    "CREATE INDEX IF NOT EXISTS apartments_neighbourhood "
+    "ON apartments (neighbourhood_key, is_open, price, bedrooms)",
+    "CREATE INDEX IF NOT EXISTS apartments_price ON apartments (is_open, price, bedrooms)",
+    "CREATE INDEX IF NOT EXISTS apartments_bedrooms ON apartments (is_open, bedrooms, price)",
+    # Holds the same stemmed, field-weighted terms as the in-memory BM25 index
+    "CREATE VIRTUAL TABLE IF NOT EXISTS apartments_fts USING fts5(terms)",
+    # Admin changes not yet written back to apartments.json, replayed when
+    # the snapshot is re-imported
+    "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL, data TEXT)",
+)
+
+
+def iter_json_array(path: Path, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Stream the elements of a top-level JSON array without loading the file.
+
+    Raises:
+        json.JSONDecodeError: If the file is not a JSON array
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos = f.read(chunk_size), 0
+        expect_array = True
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                more = f.read(chunk_size)
+                if not more:
+                    raise json.JSONDecodeError("Unterminated array", buffer, pos)
+                buffer, pos = more, 0
+                continue
+
+            if expect_array:
+                if buffer[pos] != "[":
+                    raise json.JSONDecodeError("Expected a JSON array", buffer, pos)
+                expect_array = False
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                # The element straddles the chunk boundary
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield element
+            pos = end
+
+
+def _encode(apt: Apartment) -> str:
+    return json.dumps(apt.to_dict(), ensure_ascii=False)
+
+
+def _row(apt: Apartment, pos: int) -> Tuple:
+    def key(value: Optional[str]) -> Optional[str]:
+        return fold_accents(value.strip()) if value else None
+
+    return (
+        apt.get("id"),
+        key(apt.get("city")),
+        key(apt.get("neighbourhood")),
+        apt.get("price"),
+        apt.get("bedrooms"),
+        apt.get("bathrooms"),
+        apt.get("status") == "open",
+        (apt.get("qualification") or {}).get("allow_pets", True) is not False,
+        _encode(apt),
+        pos,
+    )
+
+
+def _terms(apt: Apartment) -> str:
+    return " ".join(tokenize(apartment_text(apt)))
+
+
+class ReadPool:
+    """Pool of read-only, memory-mapped connections to the catalog database"""
+
+    def __init__(self, db_path: Path, size: int, mmap_bytes: int):
+        self._connections: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        for _ in range(size):
+            connection = sqlite3.connect(
+                f"file:{db_path}?mode=ro", uri=True, check_same_thread=False
+            )
+            connection.execute(f"PRAGMA mmap_size = {mmap_bytes}")
+            self._connections.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+
+class SQLiteApartments(Sequence):
+    """
+    The catalog as a lazy sequence of Apartment records, in row order.
+
+    Rows are numbered like the in-memory catalog's list (creates append,
+    deletes move the last row into the freed one), so per-row derived
+    indexes follow published changes the same way on both backends. Row
+    numbers are indexed: an item is one lookup, a slice one range query, and
+    iterating reads the table a page at a time, keeping memory bounded.
+    """
+
+    def __init__(self, catalog: "SQLiteCatalog"):
+        self.catalog = catalog
+        self._length: Optional[Tuple[str, int]] = None
+
+    def __len__(self) -> int:
+        if self._length is None or self._length[0] != self.catalog.version:
+            with self.catalog.pool.connection() as connection:
+                count = connection.execute(
+                    "SELECT COALESCE(MAX(pos) + 1, 0) FROM apartments"
+                ).fetchone()[0]
+            self._length = (self.catalog.version, count)
+        return self._length[1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.catalog._iter_query("pos >= ? AND pos < ?", [start, stop], key="pos"))
+        if index < 0:
+            index += len(self)
+        with self.catalog.pool.connection() as connection:
+            row = connection.execute("SELECT data FROM apartments WHERE pos = ?", (index,)).fetchone()
+        if row is None:
+            raise IndexError("catalog index out of range")
+        return Apartment(json.loads(row[0]))
+
+    def __iter__(self) -> Iterator[Apartment]:
+        return self.catalog._iter_query("", [], key="pos")
+
+
+class SQLiteCatalog:
+    """
+    Apartment catalog kept in SQLite, for catalogs larger than memory.
+
+    apartments.json is streamed into the database when it changes on disk;
+    after that, lookups, attribute filters and text searches are indexed
+    queries (indexes on city, neighbourhood, status, price and bedrooms, and
+    an FTS5 table with BM25 ranking) on a pool of read-only, memory-mapped
+    connections. Admin changes are written to the database, logged until
+    compact writes them back to apartments.json (so re-importing an edited
+    snapshot replays them), and published to listeners like the in-memory
+    catalog's.
+
+    Derived indexes (geo, eligibility, similarity) are built by streaming
+    the catalog, and geo and eligibility then follow published changes; they
+    still keep one compact entry per listing in memory. Market rollups keep
+    a sketch per group, plus the distinct prices behind its exact minimum.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Path,
+        db_path: Optional[Path] = None,
+        pool_size: Optional[int] = None,
+        mmap_mb: Optional[int] = None,
+    ):
+        """
+        Args:
+            snapshot_path: apartments.json
+            db_path: Database file. If not provided, uses CATALOG_SQLITE_PATH
+                (default "data/catalog.db")
+            pool_size: Read connections kept open. If not provided, uses
+                CATALOG_SQLITE_POOL_SIZE (default 4)
+            mmap_mb: Memory-mapped I/O size per connection. If not provided,
+                uses CATALOG_SQLITE_MMAP_MB (default 256)
+        """
+        self.snapshot_path = snapshot_path
+        self.db_path = Path(db_path or os.getenv("CATALOG_SQLITE_PATH", "data/catalog.db"))
+        if pool_size is None:
+            pool_size = int(os.getenv("CATALOG_SQLITE_POOL_SIZE", "4"))
+        if mmap_mb is None:
+            mmap_mb = int(os.getenv("CATALOG_SQLITE_MMAP_MB", "256"))
+        self.pool_size = max(1, pool_size)
+        self.mmap_bytes = mmap_mb * 2**20
+
+        self.name = ""
+        self.apartments = SQLiteApartments(self)
+        self.version = ""
+        self.pending_changes = 0
+        self.listeners: List = []
+
+        self.pool: Optional[ReadPool] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._snapshot_mtime: Optional[int] = None
+        self._base_version = ""
+        self._seq = 0
+        self._lock = threading.RLock()
+
+    def add_listener(self, listener) -> None:
+        """Register a callback invoked with every applied CatalogChange"""
+        self.listeners.append(listener)
+
+    def refresh(self) -> SQLiteApartments:
+        """
+        Get the catalog, importing apartments.json first if it changed on disk.
+
+        Raises:
+            HTTPException: If the snapshot is missing or invalid JSON
+        """
+        try:
+            mtime = self.snapshot_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise HTTPException(status_code=500, detail="apartments.json file not found")
+        if mtime != self._snapshot_mtime:
+            with self._lock:
+                if mtime != self._snapshot_mtime:
+                    self._open(mtime)
+        return self.apartments
+
+    def _open(self, mtime: int) -> None:
+        if self._writer is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._writer.execute("PRAGMA journal_mode = WAL")
+            self._writer.execute("PRAGMA synchronous = NORMAL")
+            self._writer.execute(f"PRAGMA mmap_size = {self.mmap_bytes}")
+            with self._writer:
+                columns = [row[1] for row in self._writer.execute("PRAGMA table_info(apartments)")]
+                if columns and "pos" not in columns:
+                    # Databases from before row numbers: number rows in ID order
+                    self._writer.execute("ALTER TABLE apartments ADD COLUMN pos INTEGER")
+                    self._writer.execute(
+                        "UPDATE apartments SET pos = ranked.pos FROM "
+                        "(SELECT id, row_number() OVER (ORDER BY id) - 1 AS pos FROM apartments) AS ranked "
+                        "WHERE apartments.id = ranked.id"
+                    )
+                for statement in SCHEMA:
+                    self._writer.execute(statement)
+
+        # The database survives restarts; only re-import a changed snapshot
+        snapshot_version = self._snapshot_version()
+        if self._meta("snapshot_version") != snapshot_version:
+            self._import(snapshot_version)
+        if self.pool is None:
+            self.pool = ReadPool(self.db_path, self.pool_size, self.mmap_bytes)
+
+        self._base_version = snapshot_version
+        self._seq = int(self._meta("seq") or 0)
+        self.pending_changes = self._writer.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+        self.version = f"{snapshot_version}+{self._seq}" if self._seq else snapshot_version
+        self._snapshot_mtime = mtime
+
+    def _snapshot_version(self) -> str:
+        digest = hashlib.sha1()
+        with open(self.snapshot_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:12]
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._writer.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, **values: Any) -> None:
+        self._writer.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()],
+        )
+
+    def _import(self, snapshot_version: str) -> None:
+        count = 0
+        try:
+            with self._writer:
+                self._writer.execute("DELETE FROM apartments")
+                self._writer.execute("DELETE FROM apartments_fts")
+                batch = []
+                for apt in iter_json_array(self.snapshot_path):
+                    batch.append(Apartment(apt))
+                    if len(batch) >= PAGE_SIZE:
+                        self._insert(batch, count)
+                        count += len(batch)
+                        batch = []
+                self._insert(batch, count)
+                count += len(batch)
+
+                # Admin changes not written back yet are replayed on top, like
+                # the in-memory catalog's change log
+                changes = self._writer.execute("SELECT id, data FROM changes ORDER BY seq").fetchall()
+                for apartment_id, data in changes:
+                    self._write(apartment_id, None if data is None else Apartment(json.loads(data)))
+                self._set_meta(snapshot_version=snapshot_version, seq=len(changes))
+            # Table statistics let the planner pick the most selective index
+            self._writer.execute("ANALYZE")
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=500, detail=f"Invalid JSON in apartments.json: {str(e)}")
+        logger.info("Imported %d apartments into %s", count, self.db_path)
+
+    def _insert(self, apartments: List[Apartment], first_pos: int) -> None:
+        self._writer.executemany(
+            "INSERT OR REPLACE INTO apartments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [_row(apt, pos) for pos, apt in enumerate(apartments, first_pos)],
+        )
+        self._writer.executemany(
+            "INSERT INTO apartments_fts (rowid, terms) VALUES (?, ?)",
+            [(apt.get("id"), _terms(apt)) for apt in apartments],
+        )
+
+    def _iter_query(self, where: str, params: List[Any], key: str = "id") -> Iterator[Apartment]:
+        # Keyset pagination on key (id or pos): the connection goes back to
+        # the pool between pages
+        last_key = None
+        while True:
+            clauses = [where] if where else []
+            page_params = list(params)
+            if last_key is not None:
+                clauses.append(f"{key} > ?")
+                page_params.append(last_key)
+            sql = f"SELECT {key}, data FROM apartments"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            with self.pool.connection() as connection:
+                rows = connection.execute(
+                    f"{sql} ORDER BY {key} LIMIT {PAGE_SIZE}", page_params
+                ).fetchall()
+            for _, data in rows:
+                yield Apartment(json.loads(data))
+            if len(rows) < PAGE_SIZE:
+                return
+            last_key = rows[-1][0]
+
+    def get(self, apartment_id: int) -> Optional[Apartment]:
+        """Get an apartment by ID"""
+        self.refresh()
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT data FROM apartments WHERE id = ?", (apartment_id,)
+            ).fetchone()
+        return None if row is None else Apartment(json.loads(row[0]))
+
+    def filter_apartments(
+        self,
+        city: Optional[str] = None,
+        neighbourhood: Optional[str] = None,
+        min_bedrooms: Optional[int] = None,
+        max_bedrooms: Optional[int] = None,
+        min_bathrooms: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        pets: Optional[bool] = None,
+        open_only: bool = True,
+    ) -> Iterator[Apartment]:
+        """
+        Find the apartments matching every given predicate, with the same
+        semantics as CatalogIndex.filter.
+
+        Returns:
+            Iterator over matching apartments, in ID order
+        """
+        self.refresh()
+        clauses, params = [], []
+        if open_only:
+            clauses.append("is_open = 1")
+        for column, value in (("city_key", city), ("neighbourhood_key", neighbourhood)):
+            if value:
+                # Whole-word prefix match ("L'Hospitalet" finds "L'Hospitalet de
+                # Llobregat") as one index range: "!" sorts right after " "
+                wanted = fold_accents(value.strip())
+                clauses.append(f"{column} >= ? AND {column} < ?")
+                params += [wanted, wanted + "!"]
+        for column, operator, value in (
+            ("bedrooms", ">=", min_bedrooms),
+            ("bedrooms", "<=", max_bedrooms),
+            ("bathrooms", ">=", min_bathrooms),
+            ("price", ">=", min_price),
+            ("price", "<=", max_price),
+        ):
+            if value is not None:
+                clauses.append(f"{column} {operator} ?")
+                params.append(value)
+        if pets:
+            clauses.append("allows_pets = 1")
+        return self._iter_query(" AND ".join(clauses), params)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        Search apartments by free text, ranked with FTS5's BM25.
+
+        Returns:
+            Matching apartments with their BM25 score, best first
+        """
+        self.refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        # Terms are [a-z0-9]+ after tokenizing, so quoting them is enough
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT apartments.data, bm25(apartments_fts) AS rank FROM apartments_fts "
+                "JOIN apartments ON apartments.id = apartments_fts.rowid "
+                "WHERE apartments_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+
+        results = []
+        for data, rank in rows:
+            apt = json.loads(data)
+            results.append({
+                "id": apt.get("id"),
+                "name": apt.get("name"),
+                "city": apt.get("city"),
+                "neighbourhood": apt.get("neighbourhood"),
+                "price": apt.get("price"),
+                "available": apt.get("status") == "open",
+                # FTS5 ranks are negated BM25 scores. FTS5 floors the weight of
+                # terms found in over half the listings at 1e-6, so keep more
+                # digits than the in-memory index does
+                "score": round(-rank, 6),
+            })
+        return results
+
+    def create(self, apartment: Dict[str, Any]) -> Apartment:
+        """
+        Add an apartment. An ID is assigned when none is given.
+
+        Raises:
+            HTTPException: 409 if the ID is already taken
+        """
+        with self._lock:
+            self.refresh()
+            if apartment.get("id") is None:
+                last_id = self._writer.execute("SELECT MAX(id) FROM apartments").fetchone()[0]
+                apartment = {**apartment, "id": (last_id or 0) + 1}
+            elif self.get(apartment["id"]) is not None:
+                raise HTTPException(
+                    status_code=409, detail=f"Apartment with ID {apartment['id']} already exists"
+                )
+            return self._apply(apartment["id"], Apartment(apartment))
+
+    def patch(self, apartment_id: int, fields: Dict[str, Any]) -> Apartment:
+        """
+        Update some fields of an apartment.
+
+        Raises:
+            HTTPException: 404 if the apartment is not found
+        """
+        with self._lock:
+            current = self._require(apartment_id)
+            updated = Apartment({**current, **{key: value for key, value in fields.items() if key != "id"}})
+            return self._apply(apartment_id, updated)
+
+    def delete(self, apartment_id: int) -> Apartment:
+        """
+        Remove an apartment.
+
+        Raises:
+            HTTPException: 404 if the apartment is not found
+        """
+        with self._lock:
+            self._require(apartment_id)
+            return self._apply(apartment_id, None)
+
+    def _require(self, apartment_id: int) -> Apartment:
+        current = self.get(apartment_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail=f"Apartment with ID {apartment_id} not found")
+        return current
+
+    def _apply(self, apartment_id: int, apartment: Optional[Apartment]) -> Apartment:
+        # Imported here: catalog_store imports this module to create the catalog
+        from utils.catalog_store import CatalogChange
+
+        with self._writer:
+            op, row, previous, moved_from = self._write(apartment_id, apartment)
+            self._writer.execute(
+                "INSERT INTO changes (id, data) VALUES (?, ?)",
+                (apartment_id, None if apartment is None else _encode(apartment)),
+            )
+            self._set_meta(seq=self._seq + 1)
+        self._seq += 1
+        self.pending_changes += 1
+
+        previous_version = self.version
+        self.version = f"{self._base_version}+{self._seq}"
+        change = CatalogChange(op, row, apartment, previous, moved_from, previous_version, self.version)
+        for listener in self.listeners:
+            listener(change)
+        return apartment if apartment is not None else previous
+
+    def _write(
+        self, apartment_id: int, apartment: Optional[Apartment]
+    ) -> Tuple[str, Optional[int], Optional[Apartment], Optional[int]]:
+        """
+        Store an apartment (None deletes it), keeping row numbers dense.
+
+        The operation follows from what is stored, so replaying a change the
+        snapshot already holds is harmless.
+
+        Returns:
+            Tuple of (op, row, previous apartment, row moved into the freed one)
+        """
+        found = self._writer.execute(
+            "SELECT pos, data FROM apartments WHERE id = ?", (apartment_id,)
+        ).fetchone()
+        previous = None if found is None else Apartment(json.loads(found[1]))
+        if found is not None:
+            self._writer.execute("DELETE FROM apartments_fts WHERE rowid = ?", (apartment_id,))
+
+        if apartment is not None:
+            if found is None:
+                op, row = "create", self._writer.execute(
+                    "SELECT COALESCE(MAX(pos) + 1, 0) FROM apartments"
+                ).fetchone()[0]
+            else:
+                op, row = "patch", found[0]
+            self._insert([apartment], row)
+            return op, row, previous, None
+
+        if found is None:
+            return "delete", None, None, None
+        row = found[0]
+        last = self._writer.execute("SELECT MAX(pos) FROM apartments").fetchone()[0]
+        self._writer.execute("DELETE FROM apartments WHERE id = ?", (apartment_id,))
+        if row == last:
+            return "delete", row, previous, None
+        self._writer.execute("UPDATE apartments SET pos = ? WHERE pos = ?", (row, last))
+        return "delete", row, previous, last
+
+    def compact(self) -> int:
+        """
+        Write the catalog back to apartments.json and clear the change log,
+        then checkpoint the database and merge the FTS5 index segments.
+
+        The snapshot is streamed to a temporary file and atomically renamed.
+        A crash before the log is cleared re-imports the new snapshot and
+        replays the log on top, which leaves the same catalog.
+
+        Returns:
+            Number of changes folded into the snapshot
+        """
+        with self._lock:
+            self.refresh()
+            folded = self.pending_changes
+            if not folded:
+                return 0
+
+            self._write_snapshot()
+            with self._writer:
+                self._writer.execute("DELETE FROM changes")
+                self._writer.execute("INSERT INTO apartments_fts (apartments_fts) VALUES ('optimize')")
+                self._set_meta(snapshot_version=self._snapshot_version())
+            self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            # The database already matches the new snapshot
+            self._snapshot_mtime = self.snapshot_path.stat().st_mtime_ns
+            self.pending_changes = 0
+            logger.info("Compacted %d catalog changes into %s", folded, self.snapshot_path.name)
+            return folded
+
+    def _write_snapshot(self) -> None:
+        # Same layout as the in-memory catalog's snapshot, in ID order
+        tmp_path = self.snapshot_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for count, apt in enumerate(self._iter_query("", [])):
+                f.write(",\n" if count else "\n")
+                f.write(textwrap.indent(json.dumps(apt.to_dict(), indent=2, ensure_ascii=False), "  "))
+            f.write("\n]\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            # Single-file bind mounts (docker-compose) can't be renamed over
+            with open(tmp_path, "rb") as src, open(self.snapshot_path, "wb") as f:
+                shutil.copyfileobj(src, f)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp_path.unlink()
@@ -0,0 +1,480 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+import numpy as np
+from fastapi import HTTPException
+
+from models.apartment import Apartment
+from utils.catalog_sqlite import SQLiteCatalog
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogChange(NamedTuple):
+    """
+    One applied catalog mutation.
+
+    Deletes move the last row into the freed one, so row numbers stay dense;
+    moved_from is the row the moved apartment came from (None when the last
+    row itself was deleted).
+    """
+    op: str
+    row: int
+    apartment: Optional[Apartment]
+    previous: Optional[Apartment]
+    moved_from: Optional[int]
+    previous_version: str
+    version: str
+
+
+# Listener signature: (change)
+CatalogListener = Callable[[CatalogChange], None]
+
+
+def catalog_name(version: str) -> str:
+    """
+    Name of the catalog a version belongs to: the tenant ID for tenant
+    catalogs, "" for the default catalog and for hashed lists
+    """
+    name, separator, _ = version.partition("@")
+    return name if separator else ""
+
+
+class VersionedCache(dict):
+    """
+    Values derived from catalogs, keyed by catalog version.
+
+    Holds up to per_catalog versions of each catalog: putting a new version
+    only evicts the oldest versions of the same catalog, so every resident
+    tenant keeps its own entries. drop_catalog_caches removes a catalog from
+    every such cache.
+    """
+
+    def __init__(self, per_catalog: int = 1):
+        super().__init__()
+        self.per_catalog = max(1, per_catalog)
+        _versioned_caches.append(self)
+
+    def put(self, version: str, value: Any) -> Any:
+        """Store the value for a version, evicting its catalog's oldest entries"""
+        same_catalog = self._versions_of(catalog_name(version))
+        while len(same_catalog) >= self.per_catalog:
+            del self[same_catalog.pop(0)]
+        self[version] = value
+        return value
+
+    def pop_catalog(self, version: str) -> Any:
+        """Remove and return the latest entry of the catalog a version belongs to, if any"""
+        same_catalog = self._versions_of(catalog_name(version))
+        return self.pop(same_catalog[-1]) if same_catalog else None
+
+    def _versions_of(self, name: str) -> List[str]:
+        return [key for key in self if catalog_name(key) == name]
+
+
+_versioned_caches: List[VersionedCache] = []
+
+
+def drop_catalog_caches(name: str) -> None:
+    """Drop every cached value derived from a catalog, e.g. an evicted tenant's"""
+    for cache in _versioned_caches:
+        for key in cache._versions_of(name):
+            del cache[key]
+
+
+def _fold(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+class Catalog:
+    """
+    In-memory apartment catalog backed by apartments.json and a change log.
+
+    The snapshot is read once into compact Apartment records; creates, patches and deletes are appended to a
+    JSON-lines change log (fsynced) and applied in place, updating the ID, city
+    and neighbourhood indexes and notifying listeners so derived indexes can
+    follow without a rebuild. Every compact_every changes, the catalog is
+    written back to the snapshot and the log is cleared. The snapshot is
+    reloaded if it is edited on disk.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Path,
+        changelog_path: Optional[Path] = None,
+        compact_every: Optional[int] = None,
+        name: str = "",
+        listeners: Optional[List[CatalogListener]] = None,
+    ):
+        """
+        Args:
+            snapshot_path: apartments.json
+            changelog_path: Change log file. If not provided, uses
+                CATALOG_CHANGELOG_PATH (default "data/catalog_changes.jsonl")
+            compact_every: Compact after this many changes. If not provided,
+                uses CATALOG_COMPACT_EVERY (default 100)
+            name: Tenant ID, prefixed to versions as "name@" so versions of
+                different catalogs never collide ("" for the default catalog)
+            listeners: Listener list to share with another catalog, so
+                listeners registered on the default catalog see every tenant
+        """
+        self.snapshot_path = snapshot_path
+        self.name = name
+        self.changelog_path = Path(
+            changelog_path or os.getenv("CATALOG_CHANGELOG_PATH", "data/catalog_changes.jsonl")
+        )
+        if compact_every is None:
+            compact_every = int(os.getenv("CATALOG_COMPACT_EVERY", "100"))
+        self.compact_every = max(1, compact_every)
+
+        self.apartments: List[Apartment] = []
+        self.version = ""
+        self.row_by_id: Dict[int, int] = {}
+        self.ids_by_city: Dict[str, Set[int]] = {}
+        self.ids_by_neighbourhood: Dict[str, Set[int]] = {}
+        self.pending_changes = 0
+
+        self._base_version = ""
+        self._seq = 0
+        self._snapshot_mtime: Optional[int] = None
+        self.listeners: List[CatalogListener] = [] if listeners is None else listeners
+        self._lock = threading.RLock()
+
+    def add_listener(self, listener: CatalogListener) -> None:
+        """Register a callback invoked with every applied CatalogChange"""
+        self.listeners.append(listener)
+
+    def refresh(self) -> List[Apartment]:
+        """
+        Get the current apartments, (re)loading the snapshot if it is not
+        loaded yet or was changed on disk.
+
+        Raises:
+            HTTPException: If the snapshot is missing or invalid JSON
+        """
+        try:
+            mtime = self.snapshot_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise HTTPException(status_code=500, detail="apartments.json file not found")
+        if mtime != self._snapshot_mtime:
+            with self._lock:
+                if mtime != self._snapshot_mtime:
+                    self._load(mtime)
+        return self.apartments
+
+    def _load(self, mtime: int) -> None:
+        raw = self.snapshot_path.read_bytes()
+        try:
+            apartments = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=500, detail=f"Invalid JSON in apartments.json: {str(e)}")
+
+        self.apartments = [Apartment(apt) for apt in apartments]
+        self._base_version = (f"{self.name}@" if self.name else "") + hashlib.sha1(raw).hexdigest()[:12]
+        self._seq = 0
+        self.version = self._base_version
+        self._snapshot_mtime = mtime
+        self._reindex()
+
+        # Changes logged since the last compaction are replayed on top
+        self.pending_changes = 0
+        if self.changelog_path.exists():
+            with open(self.changelog_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping torn catalog change log entry in %s", self.changelog_path)
+                        continue
+                    self._apply(entry["op"], entry["id"], entry.get("apartment"), log=False)
+                    self.pending_changes += 1
+
+    def _reindex(self) -> None:
+        self.row_by_id = {}
+        self.ids_by_city = {}
+        self.ids_by_neighbourhood = {}
+        for row, apt in enumerate(self.apartments):
+            self.row_by_id[apt.get("id")] = row
+            self._index(apt)
+
+    def _index(self, apt: Apartment) -> None:
+        self.ids_by_city.setdefault(_fold(apt.get("city")), set()).add(apt.get("id"))
+        self.ids_by_neighbourhood.setdefault(_fold(apt.get("neighbourhood")), set()).add(apt.get("id"))
+
+    def _unindex(self, apt: Apartment) -> None:
+        for lookup, key in (
+            (self.ids_by_city, _fold(apt.get("city"))),
+            (self.ids_by_neighbourhood, _fold(apt.get("neighbourhood"))),
+        ):
+            ids = lookup.get(key)
+            if ids is not None:
+                ids.discard(apt.get("id"))
+                if not ids:
+                    del lookup[key]
+
+    def get(self, apartment_id: int) -> Optional[Apartment]:
+        """Get an apartment by ID"""
+        self.refresh()
+        row = self.row_by_id.get(apartment_id)
+        return None if row is None else self.apartments[row]
+
+    def create(self, apartment: Dict[str, Any]) -> Apartment:
+        """
+        Add an apartment. An ID is assigned when none is given.
+
+        Raises:
+            HTTPException: 409 if the ID is already taken
+        """
+        with self._lock:
+            self.refresh()
+            apartment = dict(apartment)
+            if apartment.get("id") is None:
+                apartment = {**apartment, "id": max(self.row_by_id, default=0) + 1}
+            elif apartment["id"] in self.row_by_id:
+                raise HTTPException(
+                    status_code=409, detail=f"Apartment with ID {apartment['id']} already exists"
+                )
+            return self._apply("create", apartment["id"], apartment)
+
+    def patch(self, apartment_id: int, fields: Dict[str, Any]) -> Apartment:
+        """
+        Update some fields of an apartment.
+
+        Raises:
+            HTTPException: 404 if the apartment is not found
+        """
+        with self._lock:
+            current = self.get(apartment_id)
+            if current is None:
+                raise HTTPException(status_code=404, detail=f"Apartment with ID {apartment_id} not found")
+            updated = {**current, **{key: value for key, value in fields.items() if key != "id"}}
+            return self._apply("patch", apartment_id, updated)
+
+    def delete(self, apartment_id: int) -> Apartment:
+        """
+        Remove an apartment.
+
+        Raises:
+            HTTPException: 404 if the apartment is not found
+        """
+        with self._lock:
+            if self.get(apartment_id) is None:
+                raise HTTPException(status_code=404, detail=f"Apartment with ID {apartment_id} not found")
+            return self._apply("delete", apartment_id, None)
+
+    def _apply(
+        self, op: str, apartment_id: int, apartment: Optional[Dict[str, Any]], log: bool = True
+    ) -> Optional[Apartment]:
+        row = self.row_by_id.get(apartment_id)
+        if not log:
+            # Replaying over an edited snapshot: follow what it now holds
+            if apartment is None and row is None:
+                return None
+            if apartment is not None:
+                op = "create" if row is None else "patch"
+
+        if apartment is not None:
+            apartment = Apartment(apartment)
+        if log:
+            self._log({
+                "op": op,
+                "id": apartment_id,
+                "apartment": None if apartment is None else apartment.to_dict(),
+            })
+
+        previous = None if row is None else self.apartments[row]
+        moved_from = None
+
+        if op == "create":
+            row = len(self.apartments)
+            self.apartments.append(apartment)
+            self.row_by_id[apartment_id] = row
+            self._index(apartment)
+        elif op == "patch":
+            self._unindex(previous)
+            self.apartments[row] = apartment
+            self._index(apartment)
+        else:
+            self._unindex(previous)
+            del self.row_by_id[apartment_id]
+            last = len(self.apartments) - 1
+            if row != last:
+                moved = self.apartments[last]
+                self.apartments[row] = moved
+                self.row_by_id[moved.get("id")] = row
+                moved_from = last
+            self.apartments.pop()
+
+        previous_version = self.version
+        self._seq += 1
+        self.version = f"{self._base_version}+{self._seq}"
+        change = CatalogChange(op, row, apartment, previous, moved_from, previous_version, self.version)
+        for listener in self.listeners:
+            listener(change)
+
+        if log:
+            self.pending_changes += 1
+            if self.pending_changes >= self.compact_every:
+                self.compact()
+        return apartment if apartment is not None else previous
+
+    def _log(self, entry: Dict) -> None:
+        self.changelog_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.changelog_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self) -> int:
+        """
+        Write the catalog back to the snapshot and clear the change log.
+
+        The snapshot is written to a temporary file and atomically renamed, so
+        a crash leaves either the old snapshot plus the full log or the new one.
+
+        Returns:
+            Number of changes folded into the snapshot
+        """
+        with self._lock:
+            self.refresh()
+            folded = self.pending_changes
+            if not folded:
+                return 0
+
+            apartments = sorted(self.apartments, key=lambda apt: apt.get("id"))
+            tmp_path = self.snapshot_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([apt.to_dict() for apt in apartments], f, indent=2, ensure_ascii=False)
+                f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.replace(tmp_path, self.snapshot_path)
+            except OSError:
+                # Single-file bind mounts (docker-compose) can't be renamed over
+                with open(self.snapshot_path, "w", encoding="utf-8") as f:
+                    f.write(tmp_path.read_text(encoding="utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                tmp_path.unlink()
+            # The in-memory catalog already matches the new snapshot
+            self._snapshot_mtime = self.snapshot_path.stat().st_mtime_ns
+
+            with open(self.changelog_path, "w") as f:
+                os.fsync(f.fileno())
+            self.pending_changes = 0
+            logger.info("Compacted %d catalog changes into %s", folded, self.snapshot_path.name)
+            return folded
+
+
+def update_column(column: np.ndarray, change: CatalogChange, value: Any) -> np.ndarray:
+    """
+    Apply a catalog change to a per-row NumPy column.
+
+    Patches and deletes are O(1). Updated columns are views over a larger
+    buffer, so creates write into its spare room; a full buffer is copied
+    into one twice its size, which keeps creates amortized O(1).
+
+    Args:
+        column: Column with one entry per catalog row
+        change: Applied catalog change
+        value: The changed apartment's value in this column (unused for deletes)
+
+    Returns:
+        The updated column, which may be a new array
+    """
+    if change.op == "create":
+        size = len(column)
+        buffer = column.base
+        if (
+            not isinstance(buffer, np.ndarray)
+            or buffer.ndim != 1
+            or buffer.dtype != column.dtype
+            or buffer.ctypes.data != column.ctypes.data
+            or len(buffer) <= size
+        ):
+            buffer = np.empty(max(16, 2 * size), dtype=column.dtype)
+            buffer[:size] = column
+        column = buffer[:size + 1]
+        column[size] = value
+        return column
+    if change.op == "patch":
+        column[change.row] = value
+        return column
+    column[change.row] = column[-1]
+    return column[:-1]
+
+
+def create_catalog(snapshot_path: Path, backend: Optional[str] = None):
+    """
+    Create the catalog for a snapshot with the configured backend.
+
+    Args:
+        snapshot_path: apartments.json
+        backend: "memory" or "sqlite". If not provided, uses CATALOG_BACKEND
+            (default "memory")
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    backend = backend or os.getenv("CATALOG_BACKEND", "memory")
+    if backend == "memory":
+        return Catalog(snapshot_path)
+    if backend == "sqlite":
+        return SQLiteCatalog(snapshot_path)
+    raise ValueError(f"Unknown CATALOG_BACKEND: {backend} (expected 'memory' or 'sqlite')")
+
+
+# Shared catalog used by the API
+catalog = create_catalog(Path(__file__).parent.parent / "apartments.json")
+
+
+def derived(
+    build: Callable[[List[Apartment]], Any],
+    follow_changes: bool = True,
+    reuse_stale: bool = False,
+) -> Callable[[List[Apartment]], Any]:
+    """
+    Make a getter for a value derived from a catalog, such as an index,
+    built once per catalog version.
+
+    Args:
+        build: Builds the value for a catalog. With reuse_stale, it is also
+            passed the value held for an older version of the same catalog
+            (or None) to bring up to date
+        follow_changes: Carry the value over to each new version of the
+            catalog with its apply_change method instead of rebuilding it
+        reuse_stale: See build
+
+    Returns:
+        Function returning the value for a catalog
+    """
+    # Imported here: apartment_loader depends on this module through tenants
+    from utils.apartment_loader import get_catalog_version
+
+    cache = VersionedCache()
+
+    def get(apartments: List[Apartment]) -> Any:
+        version = get_catalog_version(apartments)
+        value = cache.get(version)
+        if value is None:
+            if reuse_stale:
+                value = cache.put(version, build(apartments, cache.pop_catalog(version)))
+            else:
+                value = cache.put(version, build(apartments))
+        return value
+
+    def on_change(change: CatalogChange) -> None:
+        value = cache.pop(change.previous_version, None)
+        if value is not None:
+            value.apply_change(change)
+            cache[change.version] = value
+
+    if follow_changes:
+        catalog.add_listener(on_change)
+    return get
@@ -0,0 +1,141 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.catalog_store import CatalogChange, derived, update_column
+
+# Failing criteria, one bit each in the per-apartment failure mask
+CRITERIA = ("pets", "salary", "credit_score", "deposit")
+_PETS_BIT, _SALARY_BIT, _CREDIT_SCORE_BIT, _DEPOSIT_BIT = range(len(CRITERIA))
+
+
+class EligibilityIndex:
+    """
+    Qualification requirements of a catalog stored as columns.
+
+    Each qualification field is kept in its own NumPy array, so checking a
+    caller against every listing is a handful of vectorized comparisons rather
+    than a Python loop over apartments. Missing requirements never fail:
+    apartments without qualification data accept everyone. Catalog changes
+    are applied in place with apply_change.
+    """
+
+    def __init__(self, apartments: List[Dict]):
+        """
+        Args:
+            apartments: List of apartment dictionaries
+        """
+        self.apartments = apartments
+        rows = [_requirements(apt) for apt in apartments]
+
+        self.pets_failure = np.array([row[0] for row in rows], dtype=np.uint8)
+        self.minimum_salary = np.array([row[1] for row in rows], dtype=np.float64)
+        self.minimum_credit_score = np.array([row[2] for row in rows], dtype=np.float64)
+        self.deposit_amount = np.array([row[3] for row in rows], dtype=np.float64)
+
+        # Response entries are built once per catalog version, not per request
+        self.summaries = [_summarize(apt) for apt in apartments]
+
+    def apply_change(self, change: CatalogChange) -> None:
+        """Update the columns in place for one catalog change"""
+        pets_failure, minimum_salary, minimum_credit_score, deposit_amount = _requirements(
+            change.apartment or {}
+        )
+        self.pets_failure = update_column(self.pets_failure, change, pets_failure)
+        self.minimum_salary = update_column(self.minimum_salary, change, minimum_salary)
+        self.minimum_credit_score = update_column(self.minimum_credit_score, change, minimum_credit_score)
+        self.deposit_amount = update_column(self.deposit_amount, change, deposit_amount)
+
+        if change.op == "create":
+            self.summaries.append(_summarize(change.apartment))
+        elif change.op == "patch":
+            self.summaries[change.row] = _summarize(change.apartment)
+        else:
+            self.summaries[change.row] = self.summaries[-1]
+            self.summaries.pop()
+
+    def failure_masks(
+        self,
+        monthly_salary: Optional[float] = None,
+        credit_score: Optional[int] = None,
+        has_pets: Optional[bool] = None,
+        deposit_budget: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Compute which criteria each apartment fails for a caller profile.
+
+        Profile fields left as None are not checked.
+
+        Returns:
+            Array with one bitmask per apartment (0 means eligible)
+        """
+        masks = np.zeros(len(self.apartments), dtype=np.uint8)
+        if has_pets:
+            masks |= self.pets_failure
+        # Boolean comparison results are viewed as 0/1 bytes and shifted into place
+        if monthly_salary is not None:
+            masks |= (self.minimum_salary > monthly_salary).view(np.uint8) << _SALARY_BIT
+        if credit_score is not None:
+            masks |= (self.minimum_credit_score > credit_score).view(np.uint8) << _CREDIT_SCORE_BIT
+        if deposit_budget is not None:
+            masks |= (self.deposit_amount > deposit_budget).view(np.uint8) << _DEPOSIT_BIT
+        return masks
+
+    def check(self, **profile: Any) -> Dict[str, List[Dict]]:
+        """
+        Split the catalog into eligible and ineligible apartments for a caller.
+
+        Args:
+            **profile: monthly_salary, credit_score, has_pets and deposit_budget,
+                as accepted by failure_masks
+
+        Returns:
+            Dict with 'eligible' apartments, and 'ineligible' apartment IDs and
+            names with their 'failed_criteria'
+        """
+        masks = self.failure_masks(**profile)
+
+        # Decode each distinct mask once instead of once per apartment
+        decoded = {
+            int(mask): [name for bit, name in enumerate(CRITERIA) if mask & (1 << bit)]
+            for mask in np.unique(masks)
+        }
+
+        eligible = [self.summaries[index] for index in np.flatnonzero(masks == 0).tolist()]
+        ineligible = [
+            {
+                "id": self.summaries[index]["id"],
+                "name": self.summaries[index]["name"],
+                "failed_criteria": decoded[mask],
+            }
+            for index, mask in zip(np.flatnonzero(masks).tolist(), masks[masks != 0].tolist())
+        ]
+
+        return {"eligible": eligible, "ineligible": ineligible}
+
+
+def _requirements(apt: Dict) -> Tuple[int, float, float, float]:
+    """Pets failure bit, minimum salary, minimum credit score and deposit of an apartment"""
+    q = apt.get("qualification") or {}
+
+    def value(field: str) -> float:
+        return 0.0 if q.get(field) is None else float(q.get(field))
+
+    pets_failure = (q.get("allow_pets", True) is False) << _PETS_BIT
+    deposit = value("deposit_amount") if q.get("deposit_required", True) is not False else 0.0
+    return pets_failure, value("minimum_salary"), value("minimum_credit_score"), deposit
+
+
+def _summarize(apt: Dict) -> Dict:
+    return {
+        "id": apt.get("id"),
+        "name": apt.get("name"),
+        "city": apt.get("city"),
+        "neighbourhood": apt.get("neighbourhood"),
+        "price": apt.get("price"),
+        "available": apt.get("status") == "open",
+    }
+
+
+# Get the eligibility index for a catalog
+get_eligibility_index = derived(EligibilityIndex)
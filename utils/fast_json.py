@@ -0,0 +1,67 @@
+import functools
+import inspect
+from typing import Any, Callable
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from models.apartment import Record
+
+# Integer dict keys (e.g. agent assignments) and NumPy scalars/arrays are
+# encoded directly instead of going through jsonable_encoder first
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    if isinstance(obj, BaseModel):
+        # Works for validated and model_construct()ed models alike; nested
+        # models come back through here
+        return obj.__dict__
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode a response body with orjson"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route that encodes endpoint results straight to JSON with orjson.
+
+    FastAPI validates a result against the route's response_model and runs it
+    through jsonable_encoder before encoding it. Here the result is encoded as
+    it is, so response models only document the response in the OpenAPI
+    schema, and endpoints can return them built with model_construct() to
+    skip validation too. Endpoints returning a Response are left untouched.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _encode_result(endpoint, kwargs.get("status_code") or 200)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _encode_result(endpoint: Callable[..., Any], status_code: int) -> Callable[..., Any]:
+    # functools.wraps keeps the signature FastAPI reads parameters from
+    @functools.wraps(endpoint)
+    async def encode(*args: Any, **kwargs: Any) -> Response:
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        return FastJSONResponse(result, status_code=status_code)
+
+    return encode
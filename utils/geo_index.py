@@ -0,0 +1,262 @@
+import heapq
+import json
+import math
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from utils.catalog_store import CatalogChange, derived
+from utils.text import fold_accents
+
+EARTH_RADIUS_KM = 6371.0
+
+# Grid cell size in degrees (about 1.1 km north-south)
+CELL_SIZE_DEG = 0.01
+
+# Default radius used when filtering apartments near a place
+DEFAULT_RADIUS_KM = 2.0
+
+Point = Tuple[float, float]
+
+
+def haversine_km(a: Point, b: Point) -> float:
+    """Great-circle distance between two (lat, lon) points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+@lru_cache(maxsize=1)
+def load_geo_data() -> Dict:
+    """
+    Load the bundled zipcode, neighbourhood and landmark centroids
+
+    Raises:
+        HTTPException: If file not found or invalid JSON
+    """
+    geo_file = Path(__file__).parent.parent / "geo_centroids.json"
+    try:
+        with open(geo_file, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="geo_centroids.json file not found")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=500, detail=f"Invalid JSON in geo_centroids.json: {str(e)}")
+
+
+def area_key(apt: Dict) -> str:
+    """Identify an apartment's area as City/Neighbourhood, e.g. "Barcelona/Eixample" """
+    return f"{apt.get('city')}/{apt.get('neighbourhood')}"
+
+
+def resolve_coordinates(apt: Dict) -> Optional[Point]:
+    """
+    Get an apartment's coordinates.
+
+    Uses the apartment's own latitude/longitude when present, and otherwise
+    backfills them from the centroid of its zipcode or, failing that, of its
+    neighbourhood.
+    """
+    if apt.get("latitude") is not None and apt.get("longitude") is not None:
+        return float(apt["latitude"]), float(apt["longitude"])
+
+    geo_data = load_geo_data()
+    centroid = geo_data["zipcodes"].get(apt.get("zipcode") or "")
+    if centroid is None:
+        centroid = geo_data["neighbourhoods"].get(apt.get("city"), {}).get(apt.get("neighbourhood"))
+    if centroid is None:
+        return None
+    return centroid["lat"], centroid["lon"]
+
+
+def resolve_place(name: str) -> Optional[List[Point]]:
+    """
+    Resolve a place name to one or more points.
+
+    Matches bundled landmarks and their aliases ("playa" resolves to every
+    beach), then neighbourhood names, ignoring case and accents.
+    """
+    wanted = fold_accents(name.strip())
+    geo_data = load_geo_data()
+
+    for landmark, entry in geo_data["landmarks"].items():
+        names = [landmark] + entry.get("aliases", [])
+        if wanted in (fold_accents(n) for n in names):
+            return [(p["lat"], p["lon"]) for p in entry["points"]]
+
+    points = [
+        (centroid["lat"], centroid["lon"])
+        for city, neighbourhoods in geo_data["neighbourhoods"].items()
+        for neighbourhood, centroid in neighbourhoods.items()
+        if wanted in (fold_accents(neighbourhood), fold_accents(f"{neighbourhood} {city}"))
+    ]
+    return points or None
+
+
+class GeoIndex:
+    """
+    Uniform grid index over apartment coordinates.
+
+    Apartments are bucketed into CELL_SIZE_DEG cells; radius queries only scan
+    the cells overlapping the circle's bounding box, and nearest-neighbour
+    queries scan rings of cells outwards until no closer apartment can exist.
+    """
+
+    def __init__(self, apartments: List[Dict]):
+        """
+        Args:
+            apartments: List of apartment dictionaries; those without resolvable
+                coordinates are left out of the index
+        """
+        self.apartments = apartments
+        self.points: Dict[int, Point] = {}
+        self.cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+
+        for row, apt in enumerate(apartments):
+            self._add(row, resolve_coordinates(apt))
+
+    def _add(self, row: int, point: Optional[Point]) -> None:
+        if point is None:
+            return
+        self.points[row] = point
+        cell = self._cell(point)
+        self.cells.setdefault(cell, set()).add(row)
+        # Bounds only grow; stale wider bounds just make nearest() scan a few empty rings
+        if self._bounds is None:
+            self._bounds = (cell[0], cell[0], cell[1], cell[1])
+        else:
+            min_row, max_row, min_col, max_col = self._bounds
+            self._bounds = (
+                min(min_row, cell[0]), max(max_row, cell[0]),
+                min(min_col, cell[1]), max(max_col, cell[1]),
+            )
+
+    def _remove(self, row: int) -> Optional[Point]:
+        point = self.points.pop(row, None)
+        if point is not None:
+            cell = self._cell(point)
+            self.cells[cell].discard(row)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        return point
+
+    def apply_change(self, change: CatalogChange) -> None:
+        """Update the grid in place for one catalog change"""
+        self._remove(change.row)
+        if change.moved_from is not None:
+            self._add(change.row, self._remove(change.moved_from))
+        if change.apartment is not None:
+            self._add(change.row, resolve_coordinates(change.apartment))
+
+    @staticmethod
+    def _cell(point: Point) -> Tuple[int, int]:
+        return math.floor(point[0] / CELL_SIZE_DEG), math.floor(point[1] / CELL_SIZE_DEG)
+
+    def _distance(self, row: int, points: List[Point]) -> float:
+        return min(haversine_km(self.points[row], point) for point in points)
+
+    def within_radius(self, points: List[Point], radius_km: float) -> List[Tuple[int, float]]:
+        """
+        Find apartments within radius_km of any of the given points.
+
+        Returns:
+            List of (row, distance_km) pairs, closest first
+        """
+        found: Dict[int, float] = {}
+        for point in points:
+            lat_span = radius_km / 111.0
+            lon_span = radius_km / (111.0 * max(math.cos(math.radians(point[0])), 0.01))
+            low = self._cell((point[0] - lat_span, point[1] - lon_span))
+            high = self._cell((point[0] + lat_span, point[1] + lon_span))
+            for i in range(low[0], high[0] + 1):
+                for j in range(low[1], high[1] + 1):
+                    for row in self.cells.get((i, j), ()):
+                        distance = haversine_km(self.points[row], point)
+                        if distance <= radius_km and distance < found.get(row, math.inf):
+                            found[row] = distance
+        return sorted(found.items(), key=lambda item: item[1])
+
+    def nearest(self, points: List[Point], k: int) -> List[Tuple[int, float]]:
+        """
+        Find the k apartments closest to any of the given points.
+
+        Returns:
+            List of (row, distance_km) pairs, closest first
+        """
+        if not self.cells:
+            return []
+
+        candidates = set()
+        for point in points:
+            candidates.update(self._nearest_rows(point, k))
+        scored = [(row, self._distance(row, points)) for row in candidates]
+        return heapq.nsmallest(k, scored, key=lambda item: item[1])
+
+    def _nearest_rows(self, point: Point, k: int) -> List[int]:
+        center = self._cell(point)
+        min_row, max_row, min_col, max_col = self._bounds
+        max_ring = max(
+            abs(center[0] - min_row), abs(center[0] - max_row),
+            abs(center[1] - min_col), abs(center[1] - max_col),
+        )
+        # Smallest distance covered by one ring of cells
+        ring_km = CELL_SIZE_DEG * 111.0 * max(math.cos(math.radians(point[0])), 0.01)
+
+        best: List[Tuple[float, int]] = []
+        for ring in range(max_ring + 1):
+            for i in range(center[0] - ring, center[0] + ring + 1):
+                for j in range(center[1] - ring, center[1] + ring + 1):
+                    if max(abs(i - center[0]), abs(j - center[1])) != ring:
+                        continue
+                    for row in self.cells.get((i, j), ()):
+                        best.append((haversine_km(self.points[row], point), row))
+            # Anything in further rings is at least ring * ring_km away
+            if len(best) >= k and heapq.nsmallest(k, best)[-1][0] <= ring * ring_km:
+                break
+        return [row for _, row in heapq.nsmallest(k, best)]
+
+    def describe(self, row: int, distance_km: float) -> Dict:
+        """Build the response entry for an indexed apartment"""
+        apt = self.apartments[row]
+        latitude, longitude = self.points[row]
+        return {
+            "id": apt.get("id"),
+            "name": apt.get("name"),
+            "city": apt.get("city"),
+            "neighbourhood": apt.get("neighbourhood"),
+            "price": apt.get("price"),
+            "available": apt.get("status") == "open",
+            "latitude": latitude,
+            "longitude": longitude,
+            "distance_km": round(distance_km, 2),
+        }
+
+
+# Get the geo index for a catalog
+get_geo_index = derived(GeoIndex)
+
+
+def filter_near(apartments: List[Dict], near: str, radius_km: float = DEFAULT_RADIUS_KM) -> List[Dict]:
+    """
+    Keep only the apartments within radius_km of a named place.
+
+    Args:
+        apartments: List of apartment dictionaries
+        near: Landmark or neighbourhood name, e.g. "playa" or "Sagrada Família"
+        radius_km: Search radius
+
+    Returns:
+        Apartments within the radius, closest first
+
+    Raises:
+        HTTPException: 400 if the place is unknown
+    """
+    points = resolve_place(near)
+    if points is None:
+        raise HTTPException(status_code=400, detail=f"Unknown place: {near}")
+
+    index = get_geo_index(apartments)
+    return [index.apartments[row] for row, _ in index.within_radius(points, radius_km)]
@@ -0,0 +1,299 @@
+import math
+from itertools import product
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.catalog_store import CatalogChange, derived
+
+# Medians and p90s are reported within this relative error of the listing at
+# their rank (1%: a median rent of 1400 is reported between 1386 and 1414);
+# minimums are exact
+RELATIVE_ACCURACY = 0.01
+
+# Grouping key: (city, neighbourhood, bedrooms), folded; None matches any
+GroupKey = Tuple[Optional[str], Optional[str], Optional[int]]
+
+# Price, price per sqft, pet-friendly (0/1) and open (0/1) of a listing
+_Facts = Tuple[Optional[float], Optional[float], int, int]
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a relative-error guarantee (DDSketch).
+
+    Positive values are counted in logarithmic buckets, bucket i holding
+    values in (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so the
+    value at any rank is answered within relative accuracy a from a few
+    hundred counters at most. Counts can be decremented, so a value can be removed
+    again, and two sketches merge by adding their counts: the sketch of a
+    group is exactly the merge of the sketches of its parts.
+    """
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        # Zero and negative values, reported as 0
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Count a value (a negative weight removes it)"""
+        self.count += weight
+        if value <= 0:
+            self.zeros += weight
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        count = self.buckets.get(key, 0) + weight
+        if count:
+            self.buckets[key] = count
+        else:
+            del self.buckets[key]
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add another sketch's values to this one"""
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        """
+        Values at each quantile in qs (ascending), None when empty.
+
+        The quantile q of n values is the value at rank int(q * n) (0-based,
+        capped at n - 1) in sorted order, as the latency percentiles
+        elsewhere; only that value is within the relative accuracy, there is
+        no interpolation between ranks.
+        """
+        if self.count <= 0:
+            return [None] * len(qs)
+        results = []
+        remaining = iter(qs)
+        q = next(remaining, None)
+        seen = self.zeros
+        while q is not None and seen > self._rank(q):
+            results.append(0.0)
+            q = next(remaining, None)
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            while q is not None and seen > self._rank(q):
+                # Midpoint of the bucket, in relative terms
+                results.append(2 * self.gamma ** key / (self.gamma + 1))
+                q = next(remaining, None)
+            if q is None:
+                break
+        return results
+
+    def _rank(self, q: float) -> int:
+        return min(self.count - 1, int(q * self.count))
+
+
+class ExactMin:
+    """
+    Exact minimum of a set of values that can be removed again.
+
+    Values are counted, so adding or removing one is O(1); the minimum is
+    only recomputed, over the distinct values, after the last copy of it is
+    removed. Two trackers merge by adding their counts.
+    """
+
+    def __init__(self):
+        self.counts: Dict[float, int] = {}
+        self._min: Optional[float] = None
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Count a value (a negative weight removes it)"""
+        count = self.counts.get(value, 0) + weight
+        if count:
+            self.counts[value] = count
+        else:
+            del self.counts[value]
+        if weight > 0:
+            if self._min is not None and value < self._min:
+                self._min = value
+        elif not count and value == self._min:
+            # Recomputed when next asked for
+            self._min = None
+
+    def merge(self, other: "ExactMin") -> None:
+        """Add another tracker's values to this one"""
+        for value, count in other.counts.items():
+            self.add(value, count)
+
+    @property
+    def value(self) -> Optional[float]:
+        """The smallest value, None when empty"""
+        if self._min is None and self.counts:
+            self._min = min(self.counts)
+        return self._min
+
+
+class Rollup:
+    """Listing count, price sketches and minimums, and pet/open tallies of one group"""
+
+    def __init__(self):
+        self.count = 0
+        self.pet_friendly = 0
+        self.open = 0
+        self.price = QuantileSketch()
+        self.price_per_sqft = QuantileSketch()
+        self.min_price = ExactMin()
+        self.min_price_per_sqft = ExactMin()
+        self._summary: Optional[Dict[str, Any]] = None
+
+    def add(self, facts: _Facts, weight: int = 1) -> None:
+        """Count a listing's facts (a negative weight removes them)"""
+        price, price_per_sqft, pet_friendly, is_open = facts
+        self.count += weight
+        self.pet_friendly += weight * pet_friendly
+        self.open += weight * is_open
+        if price is not None:
+            self.price.add(price, weight)
+            self.min_price.add(price, weight)
+        if price_per_sqft is not None:
+            self.price_per_sqft.add(price_per_sqft, weight)
+            self.min_price_per_sqft.add(price_per_sqft, weight)
+        self._summary = None
+
+    def merge(self, other: "Rollup") -> None:
+        """Add another group's listings to this one"""
+        self.count += other.count
+        self.pet_friendly += other.pet_friendly
+        self.open += other.open
+        self.price.merge(other.price)
+        self.price_per_sqft.merge(other.price_per_sqft)
+        self.min_price.merge(other.min_price)
+        self.min_price_per_sqft.merge(other.min_price_per_sqft)
+        self._summary = None
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, min/median/p90 price and price per sqft, pet-friendly and open shares"""
+        if self._summary is None:
+            self._summary = {
+                "count": self.count,
+                "price": _distribution(self.price, self.min_price, 0),
+                "price_per_sqft": _distribution(self.price_per_sqft, self.min_price_per_sqft, 2),
+                "pet_friendly_share": round(self.pet_friendly / self.count, 3) if self.count else None,
+                "open_share": round(self.open / self.count, 3) if self.count else None,
+            }
+        return self._summary
+
+
+def _distribution(sketch: QuantileSketch, low: ExactMin, digits: int) -> Optional[Dict[str, float]]:
+    if sketch.count <= 0:
+        return None
+    low, median, p90 = (
+        round(value, digits) if digits else round(value)
+        for value in (low.value, *sketch.quantiles([0.5, 0.9]))
+    )
+    return {"min": low, "median": median, "p90": p90}
+
+
+def _fold(value: Optional[str]) -> Optional[str]:
+    folded = (value or "").strip().lower()
+    return folded or None
+
+
+class MarketStats:
+    """
+    Market rollups of a catalog per city, neighbourhood and bedroom count.
+
+    One Rollup is kept for every combination of city, neighbourhood and
+    bedroom count present in the catalog, each of them possibly "any" (e.g.
+    all 2-bedroom listings in Barcelona, whatever the neighbourhood), so
+    answering a query is a dict lookup. The rollups are built by merging the
+    finest groups into the coarser ones; catalog changes are applied in place
+    with apply_change by removing the old listing from its groups and adding
+    the new one.
+    """
+
+    def __init__(self, apartments: List[Dict]):
+        """
+        Args:
+            apartments: List of apartment dictionaries
+        """
+        self.names: Dict[str, str] = {}
+        finest: Dict[GroupKey, Rollup] = {}
+        for apt in apartments:
+            key, facts = self._describe(apt)
+            finest.setdefault(key, Rollup()).add(facts)
+
+        self.rollups: Dict[GroupKey, Rollup] = {}
+        for key, rollup in finest.items():
+            for group in _groups(key):
+                self.rollups.setdefault(group, Rollup()).merge(rollup)
+
+    def _describe(self, apt: Dict) -> Tuple[GroupKey, _Facts]:
+        city, neighbourhood = _fold(apt.get("city")), _fold(apt.get("neighbourhood"))
+        # Display names: as first seen in the catalog
+        for folded, name in ((city, apt.get("city")), (neighbourhood, apt.get("neighbourhood"))):
+            if folded is not None:
+                self.names.setdefault(folded, name.strip())
+        bedrooms = apt.get("bedrooms")
+
+        price = apt.get("price")
+        sqft = apt.get("sqft")
+        price_per_sqft = price / sqft if price is not None and sqft else None
+        qualification = apt.get("qualification") or {}
+        # Like check-eligibility: no pets requirement means pets are accepted
+        pet_friendly = int(qualification.get("allow_pets", True) is not False)
+        is_open = int(apt.get("status") == "open")
+        return (city, neighbourhood, bedrooms), (price, price_per_sqft, pet_friendly, is_open)
+
+    def apply_change(self, change: CatalogChange) -> None:
+        """Update the rollups in place for one catalog change"""
+        if change.previous is not None:
+            self._add(change.previous, -1)
+        if change.apartment is not None:
+            self._add(change.apartment, 1)
+
+    def _add(self, apt: Dict, weight: int) -> None:
+        key, facts = self._describe(apt)
+        for group in _groups(key):
+            rollup = self.rollups.setdefault(group, Rollup())
+            rollup.add(facts, weight)
+            if rollup.count == 0:
+                del self.rollups[group]
+
+    def get(
+        self,
+        city: Optional[str] = None,
+        neighbourhood: Optional[str] = None,
+        bedrooms: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Market stats of the listings matching a city, neighbourhood and
+        bedroom count (each optional; case-insensitive names).
+
+        Returns:
+            Dict with the group, its count, min/median/p90 price and price
+            per sqft, and pet-friendly and open shares. Without a bedroom
+            count, 'by_bedrooms' breaks the group down per bedroom count
+        """
+        city_name, neighbourhood_name = city, neighbourhood
+        city, neighbourhood = _fold(city), _fold(neighbourhood)
+        rollup = self.rollups.get((city, neighbourhood, bedrooms)) or Rollup()
+        stats = {
+            "city": self.names.get(city, city_name),
+            "neighbourhood": self.names.get(neighbourhood, neighbourhood_name),
+            "bedrooms": bedrooms,
+            **rollup.summary(),
+        }
+        if bedrooms is None:
+            stats["by_bedrooms"] = [
+                {"bedrooms": key[2], **self.rollups[key].summary()}
+                for key in sorted(
+                    key for key in self.rollups
+                    if key[:2] == (city, neighbourhood) and key[2] is not None
+                )
+            ]
+        return stats
+
+
+def _groups(key: GroupKey) -> List[GroupKey]:
+    """Every group a listing with this key belongs to, "any" included for each field"""
+    return list(product(*(((value, None) if value is not None else (None,)) for value in key)))
+
+
+# Get the market rollups for a catalog
+get_market_stats = derived(MarketStats)
@@ -0,0 +1,251 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from utils.admin_auth import is_admin_key
+
+# Longest whole-process sampling run accepted by the admin endpoint
+MAX_SAMPLE_SECONDS = 60
+
+_ROOT = str(Path(__file__).parent.parent) + os.sep
+
+
+class ProfileStore:
+    """
+    Reports of the most recent profiled requests.
+
+    Only one request is profiled at a time: cProfile hooks the whole
+    interpreter thread, so a second profiler would replace the first.
+    """
+
+    def __init__(self, keep: Optional[int] = None):
+        """
+        Args:
+            keep: Reports kept, oldest dropped first. If not provided, uses
+                PROFILE_KEEP (default 20)
+        """
+        if keep is None:
+            keep = int(os.getenv("PROFILE_KEEP", "20"))
+        self.keep = max(1, keep)
+        self.reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.active: Optional[str] = None
+
+    def start(self) -> Optional[str]:
+        """Claim the profiler, returning a report ID (None if it is busy)"""
+        if self.active is not None:
+            return None
+        self.active = uuid.uuid4().hex[:12]
+        return self.active
+
+    def finish(
+        self, profile_id: str, profiler: cProfile.Profile, method: str, path: str, duration: float
+    ) -> None:
+        """Store the report of a profiled request and release the profiler"""
+        profiler.create_stats()
+        self.reports[profile_id] = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "duration_ms": round(duration * 1000, 3),
+            "created_at": time.time(),
+            "stats": profiler.stats,
+        }
+        while len(self.reports) > self.keep:
+            self.reports.popitem(last=False)
+        self.active = None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Stored reports, newest first, without their stats"""
+        return [
+            {key: value for key, value in report.items() if key != "stats"}
+            for report in reversed(self.reports.values())
+        ]
+
+    def text(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> str:
+        """
+        Render a report like pstats' print_stats.
+
+        Raises:
+            HTTPException: 404 if the report is unknown, 400 for an unknown sort key
+        """
+        report = self._get(profile_id)
+        out = io.StringIO()
+        out.write(f"{report['method']} {report['path']} took {report['duration_ms']} ms\n")
+        stats = pstats.Stats(_StatsSource(report["stats"]), stream=out)
+        try:
+            stats.sort_stats(sort)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+        stats.print_stats(limit)
+        return out.getvalue()
+
+    def dump(self, profile_id: str) -> bytes:
+        """
+        A report in the .prof format pstats, snakeviz and similar tools load.
+
+        Raises:
+            HTTPException: 404 if the report is unknown
+        """
+        return marshal.dumps(self._get(profile_id)["stats"])
+
+    def _get(self, profile_id: str) -> Dict[str, Any]:
+        report = self.reports.get(profile_id)
+        if report is None:
+            raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+        return report
+
+
+class _StatsSource:
+    # pstats.Stats loads anything with a create_stats method and a stats dict
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+# Shared report store used by the API
+profiles = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """
+    Profile single requests on demand.
+
+    A request sent with "X-Profile: 1" and an X-API-Key matching
+    ADMIN_API_KEY runs under cProfile; the response carries an X-Profile-ID
+    header naming the stored report. Other coroutines interleaved on the
+    event loop while the request runs are included in its profile. The
+    header is ignored without a valid key, and while another request is
+    being profiled.
+    """
+
+    def __init__(self, app, store: ProfileStore):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+        api_key = headers.get(b"x-api-key")
+        if not is_admin_key(api_key.decode("latin-1") if api_key else None):
+            await self.app(scope, receive, send)
+            return
+        profile_id = self.store.start()
+        if profile_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())],
+                }
+            await send(message)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            self.store.finish(
+                profile_id, profiler, scope["method"], scope["path"], time.perf_counter() - started
+            )
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = filename[len(_ROOT):]
+    else:
+        # Library frames: keep the path from the package directory on
+        marker = filename.rfind("site-packages" + os.sep)
+        if marker != -1:
+            filename = filename[marker + len("site-packages" + os.sep):]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Low-overhead sampling profiler of the whole process.
+
+    A background thread snapshots every thread's stack at a fixed interval
+    with sys._current_frames(); nothing runs in the profiled threads, so the
+    overhead is the sampler's own CPU time. Samples are aggregated as
+    collapsed stacks, the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float) -> str:
+        """
+        Sample every thread for a while.
+
+        Args:
+            seconds: How long to sample
+            interval: Seconds between samples
+
+        Returns:
+            Collapsed stacks, one "thread;outer;...;inner count" line each,
+            most frequent first
+
+        Raises:
+            HTTPException: 409 if a sampling run is already in progress
+        """
+        if not self._lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="A profile is already being sampled")
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float) -> str:
+        me = threading.get_ident()
+        names = {}
+        labels_by_code = {}
+        stacks: Counter = Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels_by_code.get(code)
+                    if label is None:
+                        label = labels_by_code[code] = _frame_label(code)
+                    labels.append(label)
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    names.setdefault(thread_id, f"thread-{thread_id}")
+                labels.append(names[thread_id])
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(interval)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# Shared sampler used by the API
+sampler = SamplingProfiler()
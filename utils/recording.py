@@ -0,0 +1,248 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from utils.admission import admission
+
+# Identifiers replaced by keyed-hash pseudonyms: stable within a recording
+# (so an appointment's add and cancel still pair up on replay) but not
+# reversible without the key
+PSEUDONYMIZED_FIELDS = frozenset({"user_id", "appointment_id", "caller"})
+
+# Financial details rounded down to a coarse bucket
+ROUNDED_FIELDS = {"monthly_salary": 500, "deposit_budget": 500, "credit_score": 50}
+
+# Free-text fields, where callers may dictate contact details
+FREE_TEXT_FIELDS = frozenset({"query", "near", "message", "detail"})
+
+# Free-text PII: e-mail addresses, then phone, card and ID numbers (runs of
+# 7+ digits, allowing spaces, dots and dashes)
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+NUMBER_RE = re.compile(r"\+?\d[\d .-]{5,}\d")
+# Slot dates (DD-MM-YYYY) look like such runs but are kept
+DATE_RE = re.compile(r"(?<!\d)\d{2}-\d{2}-\d{4}(?!\d)")
+
+# Request headers kept with each exchange
+RECORDED_HEADERS = (b"x-tenant-id",)
+
+_current_exchange: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_exchange", default=None)
+
+
+class TrafficRecorder:
+    """
+    Recorder of tool-call traffic for replay.
+
+    Each /tool/* exchange is written as one JSON line: request body,
+    response status and body, latency and the raw LLM responses produced
+    while serving it. Bodies are scrubbed of PII before they are written:
+    identifiers are pseudonymized, salary, credit score and deposit figures
+    rounded, and e-mail addresses and long numbers in free-text fields
+    (queries, places, messages) redacted. LLM responses are structured
+    output (match flags and apartment IDs) and are kept verbatim, as replays
+    feed them back. Files rotate by size like log files (traffic.jsonl,
+    traffic.jsonl.1, ...).
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        record_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        backups: Optional[int] = None,
+        max_body_bytes: Optional[int] = None,
+    ):
+        """
+        Args:
+            enabled: Record traffic. If not provided, uses RECORD_TRAFFIC
+                (default false)
+            record_dir: Directory of the recording. If not provided, uses
+                RECORD_DIR (default "data/recordings")
+            max_bytes: Size at which traffic.jsonl is rotated. If not
+                provided, uses RECORD_MAX_MB (default 50)
+            backups: Rotated files kept. If not provided, uses RECORD_BACKUPS
+                (default 5)
+            max_body_bytes: Larger response bodies are recorded by digest
+                only. If not provided, uses RECORD_MAX_BODY_KB (default 256)
+        """
+        if enabled is None:
+            enabled = os.getenv("RECORD_TRAFFIC", "").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.record_dir = Path(record_dir or os.getenv("RECORD_DIR", "data/recordings"))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("RECORD_MAX_MB", "50")) * 2**20)
+        if backups is None:
+            backups = int(os.getenv("RECORD_BACKUPS", "5"))
+        if max_body_bytes is None:
+            max_body_bytes = int(os.getenv("RECORD_MAX_BODY_KB", "256")) * 1024
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_body_bytes = max_body_bytes
+
+        # Pseudonyms only need to be stable within one recording session
+        self._key = secrets.token_bytes(16)
+        self._seq = 0
+        self._logger: Optional[logging.Logger] = None
+
+    def _open(self) -> logging.Logger:
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            self.record_dir / "traffic.jsonl",
+            maxBytes=self.max_bytes,
+            backupCount=self.backups,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"{__name__}.{id(self)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        return logger
+
+    def pseudonym(self, value: Any) -> str:
+        """Keyed-hash pseudonym of an identifier"""
+        digest = hmac.new(self._key, str(value).encode("utf-8"), hashlib.sha256).hexdigest()
+        return f"anon-{digest[:12]}"
+
+    def scrub(self, value: Any, key: Optional[str] = None, identifiers: Tuple[str, ...] = ()) -> Any:
+        """
+        Scrub PII from a JSON value.
+
+        Args:
+            value: JSON value
+            key: Field the value belongs to
+            identifiers: Raw identifiers to pseudonymize inside free text too
+                (e.g. an appointment ID echoed in a message)
+        """
+        if isinstance(value, dict):
+            return {k: self.scrub(v, k, identifiers) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.scrub(v, key, identifiers) for v in value]
+        if value is None or isinstance(value, bool):
+            return value
+        if key in PSEUDONYMIZED_FIELDS:
+            return self.pseudonym(value)
+        if key in ROUNDED_FIELDS and isinstance(value, (int, float)):
+            step = ROUNDED_FIELDS[key]
+            return type(value)(value // step * step)
+        if key in FREE_TEXT_FIELDS and isinstance(value, str):
+            for identifier in identifiers:
+                value = value.replace(identifier, self.pseudonym(identifier))
+            return NUMBER_RE.sub(_redact_number, EMAIL_RE.sub("[email]", value))
+        return value
+
+    def begin(self, method: str, path: str, headers: Dict[bytes, bytes], caller: str) -> Dict[str, Any]:
+        """Start recording an exchange"""
+        self._seq += 1
+        exchange = {
+            "seq": self._seq,
+            "ts": time.time(),
+            "method": method,
+            "path": path,
+            "headers": {
+                name.decode("latin-1"): headers[name].decode("latin-1")
+                for name in RECORDED_HEADERS
+                if name in headers
+            },
+            "caller": caller,
+            "llm": [],
+        }
+        return exchange
+
+    def write(self, exchange: Dict[str, Any], request_body: bytes, status: int, response_body: bytes) -> None:
+        """Scrub a finished exchange and append it to the recording"""
+        request = _parse_json(request_body)
+        identifiers = tuple(
+            str(request[field])
+            for field in PSEUDONYMIZED_FIELDS
+            if isinstance(request, dict) and request.get(field)
+        )
+        exchange["request"] = self.scrub(request)
+        exchange["status"] = status
+        exchange["response_sha1"] = hashlib.sha1(response_body).hexdigest()
+        exchange["response"] = (
+            self.scrub(_parse_json(response_body), identifiers=identifiers)
+            if len(response_body) <= self.max_body_bytes
+            else None
+        )
+        exchange["caller"] = self.pseudonym(exchange["caller"])
+        if self._logger is None:
+            self._logger = self._open()
+        self._logger.info(json.dumps(exchange, ensure_ascii=False))
+
+
+def _redact_number(match: re.Match) -> str:
+    return match.group() if DATE_RE.search(match.group()) else "[number]"
+
+
+def _parse_json(body: bytes) -> Any:
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
+
+
+def record_llm_response(text: Optional[str]) -> None:
+    """Attach a raw LLM response to the exchange being recorded, if any"""
+    exchange = _current_exchange.get()
+    if exchange is not None:
+        exchange["llm"].append(text or "")
+
+
+# Shared recorder used by the API
+recorder = TrafficRecorder()
+
+
+class RecordingMiddleware:
+    """Record /tool/* exchanges (tenant-prefixed ones included) when recording is enabled"""
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if not self.recorder.enabled or scope["type"] != "http" or "/tool/" not in scope["path"]:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        # The caller admission control rate limits the request under
+        caller = admission.caller(scope)
+        exchange = self.recorder.begin(scope["method"], scope["path"], headers, caller)
+        request_body = bytearray()
+        response_body = bytearray()
+        status = 500
+        started = time.perf_counter()
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.extend(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.extend(message.get("body", b""))
+            await send(message)
+
+        # LLM responses produced while serving the request are attached to it
+        token = _current_exchange.set(exchange)
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            _current_exchange.reset(token)
+            exchange["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            self.recorder.write(exchange, bytes(request_body), status, bytes(response_body))
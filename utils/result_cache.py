@@ -0,0 +1,595 @@
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import orjson
+
+from utils.catalog_store import CatalogChange, catalog, catalog_name
+from utils.fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+# How long a worker trusts its copy of a catalog's generation before reading
+# it again. Invalidations made by the worker itself apply at once, and so do
+# catalog changes it applied (the catalog version is part of every key)
+GENERATION_CHECK_SECONDS = 1.0
+
+# Polling backoff while another worker holds the lease on a key
+LEASE_POLL_SECONDS = (0.01, 0.2)
+
+# After a backend error, the cache is bypassed for this long instead of
+# making every request wait on a backend that is down
+BACKEND_RETRY_SECONDS = 5.0
+
+
+class CacheBackendError(Exception):
+    """A shared cache backend failed or answered with an error"""
+
+
+class LocalBackend:
+    """In-process LRU: entries are only shared by requests of one worker"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        # Generations are kept apart so LRU eviction never resets them
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def _set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            if self._get(key) is not None:
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+
+class SharedMemoryBackend:
+    """
+    Cache shared by the workers of one host through a memory-mapped file.
+
+    The file (in /dev/shm by default, so it never touches disk) is a hash
+    table of fixed-size slots in sets of SET_WAYS; a key may go in any slot
+    of its set, replacing an expired entry first and otherwise the one that
+    expires soonest. Workers serialize access with an exclusive flock on the
+    file. Values larger than a slot are not cached. Counters never expire and
+    are only replaced when a whole set holds counters.
+    """
+
+    MAGIC = b"RCACHE01"
+    HEADER = struct.Struct("<8sII")
+    # Key digest, expiry (0 for counters), value length
+    SLOT_HEADER = struct.Struct("<16sdI")
+    SET_WAYS = 4
+    EMPTY = bytes(16)
+
+    def __init__(self, path: str, size_mb: float = 64, slot_kb: float = 64):
+        self.path = Path(path)
+        self.slot_size = int(slot_kb * 1024)
+        self.slots = max(self.SET_WAYS, int(size_mb * 2**20) // self.slot_size)
+        self.slots -= self.slots % self.SET_WAYS
+        self.max_value = self.slot_size - self.SLOT_HEADER.size
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.HEADER.size + self.slots * self.slot_size
+        with self._locked_file():
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+            magic, slots, slot_size = self.HEADER.unpack_from(self._map, 0)
+            if (magic, slots, slot_size) != (self.MAGIC, self.slots, self.slot_size):
+                # New segment, or one laid out for other settings: start empty
+                self._map[:] = bytes(size)
+                self.HEADER.pack_into(self._map, 0, self.MAGIC, self.slots, self.slot_size)
+
+    @contextlib.contextmanager
+    def _locked_file(self):
+        # flock excludes other processes, the thread lock other threads
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _offsets(self, digest: bytes) -> List[int]:
+        first = int.from_bytes(digest[:8], "little") % (self.slots // self.SET_WAYS) * self.SET_WAYS
+        return [self.HEADER.size + (first + way) * self.slot_size for way in range(self.SET_WAYS)]
+
+    def _find(self, digest: bytes, now: float) -> Tuple[Optional[int], int]:
+        """Offset of the live entry for a digest (if any) and of the slot to write it to"""
+        victim, victim_rank = None, None
+        for offset in self._offsets(digest):
+            slot_digest, expires, _ = self.SLOT_HEADER.unpack_from(self._map, offset)
+            live = slot_digest != self.EMPTY and (expires == 0 or expires > now)
+            if live and slot_digest == digest:
+                return offset, offset
+            # Prefer empty or expired slots, then the one expiring soonest;
+            # counters (expires 0) go last
+            rank = (expires or float("inf")) if live else -1
+            if victim_rank is None or rank < victim_rank:
+                victim, victim_rank = offset, rank
+        return None, victim
+
+    def _read(self, offset: int) -> bytes:
+        length = self.SLOT_HEADER.unpack_from(self._map, offset)[2]
+        start = offset + self.SLOT_HEADER.size
+        return self._map[start:start + length]
+
+    def _write(self, offset: int, digest: bytes, value: bytes, expires: float) -> None:
+        self.SLOT_HEADER.pack_into(self._map, offset, digest, expires, len(value))
+        start = offset + self.SLOT_HEADER.size
+        self._map[start:start + len(value)] = value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        digest = self._digest(key)
+        with self._locked_file():
+            found, _ = self._find(digest, time.time())
+            return self._read(found) if found is not None else None
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.max_value:
+            return
+        digest = self._digest(key)
+        now = time.time()
+        with self._locked_file():
+            _, offset = self._find(digest, now)
+            self._write(offset, digest, value, now + ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        digest = self._digest(key)
+        now = time.time()
+        with self._locked_file():
+            found, offset = self._find(digest, now)
+            if found is not None:
+                return False
+            self._write(offset, digest, value[:self.max_value], now + ttl)
+            return True
+
+    async def delete(self, key: str) -> None:
+        digest = self._digest(key)
+        with self._locked_file():
+            found, _ = self._find(digest, time.time())
+            if found is not None:
+                self.SLOT_HEADER.pack_into(self._map, found, self.EMPTY, 0.0, 0)
+
+    async def incr(self, key: str) -> int:
+        digest = self._digest(key)
+        with self._locked_file():
+            found, offset = self._find(digest, time.time())
+            value = int(self._read(found)) + 1 if found is not None else 1
+            self._write(offset, digest, str(value).encode(), 0.0)
+            return value
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.get(key)
+        return int(value) if value else 0
+
+
+class RedisBackend:
+    """
+    Cache shared across hosts, spoken to in the Redis protocol (RESP).
+
+    Works with Redis, Valkey, KeyDB and other servers speaking the protocol,
+    including the stand-in in scripts/resp_server.py. Connections are pooled
+    and opened lazily; a command that fails closes its connection.
+    """
+
+    def __init__(self, url: str, pool_size: int = 8, timeout: float = 1.0):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", ""):
+            raise ValueError(f"Unsupported cache URL: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.pool_size = max(1, pool_size)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._roundtrip(reader, writer, ("AUTH", self.password))
+        if self.db:
+            await self._roundtrip(reader, writer, ("SELECT", self.db))
+        return reader, writer
+
+    async def command(self, *args: Any) -> Any:
+        """Send one command and return its reply"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Connections belong to the loop that opened them
+            self._loop = loop
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            try:
+                connection = self._idle.pop() if self._idle else await asyncio.wait_for(
+                    self._connect(), self.timeout
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                raise CacheBackendError(f"Cannot connect to {self.host}:{self.port}: {e}")
+            try:
+                reply = await asyncio.wait_for(self._roundtrip(*connection, args), self.timeout)
+            except BaseException as e:
+                connection[1].close()
+                if isinstance(e, (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)):
+                    raise CacheBackendError(f"{args[0]} failed: {e!r}")
+                raise
+            self._idle.append(connection)
+            return reply
+
+    @staticmethod
+    async def _roundtrip(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, args) -> Any:
+        writer.write(encode_command(args))
+        await writer.drain()
+        return await read_reply(reader)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.command("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return await self.command("SET", key, value, "PX", max(1, int(ttl * 1000)), "NX") is not None
+
+    async def delete(self, key: str) -> None:
+        await self.command("DEL", key)
+
+    async def incr(self, key: str) -> int:
+        return await self.command("INCR", key)
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.get(key)
+        return int(value) if value else 0
+
+
+def encode_command(args) -> bytes:
+    """A command as a RESP array of bulk strings"""
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """
+    Read one RESP reply.
+
+    Raises:
+        CacheBackendError: For error replies
+    """
+    line = await reader.readuntil(b"\r\n")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode("utf-8")
+    if kind == b"-":
+        raise CacheBackendError(rest.decode("utf-8", errors="replace"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [await read_reply(reader) for _ in range(length)]
+    raise CacheBackendError(f"Unexpected reply: {line!r}")
+
+
+def _is_backend_error(e: BaseException) -> bool:
+    return isinstance(e, (CacheBackendError, OSError, ValueError))
+
+
+class ResultCache:
+    """
+    Cache of computed results (LLM matches, schedule feeds) on a pluggable backend.
+
+    Entries are keyed by namespace, catalog version and a caller key, under
+    the catalog's generation: a counter kept in the backend and bumped
+    whenever the catalog changes, so a change seen by one worker invalidates
+    what every worker cached for that catalog. Concurrent misses on one key
+    are computed once: within a worker, later callers wait for the first
+    one; across workers, the first to take the key's lease computes while
+    the others poll for its result (and compute it themselves if the lease
+    expires first). Results a caller flags as negative ("no match") are kept
+    for a shorter TTL. A failing backend is treated as a miss, and bypassed
+    for a few seconds.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        prefix: str = "apartments:",
+        lease_seconds: float = 5.0,
+    ):
+        """
+        Args:
+            backend: LocalBackend, SharedMemoryBackend or RedisBackend
+            prefix: Prefix of every key, to share a server with other apps
+            lease_seconds: How long a worker may take to compute a missing
+                entry before others stop waiting for it
+        """
+        self.backend = backend
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._background_tasks = set()
+        self._bypass_until = 0.0
+        self.counts = {
+            "hits": 0,
+            "misses": 0,
+            "negatives": 0,
+            "coalesced": 0,
+            "lease_waits": 0,
+            "lease_timeouts": 0,
+            "invalidations": 0,
+            "errors": 0,
+        }
+
+    async def _call(self, method: str, *args: Any, default: Any = None) -> Any:
+        if time.monotonic() < self._bypass_until:
+            return default
+        try:
+            return await getattr(self.backend, method)(*args)
+        except Exception as e:
+            if not _is_backend_error(e):
+                raise
+            self.counts["errors"] += 1
+            self._bypass_until = time.monotonic() + BACKEND_RETRY_SECONDS
+            logger.warning(
+                "Result cache %s failed, bypassing it for %.0f s: %s", method, BACKEND_RETRY_SECONDS, e
+            )
+            return default
+
+    async def generation(self, name: str) -> int:
+        """Current generation of a catalog, by name"""
+        cached = self._generations.get(name)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < GENERATION_CHECK_SECONDS:
+            return cached[0]
+        value = await self._call("get_counter", f"{self.prefix}gen:{name}", default=None)
+        if value is None:
+            # Backend down: keep the last known generation
+            return cached[0] if cached is not None else 0
+        self._generations[name] = (value, now)
+        return value
+
+    async def invalidate(self, name: str) -> None:
+        """Drop every entry cached for a catalog, by name, on every worker"""
+        value = await self._call("incr", f"{self.prefix}gen:{name}")
+        if value is not None:
+            self._generations[name] = (value, time.monotonic())
+        self.counts["invalidations"] += 1
+
+    def invalidate_soon(self, name: str) -> None:
+        """Invalidate a catalog from synchronous code (e.g. catalog listeners)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.invalidate(name))
+            return
+        task = loop.create_task(self.invalidate(name))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        version: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: float,
+        negative_ttl: float = 0,
+        is_negative: Optional[Callable[[Any], bool]] = None,
+        encode: Callable[[Any], bytes] = dumps,
+        decode: Callable[[bytes], Any] = orjson.loads,
+    ) -> Any:
+        """
+        Get a cached result, computing and storing it on a miss.
+
+        Args:
+            namespace: Kind of result, e.g. "find-apartment"
+            version: Version of the catalog the result is derived from
+            key: What identifies the result within the namespace and version
+            compute: Coroutine function computing the result
+            ttl: Seconds to keep the result
+            negative_ttl: Seconds to keep results flagged by is_negative (0
+                does not store them)
+            is_negative: Flags negative results, e.g. "no match"
+            encode: Result to bytes (default: JSON)
+            decode: Bytes to result (default: JSON)
+
+        Returns:
+            The result, decoded from the cache even when computed here
+        """
+        name = catalog_name(version)
+        generation = await self.generation(name)
+        digest = hashlib.sha1(f"{version}\0{key}".encode("utf-8")).hexdigest()
+        full_key = f"{self.prefix}{namespace}:{name}:{generation}:{digest}"
+
+        inflight = self._inflight.get(full_key)
+        if inflight is not None:
+            self.counts["coalesced"] += 1
+            try:
+                return decode(await asyncio.shield(inflight))
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The request computing it went away: take over
+                return await self.get_or_compute(
+                    namespace, version, key, compute, ttl, negative_ttl, is_negative, encode, decode
+                )
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            data = await self._get_or_compute(full_key, compute, ttl, negative_ttl, is_negative, encode)
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting: don't log it as unretrieved
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(data)
+        finally:
+            del self._inflight[full_key]
+        return decode(data)
+
+    async def _get_or_compute(self, full_key, compute, ttl, negative_ttl, is_negative, encode) -> bytes:
+        data = await self._call("get", full_key)
+        if data is not None:
+            self.counts["hits"] += 1
+            return data
+        self.counts["misses"] += 1
+
+        lease_key = full_key + ":lease"
+        deadline = time.monotonic() + self.lease_seconds
+        delay = LEASE_POLL_SECONDS[0]
+        # A failing backend grants the lease: compute rather than wait
+        while not await self._call("add", lease_key, secrets.token_bytes(8), self.lease_seconds, default=True):
+            if time.monotonic() > deadline:
+                self.counts["lease_timeouts"] += 1
+                break
+            self.counts["lease_waits"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LEASE_POLL_SECONDS[1])
+            data = await self._call("get", full_key)
+            if data is not None:
+                return data
+
+        try:
+            value = await compute()
+            data = encode(value)
+            if is_negative is not None and is_negative(value):
+                self.counts["negatives"] += 1
+                ttl = negative_ttl
+            if ttl > 0:
+                await self._call("set", full_key, data, ttl)
+            return data
+        finally:
+            await self._call("delete", lease_key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend, hit/miss counts and lease activity"""
+        lookups = self.counts["hits"] + self.counts["misses"]
+        return {
+            "backend": type(self.backend).__name__,
+            **self.counts,
+            "hit_rate": round(self.counts["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+def create_result_cache(backend: Optional[str] = None) -> ResultCache:
+    """
+    Build the result cache from the environment.
+
+    Args:
+        backend: "local" (in-process LRU), "shm" (shared memory, workers of
+            one host) or "redis" (Redis protocol, shared across hosts). If
+            not provided, uses RESULT_CACHE_BACKEND (default "local")
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    backend = backend or os.getenv("RESULT_CACHE_BACKEND", "local")
+    if backend == "local":
+        store = LocalBackend(int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024")))
+    elif backend == "shm":
+        default_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        store = SharedMemoryBackend(
+            os.getenv("RESULT_CACHE_SHM_PATH", os.path.join(default_dir, "apartments-result-cache")),
+            size_mb=float(os.getenv("RESULT_CACHE_SHM_MB", "64")),
+            slot_kb=float(os.getenv("RESULT_CACHE_SHM_SLOT_KB", "64")),
+        )
+    elif backend == "redis":
+        store = RedisBackend(
+            os.getenv("RESULT_CACHE_REDIS_URL", "redis://localhost:6379/0"),
+            pool_size=int(os.getenv("RESULT_CACHE_REDIS_POOL_SIZE", "8")),
+            timeout=float(os.getenv("RESULT_CACHE_REDIS_TIMEOUT_MS", "1000")) / 1000,
+        )
+    else:
+        raise ValueError(f"Unknown RESULT_CACHE_BACKEND value: {backend}")
+    return ResultCache(
+        store,
+        prefix=os.getenv("RESULT_CACHE_PREFIX", "apartments:"),
+        lease_seconds=float(os.getenv("RESULT_CACHE_LEASE_MS", "5000")) / 1000,
+    )
+
+
+# Shared result cache used by the API
+result_cache = create_result_cache()
+
+
+def _on_catalog_change(change: CatalogChange) -> None:
+    result_cache.invalidate_soon(catalog_name(change.version))
+
+
+catalog.add_listener(_on_catalog_change)
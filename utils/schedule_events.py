@@ -0,0 +1,97 @@
+import asyncio
+import json
+from typing import AsyncIterator, Optional, Set
+
+# Events buffered per client before it is considered too slow and dropped
+CLIENT_QUEUE_SIZE = 256
+
+# Seconds between keep-alive comments on idle streams
+KEEPALIVE_INTERVAL = 15.0
+
+
+class _Subscriber:
+    """A connected client and its pending events"""
+
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.dropped = False
+
+
+class ScheduleBroadcaster:
+    """
+    Fan-out of slot-level schedule changes to Server-Sent Events clients.
+
+    Each change is serialized once and pushed onto every subscriber's queue, so
+    the cost of an update is one small append per client, and idle clients cost
+    nothing. A client that falls more than CLIENT_QUEUE_SIZE events behind is
+    sent a 'resync' event and disconnected, so it can reload /schedule-data.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[_Subscriber] = set()
+        self._sequence = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish_slot_change(self, apartment_id: int, slot: str, busy: bool) -> None:
+        """
+        Broadcast a slot delta to every connected client.
+
+        Matches the BookingStore listener signature, so it can be registered
+        with booking_store.add_listener.
+        """
+        self._sequence += 1
+        payload = json.dumps(
+            {"apartment_id": apartment_id, "slot": slot, "busy": busy},
+            separators=(",", ":"),
+        )
+        message = f"id: {self._sequence}\nevent: slot\ndata: {payload}\n\n"
+
+        for subscriber in self._subscribers:
+            if subscriber.dropped:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+
+    async def stream(self, is_disconnected=None) -> AsyncIterator[str]:
+        """
+        Yield SSE messages for one client until it disconnects.
+
+        Args:
+            is_disconnected: Optional coroutine function reporting whether the
+                client has gone away, checked on every keep-alive tick
+        """
+        subscriber = _Subscriber()
+        self._subscribers.add(subscriber)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                message: Optional[str] = None
+                try:
+                    message = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=KEEPALIVE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+
+                if subscriber.dropped and subscriber.queue.empty():
+                    # Deliver what was queued before the overflow, then resync
+                    if message is not None:
+                        yield message
+                    yield "event: resync\ndata: {}\n\n"
+                    break
+
+                yield message if message is not None else ": keep-alive\n\n"
+        finally:
+            self._subscribers.discard(subscriber)
+
+
+# Shared broadcaster used by the API
+schedule_broadcaster = ScheduleBroadcaster()
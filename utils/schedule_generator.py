@@ -1,41 +1,115 @@
+import hashlib
+import json
 import random
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Any
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from fastapi import HTTPException
+
+from utils.result_cache import result_cache
+from utils.tenants import current_tenant
 
 # Seed for consistent mock data across requests
 SCHEDULE_SEED = 42
 
-def generate_all_schedules(apartments: List[dict]) -> Dict[int, List[str]]:
+# Share of slots that are marked as busy in the mock calendar
+BUSY_PROBABILITY = 0.4
+
+# Default schedule grid: 7 days, 09:00-18:00, 30-minute slots
+DEFAULT_DAYS = 7
+DEFAULT_OPEN_TIME = time(9, 0)
+DEFAULT_CLOSE_TIME = time(18, 0)
+DEFAULT_SLOT_MINUTES = 30
+
+SLOT_FORMAT = "%d-%m-%Y %H:%M"
+
+# How long an encoded schedule feed stays in the result cache. Feeds are
+# keyed by catalog version, bookings and date range, so this only bounds how
+# long unused feeds linger
+FEED_CACHE_TTL_SECONDS = 3600
+
+
+def _today() -> date:
+    return datetime.now().date()
+
+
+def iter_slot_times(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    open_time: time = DEFAULT_OPEN_TIME,
+    close_time: time = DEFAULT_CLOSE_TIME,
+    slot_minutes: int = DEFAULT_SLOT_MINUTES,
+) -> Iterator[datetime]:
+    """
+    Lazily yield the start time of every slot in a date range.
+
+    Args:
+        start_date: First day of the range (defaults to today)
+        end_date: Day after the last day of the range (defaults to start_date + 7 days)
+        open_time: Start of business hours (first slot starts here)
+        close_time: End of business hours (last slot ends at or before this)
+        slot_minutes: Length of each slot in minutes
+
+    Yields:
+        Slot start datetimes in chronological order
+    """
+    if slot_minutes <= 0:
+        raise ValueError("slot_minutes must be positive")
+
+    start_date = start_date or _today()
+    end_date = end_date or start_date + timedelta(days=DEFAULT_DAYS)
+    step = timedelta(minutes=slot_minutes)
+
+    current_day = start_date
+    while current_day < end_date:
+        slot_time = datetime.combine(current_day, open_time)
+        day_close = datetime.combine(current_day, close_time)
+        while slot_time + step <= day_close:
+            yield slot_time
+            slot_time += step
+        current_day += timedelta(days=1)
+
+
+def is_slot_busy(apartment_id: int, slot_time: datetime) -> bool:
+    """
+    Decide whether a slot is busy, either in the mock calendar or because an
+    appointment has been booked in it.
+
+    The mock decision only depends on the apartment and the slot start time, so
+    the same slot is reported consistently whatever range or grid it is queried with.
+    """
+    slot_key = slot_time.strftime(SLOT_FORMAT)
+    if current_tenant().booking_store.is_booked(apartment_id, slot_key):
+        return True
+    rng = random.Random(f"{SCHEDULE_SEED}:{apartment_id}:{slot_key}")
+    return rng.random() < BUSY_PROBABILITY
+
+
+def generate_all_schedules(
+    apartments: List[dict],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    open_time: time = DEFAULT_OPEN_TIME,
+    close_time: time = DEFAULT_CLOSE_TIME,
+    slot_minutes: int = DEFAULT_SLOT_MINUTES,
+) -> Dict[int, List[str]]:
     """
     Generate busy slots for all apartments.
     Returns a dict mapping apartment_id -> list of busy slot strings.
     """
-    random.seed(SCHEDULE_SEED)
-    
+    slot_times = list(
+        iter_slot_times(start_date, end_date, open_time, close_time, slot_minutes)
+    )
+
     schedules = {}
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
     for apt in apartments:
         apt_id = apt.get("id")
-        busy_slots = []
-        
-        # Generate slots for 7 days
-        for day_offset in range(7):
-            current_day = today + timedelta(days=day_offset)
-            
-            # Generate slots from 9:00 to 18:00 (30-min intervals)
-            # 9:00, 9:30, 10:00, ... 17:30 = 18 slots per day
-            for hour in range(9, 18):
-                for minute in [0, 30]:
-                    slot_time = current_day.replace(hour=hour, minute=minute)
-                    slot_str = slot_time.strftime("%d-%m-%Y %H:%M")
-                    
-                    # Randomly mark ~40% of slots as busy
-                    if random.random() < 0.4:
-                        busy_slots.append(slot_str)
-        
-        schedules[apt_id] = busy_slots
-    
+        schedules[apt_id] = [
+            slot_time.strftime(SLOT_FORMAT)
+            for slot_time in slot_times
+            if is_slot_busy(apt_id, slot_time)
+        ]
+
     return schedules
 
 
@@ -43,7 +117,7 @@ def calculate_slot_score(slot_time: datetime, apartment_id: int) -> int:
     """
     Calculate a booking score (0-100) for a time slot.
     0 = shouldn't book there, 100 = perfect slot to be booked.
-    
+
     Factors considered:
     - Time of day (10:00-14:00 are generally better)
     - Day of week (weekdays typically better than weekends)
@@ -51,7 +125,7 @@ def calculate_slot_score(slot_time: datetime, apartment_id: int) -> int:
     """
     # Base score starts at 50
     score = 50
-    
+
     # Time of day scoring (10:00-14:00 are prime times)
     hour = slot_time.hour
     if 10 <= hour < 12:
@@ -66,7 +140,7 @@ def calculate_slot_score(slot_time: datetime, apartment_id: int) -> int:
         score += 10  # Late afternoon okay
     else:
         score -= 10  # Outside normal hours
-    
+
     # Day of week scoring (weekdays generally better)
     weekday = slot_time.weekday()  # 0=Monday, 6=Sunday
     if weekday < 5:  # Monday-Friday
@@ -75,93 +149,234 @@ def calculate_slot_score(slot_time: datetime, apartment_id: int) -> int:
         score += 5
     else:  # Sunday
         score -= 5
-    
+
     # Add some consistent variation based on apartment ID
     # This makes each apartment have slightly different "preferences"
-    random.seed(apartment_id * 1000 + slot_time.day + slot_time.hour)
-    variation = random.randint(-10, 10)
+    rng = random.Random(apartment_id * 1000 + slot_time.day + slot_time.hour)
+    variation = rng.randint(-10, 10)
     score += variation
-    
+
     # Clamp score between 0 and 100
     score = max(0, min(100, score))
-    
+
     return score
 
 
+def iter_free_slots(
+    apartment_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    open_time: time = DEFAULT_OPEN_TIME,
+    close_time: time = DEFAULT_CLOSE_TIME,
+    slot_minutes: int = DEFAULT_SLOT_MINUTES,
+    min_score: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield free slots for an apartment with their booking scores.
+
+    Nothing is computed ahead of time: each slot is checked and scored only when
+    the caller pulls it, so stopping early (e.g. with ``itertools.islice``) avoids
+    generating the rest of a long horizon.
+
+    Args:
+        apartment_id: Apartment to generate slots for
+        start_date: First day of the range (defaults to today)
+        end_date: Day after the last day of the range (defaults to start_date + 7 days)
+        open_time: Start of business hours
+        close_time: End of business hours
+        slot_minutes: Length of each slot in minutes
+        min_score: If set, skip free slots scoring below this value
+
+    Yields:
+        Dicts with 'datetime' and 'score' keys, in chronological order
+    """
+    for slot_time in iter_slot_times(
+        start_date, end_date, open_time, close_time, slot_minutes
+    ):
+        if is_slot_busy(apartment_id, slot_time):
+            continue
+
+        score = calculate_slot_score(slot_time, apartment_id)
+        if min_score is not None and score < min_score:
+            continue
+
+        yield {
+            "datetime": slot_time.strftime(SLOT_FORMAT),
+            "score": score
+        }
+
+
+def find_free_slots(
+    apartment_id: int,
+    limit: Optional[int] = None,
+    **schedule_options: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Collect up to `limit` free slots, stopping as soon as enough are found.
+
+    Example: ``find_free_slots(1001, limit=5, min_score=70, end_date=...)``
+    returns the first five free slots scoring at least 70.
+
+    Args:
+        apartment_id: Apartment to generate slots for
+        limit: Maximum number of slots to return (None returns all of them)
+        **schedule_options: Range, business hours, slot length and min_score,
+            as accepted by iter_free_slots
+
+    Returns:
+        List of dicts with 'datetime' and 'score' keys
+    """
+    return list(islice(iter_free_slots(apartment_id, **schedule_options), limit))
+
+
 def get_available_slots(apartment_id: int, apartments: List[dict]) -> List[Dict[str, Any]]:
     """
     Get available (free) slots for a specific apartment with scores.
     Returns list of dicts with 'datetime' and 'score' keys.
     """
-    all_schedules = generate_all_schedules(apartments)
-    busy_slots = set(all_schedules.get(apartment_id, []))
-    
-    available_slots = []
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Generate all possible slots for 7 days
-    for day_offset in range(7):
-        current_day = today + timedelta(days=day_offset)
-        
-        for hour in range(9, 18):
-            for minute in [0, 30]:
-                slot_time = current_day.replace(hour=hour, minute=minute)
-                slot_str = slot_time.strftime("%d-%m-%Y %H:%M")
-                
-                if slot_str not in busy_slots:
-                    score = calculate_slot_score(slot_time, apartment_id)
-                    available_slots.append({
-                        "datetime": slot_str,
-                        "score": score
-                    })
-    
-    return available_slots
-
-
-def get_all_busy_schedules_for_html(apartments: List[dict]) -> Dict[int, dict]:
-    """
-    Get busy schedules formatted for HTML display.
-    Returns dict with apartment info and busy slots organized by date.
-    """
-    all_schedules = generate_all_schedules(apartments)
-    
-    result = {}
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    for apt in apartments:
-        apt_id = apt.get("id")
-        apt_name = apt.get("name")
-        busy_slots = set(all_schedules.get(apt_id, []))
-        
-        # Organize by date
-        days_data = {}
-        for day_offset in range(7):
-            current_day = today + timedelta(days=day_offset)
-            day_key = current_day.strftime("%d-%m-%Y")
-            day_label = current_day.strftime("%a %d")
-            
-            slots = []
-            for hour in range(9, 18):
-                for minute in [0, 30]:
-                    slot_time = current_day.replace(hour=hour, minute=minute)
-                    slot_str = slot_time.strftime("%d-%m-%Y %H:%M")
-                    time_label = slot_time.strftime("%H:%M")
-                    
-                    slots.append({
-                        "time": time_label,
-                        "busy": slot_str in busy_slots
-                    })
-            
-            days_data[day_key] = {
-                "label": day_label,
-                "slots": slots
+    return list(iter_free_slots(apartment_id))
+
+
+def encode_busy_bitmask(apartment_id: int, slot_times: List[datetime]) -> int:
+    """
+    Encode the busy state of a day's slots as a bitmask.
+
+    Bit i is set when slot_times[i] is busy, so a standard day (18 slots)
+    fits comfortably in a JSON number.
+    """
+    mask = 0
+    for index, slot_time in enumerate(slot_times):
+        if is_slot_busy(apartment_id, slot_time):
+            mask |= 1 << index
+    return mask
+
+
+def get_schedule_feed(
+    apartments: List[dict],
+    start_date: Optional[date] = None,
+    days: int = DEFAULT_DAYS,
+) -> Dict[str, Any]:
+    """
+    Build the compact schedule feed served to the dashboard.
+
+    Slot times are listed once for the whole feed and each apartment carries
+    one busy bitmask per day, instead of one object per slot.
+
+    Args:
+        apartments: List of apartment dictionaries
+        start_date: First day of the feed (defaults to today)
+        days: Number of days to include
+
+    Returns:
+        Dict with 'days', 'slot_times' and 'apartments' keys
+    """
+    start_date = start_date or _today()
+    day_dates = [start_date + timedelta(days=offset) for offset in range(days)]
+    day_slots = [
+        list(iter_slot_times(day, day + timedelta(days=1)))
+        for day in day_dates
+    ]
+
+    return {
+        "start_date": start_date.strftime("%d-%m-%Y"),
+        "days": [
+            {"date": day.strftime("%d-%m-%Y"), "label": day.strftime("%a %d")}
+            for day in day_dates
+        ],
+        "slot_times": [slot_time.strftime("%H:%M") for slot_time in day_slots[0]]
+        if day_slots else [],
+        "apartments": [
+            {
+                "id": apt.get("id"),
+                "name": apt.get("name"),
+                "city": apt.get("city"),
+                "busy": [
+                    encode_busy_bitmask(apt.get("id"), slot_times)
+                    for slot_times in day_slots
+                ],
             }
-        
-        result[apt_id] = {
-            "name": apt_name,
-            "city": apt.get("city"),
-            "days": days_data
-        }
-    
-    return result
+            for apt in apartments
+        ],
+    }
+
+
+async def get_encoded_schedule_feed(
+    apartments: List[dict],
+    catalog_version: str,
+    start_date: Optional[date] = None,
+    days: int = DEFAULT_DAYS,
+) -> Tuple[bytes, str]:
+    """
+    Get the schedule feed serialized to JSON, along with its ETag.
+
+    The encoded feed is kept in the result cache per catalog version,
+    bookings and date range, so repeated dashboard loads neither rebuild nor
+    re-serialize it, on any worker sharing the cache.
+
+    Returns:
+        Tuple of (JSON body, quoted ETag value)
+    """
+    start_date = start_date or _today()
+    key = f"{current_tenant().booking_store.digest}:{start_date.isoformat()}:{days}"
+
+    async def build() -> Tuple[bytes, str]:
+        feed = get_schedule_feed(apartments, start_date, days)
+        body = json.dumps(feed, separators=(",", ":")).encode("utf-8")
+        return body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+    return await result_cache.get_or_compute(
+        "schedule-feed",
+        catalog_version,
+        key,
+        build,
+        ttl=FEED_CACHE_TTL_SECONDS,
+        encode=_encode_feed,
+        decode=_decode_feed,
+    )
+
+
+def _encode_feed(feed: Tuple[bytes, str]) -> bytes:
+    body, etag = feed
+    return etag.encode("ascii") + b"\n" + body
+
+
+def _decode_feed(data: bytes) -> Tuple[bytes, str]:
+    etag, _, body = data.partition(b"\n")
+    return body, etag.decode("ascii")
+
+
+def book_appointment_slot(appointment_id: str, apartment_id: int, slot: str) -> None:
+    """
+    Book a free slot of the standard grid for an appointment.
+
+    Args:
+        appointment_id: ID of the appointment taking the slot
+        apartment_id: Apartment being visited
+        slot: Slot datetime in format DD-MM-YYYY HH:MM
+
+    Raises:
+        HTTPException: 400 if the slot is not on the schedule grid,
+            409 if it is busy or the appointment already holds a slot
+    """
+    try:
+        slot_time = datetime.strptime(slot, SLOT_FORMAT)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="datetime must be in format DD-MM-YYYY HH:MM"
+        )
+
+    day = slot_time.date()
+    if slot_time not in iter_slot_times(day, day + timedelta(days=1)):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{slot} is not a bookable slot"
+        )
 
+    if is_slot_busy(apartment_id, slot_time) or not current_tenant().booking_store.book(
+        appointment_id, apartment_id, slot_time.strftime(SLOT_FORMAT)
+    ):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Slot {slot} is not available for apartment {apartment_id}"
+        )
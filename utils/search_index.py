@@ -0,0 +1,182 @@
+import heapq
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from utils.apartment_loader import get_catalog_version
+from utils.catalog_sqlite import SQLiteApartments
+from utils.catalog_store import CatalogChange, derived
+from utils.text import apartment_text, tokenize
+
+
+class BM25Index:
+    """
+    Inverted index over apartment text with BM25 ranking.
+
+    Documents can be added and removed one at a time; collection statistics
+    (document count and average length) are maintained incrementally, so
+    updating a listing never requires rebuilding the whole index.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_texts: Dict[int, str] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add_document(self, doc_id: int, text: str) -> None:
+        """Index a document, replacing any previous version of it"""
+        if doc_id in self.doc_lengths:
+            self.remove_document(doc_id)
+
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self.doc_texts[doc_id] = text
+        self._total_length += length
+
+    def remove_document(self, doc_id: int) -> None:
+        """Remove a document from the index (no-op if it isn't indexed)"""
+        text = self.doc_texts.pop(doc_id, None)
+        if text is None:
+            return
+
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+        self._total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        Rank documents against a query.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+
+        Returns:
+            List of (doc_id, score) pairs, best first
+        """
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+
+        average_length = self._total_length / doc_count
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+class ApartmentSearchIndex:
+    """
+    BM25 search index over a catalog, kept in sync across catalog versions.
+
+    When the catalog version changes, only the listings whose searchable text
+    changed are re-indexed, and removed listings are dropped.
+    """
+
+    def __init__(self):
+        self.index = BM25Index()
+        self.apartments: Dict[int, Dict] = {}
+        self.version: Optional[str] = None
+
+    def sync(self, apartments: List[Dict], version: str) -> None:
+        """Bring the index up to date with a catalog version"""
+        if version == self.version:
+            return
+
+        current = {apt.get("id"): apt for apt in apartments}
+        for doc_id in list(self.apartments):
+            if doc_id not in current:
+                self.index.remove_document(doc_id)
+
+        for doc_id, apt in current.items():
+            text = apartment_text(apt)
+            if self.index.doc_texts.get(doc_id) != text:
+                self.index.add_document(doc_id, text)
+
+        self.apartments = current
+        self.version = version
+
+    def apply_change(self, change: CatalogChange) -> None:
+        """Apply one catalog change, if the index is at the version it was made against"""
+        if self.version != change.previous_version:
+            return
+
+        if change.apartment is None:
+            doc_id = change.previous.get("id")
+            self.index.remove_document(doc_id)
+            self.apartments.pop(doc_id, None)
+        else:
+            doc_id = change.apartment.get("id")
+            text = apartment_text(change.apartment)
+            if self.index.doc_texts.get(doc_id) != text:
+                self.index.add_document(doc_id, text)
+            self.apartments[doc_id] = change.apartment
+        self.version = change.version
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        Search apartments by free text.
+
+        Returns:
+            Matching apartments with their BM25 score, best first
+        """
+        results = []
+        for doc_id, score in self.index.search(query, limit):
+            apt = self.apartments[doc_id]
+            results.append({
+                "id": doc_id,
+                "name": apt.get("name"),
+                "city": apt.get("city"),
+                "neighbourhood": apt.get("neighbourhood"),
+                "price": apt.get("price"),
+                "available": apt.get("status") == "open",
+                "score": round(score, 3),
+            })
+        return results
+
+
+def _sync_index(
+    apartments: List[Dict], stale: Optional[ApartmentSearchIndex]
+) -> ApartmentSearchIndex:
+    # Sync the catalog's index from the version it was at instead of rebuilding it
+    index = stale or ApartmentSearchIndex()
+    index.sync(apartments, get_catalog_version(apartments))
+    return index
+
+
+_get_index = derived(_sync_index, reuse_stale=True)
+
+
+def get_search_index(apartments: List[Dict]) -> ApartmentSearchIndex:
+    """
+    Get the search index of a catalog, incrementally updated to the given version.
+
+    A SQLite-backed catalog searches its own FTS5 table instead.
+    """
+    if isinstance(apartments, SQLiteApartments):
+        return apartments.catalog
+    return _get_index(apartments)
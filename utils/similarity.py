@@ -0,0 +1,117 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.catalog_store import derived
+
+# Numeric features and their weight in the distance
+NUMERIC_FEATURES = (
+    ("price", 1.5),
+    ("bedrooms", 1.0),
+    ("bathrooms", 0.5),
+    ("sqft", 1.0),
+    ("minimum_salary", 0.5),
+    ("minimum_credit_score", 0.5),
+    ("allow_pets", 0.5),
+)
+
+# Weight of the one-hot location features
+CITY_WEIGHT = 1.0
+NEIGHBOURHOOD_WEIGHT = 0.75
+
+
+def _feature_value(apt: Dict, name: str) -> Optional[float]:
+    qualification = apt.get("qualification") or {}
+    value = apt.get(name, qualification.get(name))
+    return None if value is None else float(value)
+
+
+class SimilarityIndex:
+    """
+    Normalized feature matrix of a catalog for nearest-neighbour queries.
+
+    Each listing is encoded as z-scored numeric features (price, rooms, size,
+    qualification thresholds) followed by one-hot city and neighbourhood
+    columns, all scaled by their weight. A query computes the distance from
+    one row to every row in a single vectorized operation.
+    """
+
+    def __init__(self, apartments: List[Dict]):
+        """
+        Args:
+            apartments: List of apartment dictionaries
+        """
+        self.apartments = apartments
+        self.row_by_id = {apt.get("id"): row for row, apt in enumerate(apartments)}
+        self.is_open = np.array([apt.get("status") == "open" for apt in apartments], dtype=bool)
+
+        columns = []
+        for name, weight in NUMERIC_FEATURES:
+            values = np.array(
+                [_feature_value(apt, name) for apt in apartments], dtype=np.float64
+            )
+            # Missing values sit at the mean, so they neither attract nor repel
+            mean = np.nanmean(values) if np.isfinite(values).any() else 0.0
+            values = np.where(np.isnan(values), mean, values)
+            std = values.std() or 1.0
+            columns.append((values - mean) / std * weight)
+
+        for field, weight in (("city", CITY_WEIGHT), ("neighbourhood", NEIGHBOURHOOD_WEIGHT)):
+            labels = [apt.get(field) for apt in apartments]
+            for label in sorted({label for label in labels if label}):
+                columns.append(np.array([l == label for l in labels], dtype=np.float64) * weight)
+
+        self.features = (
+            np.column_stack(columns).astype(np.float32)
+            if apartments else np.zeros((0, 0), dtype=np.float32)
+        )
+
+    def nearest(self, apartment_id: int, limit: int = 5, open_only: bool = True) -> Optional[List[Dict]]:
+        """
+        Find the apartments most similar to a given one.
+
+        Args:
+            apartment_id: Reference apartment
+            limit: Maximum number of neighbours
+            open_only: Only return listings whose status is "open"
+
+        Returns:
+            Neighbours with their distance, closest first, or None if the
+            apartment is not in the catalog
+        """
+        row = self.row_by_id.get(apartment_id)
+        if row is None:
+            return None
+
+        diff = self.features - self.features[row]
+        distances = np.einsum("ij,ij->i", diff, diff)
+
+        candidates = self.is_open.copy() if open_only else np.ones(len(distances), dtype=bool)
+        candidates[row] = False
+        candidate_rows = np.flatnonzero(candidates)
+        if not len(candidate_rows):
+            return []
+
+        # Partial sort: only the top `limit` rows are ordered
+        limit = min(limit, len(candidate_rows))
+        top = candidate_rows[np.argpartition(distances[candidate_rows], limit - 1)[:limit]]
+        top = top[np.argsort(distances[top])]
+
+        results = []
+        for index in top.tolist():
+            apt = self.apartments[index]
+            results.append({
+                "id": apt.get("id"),
+                "name": apt.get("name"),
+                "city": apt.get("city"),
+                "neighbourhood": apt.get("neighbourhood"),
+                "price": apt.get("price"),
+                "bedrooms": apt.get("bedrooms"),
+                "available": apt.get("status") == "open",
+                "distance": round(float(np.sqrt(distances[index])), 3),
+            })
+        return results
+
+
+# Get the similarity index for a catalog (rebuilt for every version)
+get_similarity_index = derived(SimilarityIndex, follow_changes=False)
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import re
+import tracemalloc
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from utils.booking_store import BookingStore, booking_store
+from utils.catalog_store import Catalog, catalog, drop_catalog_caches
+
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class Tenant:
+    """Catalog and bookings of one agency"""
+
+    def __init__(self, tenant_id: Optional[str], catalog: Catalog, booking_store: BookingStore):
+        """
+        Args:
+            tenant_id: Tenant ID, None for the default catalog
+            catalog: The tenant's catalog
+            booking_store: The tenant's bookings
+        """
+        self.id = tenant_id
+        self.catalog = catalog
+        self.booking_store = booking_store
+        self.estimated_bytes = 0
+
+    @property
+    def is_default(self) -> bool:
+        return self.id is None
+
+    def load(self) -> int:
+        """
+        Load the catalog, measuring the memory it keeps allocated the way
+        scripts/bench_memory.py does.
+
+        Allocations made by other threads while it loads are counted too, so
+        the measure can only err on the high side.
+
+        Returns:
+            Bytes held by the loaded catalog
+        """
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            self.catalog.refresh()
+            after, _ = tracemalloc.get_traced_memory()
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        self.estimated_bytes = max(0, after - before)
+        return self.estimated_bytes
+
+
+class TenantRegistry:
+    """
+    Tenant catalogs, loaded lazily and evicted least-recently-used first.
+
+    Tenant "acme" is served from tenants/acme/apartments.json, with its own
+    change log next to it. A tenant is loaded on its first request; when the
+    measured memory of the resident catalogs exceeds the budget, the least
+    recently used ones are evicted along with every index and prompt cache
+    derived from their catalogs. Bookings are small and kept across
+    evictions. Requests without a tenant use the default catalog, which is
+    never evicted. Catalogs are loaded in a worker thread, one at a time, so
+    a cold tenant does not hold up other requests.
+    """
+
+    def __init__(self, tenants_dir: Optional[str] = None, memory_budget_mb: Optional[float] = None):
+        """
+        Args:
+            tenants_dir: Directory with one folder per tenant. If not provided,
+                uses TENANTS_DIR (default "tenants")
+            memory_budget_mb: Memory the resident tenant catalogs may use. If
+                not provided, uses TENANT_MEMORY_BUDGET_MB (default 512)
+        """
+        self.tenants_dir = Path(tenants_dir or os.getenv("TENANTS_DIR", "tenants"))
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.getenv("TENANT_MEMORY_BUDGET_MB", "512"))
+        self.memory_budget = int(memory_budget_mb * 2**20)
+
+        self.default = Tenant(None, catalog, booking_store)
+        self._resident: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._bookings: Dict[str, BookingStore] = {}
+        self._load_lock = asyncio.Lock()
+
+        self.loads = 0
+        self.evictions = 0
+
+    async def get(self, tenant_id: str) -> Tenant:
+        """
+        Get a tenant, loading its catalog if it is not resident.
+
+        Raises:
+            HTTPException: 400 if the tenant ID is invalid, 404 if the tenant
+                has no catalog
+        """
+        tenant = self._resident.get(tenant_id)
+        if tenant is not None:
+            self._resident.move_to_end(tenant_id)
+            return tenant
+
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise HTTPException(status_code=400, detail=f"Invalid tenant ID: {tenant_id}")
+        tenant_dir = self.tenants_dir / tenant_id
+        if not (tenant_dir / "apartments.json").exists():
+            raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant_id}")
+
+        async with self._load_lock:
+            # Another request may have loaded it while this one waited
+            tenant = self._resident.get(tenant_id)
+            if tenant is None:
+                tenant = await asyncio.to_thread(self._load, tenant_id, tenant_dir)
+                self._resident[tenant_id] = tenant
+                self.loads += 1
+                self._evict()
+        return tenant
+
+    def _load(self, tenant_id: str, tenant_dir: Path) -> Tenant:
+        tenant = Tenant(
+            tenant_id,
+            Catalog(
+                tenant_dir / "apartments.json",
+                changelog_path=tenant_dir / "catalog_changes.jsonl",
+                name=tenant_id,
+                # Index listeners registered on the default catalog follow every tenant
+                listeners=catalog.listeners,
+            ),
+            self._bookings.setdefault(tenant_id, BookingStore()),
+        )
+        tenant.load()
+        return tenant
+
+    def _evict(self) -> None:
+        # The most recent tenant (the one just loaded) always stays resident
+        while len(self._resident) > 1 and self.resident_bytes() > self.memory_budget:
+            tenant_id, _ = self._resident.popitem(last=False)
+            drop_catalog_caches(tenant_id)
+            self.evictions += 1
+            print(f"Evicted tenant {tenant_id}")
+
+    def resident_bytes(self) -> int:
+        """Estimated memory of the resident tenants"""
+        return sum(tenant.estimated_bytes for tenant in self._resident.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident tenants, least recently used first, and load/eviction counts"""
+        return {
+            "memory_budget_bytes": self.memory_budget,
+            "resident_bytes": self.resident_bytes(),
+            "resident": [
+                {
+                    "tenant_id": tenant.id,
+                    "listings": len(tenant.catalog.apartments),
+                    "estimated_bytes": tenant.estimated_bytes,
+                }
+                for tenant in self._resident.values()
+            ],
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+# Shared registry used by the API
+tenants = TenantRegistry()
+
+_current_tenant: ContextVar[Tenant] = ContextVar("current_tenant", default=tenants.default)
+
+
+def current_tenant() -> Tenant:
+    """Tenant of the request being served (the default one outside tenant requests)"""
+    return _current_tenant.get()
+
+
+class TenantMiddleware:
+    """
+    Select the tenant of /tool/* requests.
+
+    The tenant comes from a /t/{tenant_id} path prefix (e.g.
+    /t/acme/tool/get-schedule) or the X-Tenant-ID header; requests with
+    neither, and other routes, use the default catalog.
+    """
+
+    def __init__(self, app, registry: TenantRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant_id = None
+        path = scope["path"]
+        if path.startswith("/t/"):
+            prefix_id, _, rest = path[3:].partition("/")
+            if rest.startswith("tool/"):
+                tenant_id = prefix_id
+                path = "/" + rest
+                scope = {**scope, "path": path, "raw_path": path.encode()}
+        elif path.startswith("/tool/"):
+            header = dict(scope["headers"]).get(b"x-tenant-id")
+            if header:
+                tenant_id = header.decode("latin-1")
+
+        if tenant_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            tenant = await self.registry.get(tenant_id)
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code)
+            await response(scope, receive, send)
+            return
+
+        token = _current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_tenant.reset(token)
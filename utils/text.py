@@ -0,0 +1,64 @@
+import re
+import unicodedata
+from typing import Dict, List
+
+# Common Spanish/Catalan words that carry no meaning for search
+STOPWORDS = frozenset(
+    """
+    a al amb als con de del dels des el els en es i la las les lo los o per
+    para por que un una uno unos unas y near in the of
+    """.split()
+)
+
+# Fields indexed per apartment, with how many times their terms are counted
+FIELD_WEIGHTS = (
+    ("name", 2),
+    ("city", 2),
+    ("neighbourhood", 2),
+    ("street", 1),
+    ("description", 1),
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip accents: 'Indústria' -> 'industria', 'Gràcia' -> 'gracia'"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def stem(token: str) -> str:
+    """
+    Light Spanish/Catalan stemmer.
+
+    Only strips plural and gender endings ('pisos' -> 'pis', 'moderna' and
+    'moderno' -> 'modern'), which is enough to match listing text without
+    conflating unrelated words.
+    """
+    if len(token) > 4 and token.endswith("es"):
+        token = token[:-2]
+    elif len(token) > 3 and token.endswith("s"):
+        token = token[:-1]
+    if len(token) > 3 and token[-1] in "aoe":
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized, stemmed search terms"""
+    return [
+        stem(token)
+        for token in _TOKEN_RE.findall(fold_accents(text))
+        if token not in STOPWORDS
+    ]
+
+
+def apartment_text(apt: Dict) -> str:
+    """Build the searchable text of an apartment, repeating weighted fields"""
+    parts = []
+    for field, weight in FIELD_WEIGHTS:
+        value = apt.get(field)
+        if value:
+            parts.extend([str(value)] * weight)
+    return " ".join(parts)
@@ -0,0 +1,314 @@
+import json
+import math
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from utils.geo_index import area_key, haversine_km, resolve_coordinates
+from utils.schedule_generator import (
+    DEFAULT_CLOSE_TIME,
+    DEFAULT_OPEN_TIME,
+    DEFAULT_SLOT_MINUTES,
+    SLOT_FORMAT,
+    calculate_slot_score,
+    is_slot_busy,
+    iter_slot_times,
+)
+
+# Tours with up to this many apartments are solved exactly
+EXACT_MAX_STOPS = 8
+
+# Relocation passes run by the heuristic solver
+IMPROVEMENT_PASSES = 3
+
+# Travel estimate for areas missing from travel_times.json
+FALLBACK_BASE_MINUTES = 10
+FALLBACK_MINUTES_PER_KM = 2.5
+UNKNOWN_TRAVEL_MINUTES = 60
+
+
+@lru_cache(maxsize=1)
+def load_travel_matrix() -> Dict:
+    """
+    Load the bundled area-to-area travel times
+
+    Raises:
+        HTTPException: If file not found or invalid JSON
+    """
+    travel_file = Path(__file__).parent.parent / "travel_times.json"
+    try:
+        with open(travel_file, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="travel_times.json file not found")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=500, detail=f"Invalid JSON in travel_times.json: {str(e)}")
+
+    data["index"] = {area: i for i, area in enumerate(data["areas"])}
+    return data
+
+
+def travel_minutes(origin: Dict, destination: Dict) -> int:
+    """
+    Travel time in minutes between two apartments.
+
+    Uses the area-to-area matrix in travel_times.json, and otherwise
+    estimates it from the distance between the apartments' coordinates.
+    """
+    matrix = load_travel_matrix()
+    origin_area, destination_area = area_key(origin), area_key(destination)
+    if origin_area == destination_area:
+        return matrix["same_area_minutes"]
+
+    i, j = matrix["index"].get(origin_area), matrix["index"].get(destination_area)
+    if i is not None and j is not None:
+        return matrix["minutes"][i][j]
+
+    a, b = resolve_coordinates(origin), resolve_coordinates(destination)
+    if a is None or b is None:
+        return UNKNOWN_TRAVEL_MINUTES
+    return round(FALLBACK_BASE_MINUTES + haversine_km(a, b) * FALLBACK_MINUTES_PER_KM)
+
+
+class TourProblem:
+    """
+    Viewing tour over a set of apartments on one day.
+
+    Each viewing takes one slot and must start on one of the apartment's free
+    slots, after the previous viewing has ended and the agent has travelled
+    there. The cost of a tour is the time between the first and last viewing
+    not spent viewing, i.e. total travel plus waiting.
+    """
+
+    def __init__(self, apartments: List[Dict], day: date, slot_minutes: int = DEFAULT_SLOT_MINUTES):
+        """
+        Args:
+            apartments: Apartments to visit
+            day: Day of the tour
+            slot_minutes: Length of a viewing
+        """
+        self.apartments = apartments
+        self.day = day
+        self.slot_minutes = slot_minutes
+        self.size = len(apartments)
+
+        # Free slot starts per apartment, in minutes since midnight
+        self.free_starts: List[List[int]] = []
+        self.scores: List[Dict[int, int]] = []
+        for apt in apartments:
+            starts, scores = [], {}
+            for slot_time in iter_slot_times(
+                day, day + timedelta(days=1), DEFAULT_OPEN_TIME, DEFAULT_CLOSE_TIME, slot_minutes
+            ):
+                if not is_slot_busy(apt.get("id"), slot_time):
+                    minute = slot_time.hour * 60 + slot_time.minute
+                    starts.append(minute)
+                    scores[minute] = calculate_slot_score(slot_time, apt.get("id"))
+            self.free_starts.append(starts)
+            self.scores.append(scores)
+
+        self.travel = [
+            [0 if i == j else travel_minutes(a, b) for j, b in enumerate(apartments)]
+            for i, a in enumerate(apartments)
+        ]
+        # Cheapest way into each stop, used as a lower bound
+        self.min_inbound = [
+            min((self.travel[i][j] for i in range(self.size) if i != j), default=0)
+            for j in range(self.size)
+        ]
+
+    def next_start(self, stop: int, earliest: int) -> Optional[int]:
+        """Earliest free slot start of a stop at or after a given minute"""
+        starts = self.free_starts[stop]
+        position = bisect_left(starts, earliest)
+        return starts[position] if position < len(starts) else None
+
+    def simulate(self, order: Sequence[int], first_start: int) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Schedule stops in a fixed order, each as early as possible.
+
+        Starting as early as possible is optimal for a fixed order and first
+        viewing, since the cost only depends on when the last viewing ends.
+        Stops that cannot be fitted in are skipped.
+
+        Returns:
+            List of (stop, start minute) pairs and the tour cost
+        """
+        visits = [(order[0], first_start)]
+        end = first_start + self.slot_minutes
+        for stop in order[1:]:
+            start = self.next_start(stop, end + self.travel[visits[-1][0]][stop])
+            if start is not None:
+                visits.append((stop, start))
+                end = start + self.slot_minutes
+        return visits, end - first_start - len(visits) * self.slot_minutes
+
+    def best_schedule(self, order: Sequence[int]) -> Tuple[List[Tuple[int, int]], int]:
+        """Schedule a fixed order, trying every free slot for the first stop"""
+        best = ([], math.inf)
+        for first_start in self.free_starts[order[0]]:
+            visits, cost = self.simulate(order, first_start)
+            if (-len(visits), cost) < (-len(best[0]), best[1]):
+                best = (visits, cost)
+        return best
+
+
+def _solve_heuristic(problem: TourProblem) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Greedy construction followed by relocation moves.
+
+    From every possible first viewing, repeatedly go to the stop that can be
+    viewed soonest. The best tour is then improved by moving single stops to
+    other positions while that lowers its cost.
+    """
+    best: Tuple[List[Tuple[int, int]], float] = ([], math.inf)
+    for first in range(problem.size):
+        for first_start in problem.free_starts[first]:
+            visits = [(first, first_start)]
+            end = first_start + problem.slot_minutes
+            remaining = set(range(problem.size)) - {first}
+            while remaining:
+                last = visits[-1][0]
+                options = [
+                    (start, problem.travel[last][stop], stop)
+                    for stop in remaining
+                    for start in [problem.next_start(stop, end + problem.travel[last][stop])]
+                    if start is not None
+                ]
+                if not options:
+                    break
+                start, _, stop = min(options)
+                visits.append((stop, start))
+                end = start + problem.slot_minutes
+                remaining.discard(stop)
+            cost = end - first_start - len(visits) * problem.slot_minutes
+            if (-len(visits), cost) < (-len(best[0]), best[1]):
+                best = (visits, cost)
+
+    if not best[0]:
+        return best
+
+    order = [stop for stop, _ in best[0]]
+    order += [stop for stop in range(problem.size) if stop not in order]
+    for _ in range(IMPROVEMENT_PASSES):
+        improved = False
+        for i in range(len(order)):
+            for j in range(len(order)):
+                if i == j:
+                    continue
+                candidate = order[:i] + order[i + 1:]
+                candidate.insert(j, order[i])
+                visits, cost = problem.best_schedule(candidate)
+                if (-len(visits), cost) < (-len(best[0]), best[1]):
+                    best, order, improved = (visits, cost), candidate, True
+        if not improved:
+            break
+    return best
+
+
+def _solve_exact(problem: TourProblem) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Dynamic programming over (visited set, last stop) with Pareto labels.
+
+    A label records when the tour started and when its last viewing ends;
+    labels that start no later and end no earlier than another one are
+    dominated and dropped. Labels that cannot beat the heuristic's complete
+    tour, even with the cheapest remaining travel, are pruned.
+    """
+    size = problem.size
+    slot = problem.slot_minutes
+    heuristic = _solve_heuristic(problem)
+    upper_bound = heuristic[1] if len(heuristic[0]) == size else math.inf
+
+    # (mask, last) -> list of labels (start, end, parent label, stop, stop start)
+    labels: Dict[Tuple[int, int], list] = {}
+    for stop in range(size):
+        labels[(1 << stop, stop)] = [(start, start + slot, None, stop, start) for start in problem.free_starts[stop]]
+
+    best_label, best_key = None, (0, math.inf)
+    for mask in sorted(range(1, 1 << size), key=lambda m: bin(m).count("1")):
+        visited = bin(mask).count("1")
+        remaining = [stop for stop in range(size) if not mask & (1 << stop)]
+        bound = sum(problem.min_inbound[stop] for stop in remaining)
+        for last in range(size):
+            for label in labels.pop((mask, last), ()):
+                start, end = label[0], label[1]
+                cost = end - start - visited * slot
+                if (-visited, cost) < (-best_key[0], best_key[1]):
+                    best_label, best_key = label, (visited, cost)
+                if cost + bound >= upper_bound:
+                    continue
+                for stop in remaining:
+                    stop_start = problem.next_start(stop, end + problem.travel[last][stop])
+                    if stop_start is None:
+                        continue
+                    new_label = (start, stop_start + slot, label, stop, stop_start)
+                    front = labels.setdefault((mask | (1 << stop), stop), [])
+                    if any(other[0] >= start and other[1] <= new_label[1] for other in front):
+                        continue
+                    front[:] = [
+                        other for other in front
+                        if not (start >= other[0] and new_label[1] <= other[1])
+                    ]
+                    front.append(new_label)
+
+    if best_label is None or (-best_key[0], best_key[1]) >= (-len(heuristic[0]), heuristic[1]):
+        return heuristic
+
+    visits = []
+    while best_label is not None:
+        visits.append((best_label[3], best_label[4]))
+        best_label = best_label[2]
+    return visits[::-1], best_key[1]
+
+
+def plan_tour(apartments: List[Dict], day: date) -> Dict:
+    """
+    Plan a day of viewings across several apartments.
+
+    Picks one free slot per apartment and an order that minimizes travel and
+    waiting between viewings. Sets of up to EXACT_MAX_STOPS apartments are
+    solved exactly; larger ones with a greedy heuristic plus local search.
+    Apartments that cannot be fitted into the day are reported as unscheduled.
+
+    Args:
+        apartments: Apartments to visit
+        day: Day of the tour
+
+    Returns:
+        Dict with the ordered stops, unscheduled apartment IDs and tour totals
+    """
+    problem = TourProblem(apartments, day)
+    exact = problem.size <= EXACT_MAX_STOPS
+    visits, cost = _solve_exact(problem) if exact else _solve_heuristic(problem)
+
+    stops = []
+    total_travel = 0
+    for position, (stop, start) in enumerate(visits):
+        apt = apartments[stop]
+        travel = problem.travel[visits[position - 1][0]][stop] if position else 0
+        total_travel += travel
+        slot_time = datetime.combine(day, time(start // 60, start % 60))
+        stops.append({
+            "apartment_id": apt.get("id"),
+            "name": apt.get("name"),
+            "city": apt.get("city"),
+            "neighbourhood": apt.get("neighbourhood"),
+            "datetime": slot_time.strftime(SLOT_FORMAT),
+            "score": problem.scores[stop][start],
+            "travel_minutes": travel,
+        })
+
+    scheduled = {stop for stop, _ in visits}
+    return {
+        "date": day.strftime("%d-%m-%Y"),
+        "stops": stops,
+        "unscheduled": [apt.get("id") for i, apt in enumerate(apartments) if i not in scheduled],
+        "total_travel_minutes": total_travel,
+        "total_waiting_minutes": cost - total_travel if visits else 0,
+        "solver": "exact" if exact else "heuristic",
+    }
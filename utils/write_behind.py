@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Most recent flush latencies kept for the metrics percentiles
+LATENCY_SAMPLES = 1024
+
+# Record kinds and the table each one is upserted into
+TABLES = {
+    "user": (
+        "CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, created_at REAL)",
+        "INSERT OR REPLACE INTO users (user_id, created_at) VALUES (:user_id, :ts)",
+    ),
+    "appointment": (
+        "CREATE TABLE IF NOT EXISTS appointments ("
+        "tenant_id TEXT NOT NULL DEFAULT '', appointment_id TEXT, apartment_id INTEGER, slot TEXT, "
+        "status TEXT, updated_at REAL, PRIMARY KEY (tenant_id, appointment_id))",
+        "INSERT OR REPLACE INTO appointments (tenant_id, appointment_id, apartment_id, slot, status, updated_at) "
+        "VALUES (:tenant_id, :appointment_id, :apartment_id, :slot, :status, :ts)",
+    ),
+}
+
+
+class WriteAheadLog:
+    """
+    Append-only JSON-lines log of records not yet applied to the store.
+
+    A batch is written and fsynced in one go, so a record acknowledged to a
+    client survives a crash. A torn last line (crash mid-write) is ignored
+    on replay since it was never acknowledged.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def append(self, records: List[Dict]) -> None:
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replay(self) -> Iterator[Dict]:
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping torn write-ahead log entry in %s", self.path)
+
+    def truncate(self) -> None:
+        with open(self.path, "w") as f:
+            os.fsync(f.fileno())
+
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+
+class RecordStore:
+    """SQLite store the write-behind queue applies batches to, one transaction per batch"""
+
+    def __init__(self, path: Path):
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(appointments)")]
+        legacy = bool(columns) and "tenant_id" not in columns
+        if legacy:
+            self.connection.execute("ALTER TABLE appointments RENAME TO appointments_legacy")
+        for create, _ in TABLES.values():
+            self.connection.execute(create)
+        if legacy:
+            # Appointments stored before they were keyed by tenant are the default catalog's
+            self.connection.execute(
+                "INSERT INTO appointments (appointment_id, apartment_id, slot, status, updated_at) "
+                "SELECT appointment_id, apartment_id, slot, status, updated_at FROM appointments_legacy"
+            )
+            self.connection.execute("DROP TABLE appointments_legacy")
+        self.connection.commit()
+
+    def apply(self, records: List[Dict]) -> None:
+        with self.connection:
+            for record in records:
+                _, upsert = TABLES[record["kind"]]
+                # Records logged before appointments carried a tenant are the default catalog's
+                params = {"tenant_id": "", **record["data"], "ts": record["ts"]}
+                self.connection.execute(upsert, params)
+
+    def count(self, kind: str) -> int:
+        table = "users" if kind == "user" else "appointments"
+        return self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+class WriteBehindQueue:
+    """
+    Group-commit queue for user and appointment writes.
+
+    Writes are collected for up to flush_ms, or until max_batch_size of them
+    are waiting, then appended to the write-ahead log with a single fsync.
+    Callers are acknowledged as soon as their batch is durable in the log;
+    the batch is then applied to the SQLite store in one transaction and the
+    log is cleared. Records left in the log by a crash are replayed into the
+    store the first time the queue is used.
+    """
+
+    def __init__(
+        self,
+        data_dir: Optional[str] = None,
+        flush_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            data_dir: Directory for the log and the store. If not provided,
+                uses WRITE_BEHIND_DIR (default "data")
+            flush_ms: Longest a write waits for its batch to be committed. If
+                not provided, uses WRITE_BEHIND_FLUSH_MS (default 5)
+            max_batch_size: Commit as soon as this many writes are waiting. If
+                not provided, uses WRITE_BEHIND_BATCH_SIZE (default 64)
+        """
+        self.data_dir = Path(data_dir or os.getenv("WRITE_BEHIND_DIR", "data"))
+        if flush_ms is None:
+            flush_ms = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "5"))
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "64"))
+        self.window = flush_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self.wal: Optional[WriteAheadLog] = None
+        self.store: Optional[RecordStore] = None
+        self._pending: List[Dict] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._commit_lock: Optional[asyncio.Lock] = None
+        self._tasks = set()
+        self._in_flight = 0
+        self._seq = 0
+
+        self.records_committed = 0
+        self.batches_committed = 0
+        self.records_replayed = 0
+        self._flush_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._wait_latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def _open(self) -> None:
+        """Open the log and store, replaying whatever a crash left in the log"""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.wal = WriteAheadLog(self.data_dir / "writes.wal")
+        self.store = RecordStore(self.data_dir / "records.db")
+        self._commit_lock = asyncio.Lock()
+
+        leftovers = list(self.wal.replay())
+        if leftovers:
+            self.store.apply(leftovers)
+            self.records_replayed = len(leftovers)
+            self._seq = max(record["seq"] for record in leftovers)
+            logger.info("Replayed %d writes from %s", len(leftovers), self.wal.path)
+        self.wal.truncate()
+
+    async def submit(self, kind: str, data: Dict[str, Any]) -> int:
+        """
+        Queue a write and wait until it is durable in the write-ahead log.
+
+        Args:
+            kind: "user" or "appointment"
+            data: Column values of the record
+
+        Returns:
+            Sequence number of the write
+        """
+        if kind not in TABLES:
+            raise ValueError(f"Unknown record kind: {kind}")
+        if self.wal is None:
+            self._open()
+
+        loop = asyncio.get_running_loop()
+        self._seq += 1
+        record = {"seq": self._seq, "kind": kind, "ts": time.time(), "data": data}
+        future = loop.create_future()
+        self._pending.append(record)
+        self._futures.append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        await future
+        return record["seq"]
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        records, futures = self._pending, self._futures
+        self._pending, self._futures = [], []
+        self._in_flight += len(records)
+        task = asyncio.ensure_future(self._commit(records, futures))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, records: List[Dict], futures: List[asyncio.Future]) -> None:
+        # Batches are committed one at a time so the log stays in order
+        async with self._commit_lock:
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.wal.append, records)
+            except Exception as e:
+                self._in_flight -= len(records)
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            durable = time.perf_counter()
+            self._flush_latencies.append(durable - started)
+            acknowledged = time.time()
+            for record, future in zip(records, futures):
+                self._wait_latencies.append(acknowledged - record["ts"])
+                if not future.done():
+                    future.set_result(record["seq"])
+            self.records_committed += len(records)
+            self.batches_committed += 1
+
+            try:
+                await asyncio.to_thread(self.store.apply, records)
+                await asyncio.to_thread(self.wal.truncate)
+            except Exception:
+                # The records stay in the log and are replayed on restart
+                logger.exception("Error applying %d writes to the store", len(records))
+            finally:
+                self._in_flight -= len(records)
+
+    async def drain(self) -> None:
+        """Commit everything queued so far, e.g. on shutdown"""
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Queue depth, batching and latency figures.
+
+        flush_latency_ms covers the log write and fsync of a batch;
+        commit_wait_ms is how long each write waited from submission until
+        it was acknowledged.
+        """
+        return {
+            "queue_depth": len(self._pending) + self._in_flight,
+            "records_committed": self.records_committed,
+            "batches_committed": self.batches_committed,
+            "avg_batch_size": round(self.records_committed / self.batches_committed, 2)
+            if self.batches_committed else 0,
+            "records_replayed": self.records_replayed,
+            "wal_bytes": self.wal.size() if self.wal else 0,
+            "flush_latency_ms": _latency_summary(self._flush_latencies),
+            "commit_wait_ms": _latency_summary(self._wait_latencies),
+        }
+
+
+def _latency_summary(samples: deque) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "p50": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+# Shared queue used by the API
+write_queue = WriteBehindQueue()